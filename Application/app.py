@@ -3,60 +3,55 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import plotly.express as px
 import joblib
-import torch
-import torch.nn as nn
-from transformers import AutoTokenizer
 import numpy as np
 import os
+import time
+from data_layer import (
+    begin_rerun,
+    load_graph,
+    load_name_index,
+    load_pairs,
+    load_rankings,
+    load_view_tables,
+    query,
+    show_timing,
+)
+from rendering import (
+    begin_render,
+    bin_values,
+    held_back_caption,
+    search_select,
+    show_bar_chart,
+    show_chart,
+    show_render_stats,
+    show_table,
+    top_k,
+)
+from review_rank import load_predictor
+import review_search
+
+
+@st.cache_resource(show_spinner="Loading the review rank model...")
+def get_rank_predictor(quantize):
+    # Loaded once per process from the local model and tokenizer files
+    return load_predictor(quantize=quantize)
+
+
+@st.cache_resource(show_spinner="Loading the review index...")
+def get_review_movies(fingerprint):
+    # Reloaded when the scraper has updated the index
+    return review_search.review_movies()
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def get_review_facets(text, fingerprint):
+    return review_search.facets(text, get_review_movies(fingerprint))
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_review_hits(text, movie_id, page, fingerprint):
+    return review_search.search(text, movie_id, limit=20, offset=(page - 1) * 20)
 
-# # Initialize the tokenizer
-# model_name = "bert-base-multilingual-cased"
-# tokenizer = AutoTokenizer.from_pretrained(model_name)
-
-
-# # Define the model architecture
-# class ReviewRankPredictor(nn.Module):
-#     def __init__(self, input_dim, hidden_dim, output_dim):
-#         super(ReviewRankPredictor, self).__init__()
-#         self.fc1 = nn.Linear(input_dim, hidden_dim)
-#         self.relu = nn.ReLU()
-#         self.fc2 = nn.Linear(hidden_dim, hidden_dim)
-#         self.fc3 = nn.Linear(hidden_dim, output_dim)
-
-#     def forward(self, x):
-#         out = self.fc1(x)
-#         out = self.relu(out)
-#         out = self.fc2(out)
-#         out = self.relu(out)
-#         out = self.fc3(out)
-#         return out
-
-
-# # Parameters (ensure these match your training configuration)
-# input_dim = 128  # Based on tokenizer max_length
-# hidden_dim = 256
-# output_dim = 10  # Number of unique ranks (classes)
-
-# # Initialize the model
-# model = ReviewRankPredictor(input_dim, hidden_dim, output_dim)
-
-# # Load the saved model state dictionary
-# model.load_state_dict(
-#     torch.load("review_rank_predictor_model.pth", map_location=torch.device("cpu"))
-# )
-# model.eval()  # Set the model to evaluation mode
-
-# # Define the save path for the models
-# save_path = "Application/Models/"
-
-# Load data files
-films_df = pd.read_csv("Normalized Sheets/Films.csv")
-genres_df = pd.read_csv("Normalization Code/Final_Normalized_Sheets/Genres.csv")
-directors_df = pd.read_csv("Normalization Code/Final_Normalized_Sheets/Directors.csv")
-stars_df = pd.read_csv("Normalization Code/Final_Normalized_Sheets/Stars.csv")
-film_genre_df = pd.read_csv("Normalization Code/Final_Normalized_Sheets/FilmGenre.csv")
-film_director_df = pd.read_csv("Normalization Code/Final_Normalized_Sheets/FilmDirector.csv")
-film_star_df = pd.read_csv("Normalization Code/Final_Normalized_Sheets/FilmStar.csv")
 
 # Custom CSS
 st.markdown(
@@ -76,7 +71,7 @@ st.markdown(
 
 st.sidebar.title("Main Navigation")
 main_page = st.sidebar.selectbox(
-    "Select a Page", ["Home", "Analysis Page"]
+    "Select a Page", ["Home", "Review Rank Prediction", "Analysis Page", "Review Search"]
 )
 
 if main_page == "Home":
@@ -93,53 +88,91 @@ if main_page == "Home":
              **IMDb Analysis**: Dive deep into the IMDb top 250 movies with various analyses on genres, 
             irectors, stars, and more. Understand trends, uncover patterns, and gain insights into the world of cinema.""")
 
-# elif main_page == "Review Rank Prediction":
-#     st.title("Review Rank Prediction")
-
-#     # Add text input fields
-#     headline = st.text_input("Write a headline for your review here:")
-#     user_text = st.text_area("Write your review here:")
-
-#     # Display character count
-#     st.markdown(
-#         f'<p class="char-counter">Required characters: 600</p>', unsafe_allow_html=True
-#     )
-#     st.write(f"Character count: {len(user_text)}")
-
-#     # Predict button
-#     if st.button("Predict"):
-#         if headline.strip() == "" or user_text.strip() == "":
-#             st.error("Please fill out both headline and review fields.")
-        # elif len(user_text) >= 600:
-        #     # Combine headline and review
-        #     combined_text = headline + " " + user_text
-
-        #     # Tokenize the combined text
-        #     encoding = tokenizer(
-        #         combined_text,
-        #         truncation=True,
-        #         padding="max_length",
-        #         max_length=128,
-        #         return_tensors="pt",
-        #     )
-
-        #     # Make predictions
-        #     with torch.no_grad():
-        #         inputs = (
-        #             encoding["input_ids"].squeeze(1).float()
-        #         )  # Squeeze to remove extra dimensions and convert to float
-        #         outputs = model(inputs)
-        #         predicted_class = torch.argmax(outputs, dim=1).item()
-
-        #     # Display the rating
-        #     st.write(
-        #         f"The predicted rating for your review is: {predicted_class} out of 10"
-        #     )
-        #     st.success("Review submitted successfully!")
-        # else:
-        #     st.write(
-        #         "Please enter a review text with at least 600 characters to get a prediction."
-        #     )
+elif main_page == "Review Rank Prediction":
+    st.title("Review Rank Prediction")
+
+    # Add text input fields
+    headline = st.text_input("Write a headline for your review here:")
+    user_text = st.text_area("Write your review here:")
+    quantize = st.sidebar.checkbox("Quantized model (int8, faster on CPU)")
+
+    # Display character count
+    st.markdown(
+        f'<p class="char-counter">Required characters: 600</p>', unsafe_allow_html=True
+    )
+    st.write(f"Character count: {len(user_text)}")
+
+    # Predict button
+    if st.button("Predict"):
+        if headline.strip() == "" or user_text.strip() == "":
+            st.error("Please fill out both headline and review fields.")
+        elif len(user_text) >= 600:
+            # Combine headline and review
+            combined_text = headline + " " + user_text
+            predicted_class = get_rank_predictor(quantize).predict([combined_text])[0]
+
+            # Display the rating
+            st.write(
+                f"The predicted rating for your review is: {predicted_class} out of 10"
+            )
+            st.success("Review submitted successfully!")
+        else:
+            st.write(
+                "Please enter a review text with at least 600 characters to get a prediction."
+            )
+
+elif main_page == "Review Search":
+    st.title("Review Search")
+
+    if not review_search.index_exists():
+        st.info(
+            "No review index yet, build it from the scraped reviews with "
+            "`python Scrapping/ReviewIndex.py`."
+        )
+    else:
+        text = st.text_input("Search the reviews (every word must appear)")
+        if review_search.match_expression(text) is not None:
+            start = time.perf_counter()
+            fingerprint = review_search.index_fingerprint()
+            movie_hits = get_review_facets(text, fingerprint)
+            total = int(movie_hits["Hits"].sum())
+            # MovieIDs start at 1, 0 stands for every movie
+            labels = {0: f"All movies ({total})"}
+            labels.update(
+                zip(
+                    movie_hits["MovieID"].tolist(),
+                    (movie_hits["Movie"] + " (" + movie_hits["Hits"].astype(str) + ")"),
+                )
+            )
+            movie_id = st.sidebar.selectbox(
+                "Movie", list(labels), format_func=labels.get, key="review_movie"
+            ) or None
+            hit_count, scope = total, f"{len(movie_hits)} movies"
+            if movie_id is not None:
+                movie = movie_hits.set_index("MovieID").loc[movie_id]
+                hit_count, scope = int(movie["Hits"]), movie["Movie"]
+            pages = max(1, -(-hit_count // 20))
+            page = st.sidebar.number_input(
+                f"Page (of {pages})",
+                min_value=1,
+                max_value=pages,
+                value=1,
+                key=f"review_page_{review_search.match_expression(text, movie_id)}",
+            )
+            hits = get_review_hits(text, movie_id, page, fingerprint)
+            elapsed = (time.perf_counter() - start) * 1000
+
+            st.caption(
+                f"{hit_count} reviews in {scope}, best matches first ({elapsed:.1f} ms)"
+            )
+            if len(movie_hits) > 1 and movie_id is None:
+                show_bar_chart(movie_hits.head(10).set_index("Movie")["Hits"])
+            for hit in hits.itertuples():
+                st.markdown(
+                    f"**{hit.Movie}** · {hit.Rank}/10 · *{hit.Title}*  \n{hit.Excerpt}"
+                )
+        elif text.strip():
+            st.write("Type at least one word.")
 
 elif main_page == "Analysis Page":
     st.sidebar.title("Analysis Navigation")
@@ -157,67 +190,49 @@ elif main_page == "Analysis Page":
             "Top Stars by Genre",
             "Film Release Trends",
             "IMDb Rating Distribution",
+            "Star Collaborations",
+            "Collaboration Network",
         ],
     )
 
+    # Views query the data layer, the graph views also load the tables they index.
+    # Charts, tables and pickers only get the rows they show, see rendering.py
+    begin_rerun()
+    begin_render()
+    data = load_view_tables(analysis_option)
+    films_df = data.get("Films")
+    directors_df = data.get("Directors")
+    stars_df = data.get("Stars")
+
     if analysis_option == "Overview":
         st.header("Overview")
         col1, col2, col3, col4 = st.columns(4)
 
-        col1.metric("Total Films", films_df.shape[0])
-        col2.metric("Total Genres", genres_df.shape[0])
-        col3.metric("Total Directors", directors_df.shape[0])
-        col4.metric("Total Stars", stars_df.shape[0])
+        counts = query("CatalogCounts").iloc[0]
+        col1.metric("Total Films", counts["Films"])
+        col2.metric("Total Genres", counts["Genres"])
+        col3.metric("Total Directors", counts["Directors"])
+        col4.metric("Total Stars", counts["Stars"])
 
         st.subheader("Top Rated Films")
-        top_rated_films = films_df.nlargest(10, "IMDb Rating")
-        st.dataframe(top_rated_films[["Film Title", "IMDb Rating", "Release Year"]])
+        show_table(query("TopRatedFilms", limit=10), key="top_rated", interactive=True)
 
     if analysis_option == "Genres":
         st.header("Genres")
 
-        genre_count = (
-            film_genre_df["GenreID"]
-            .value_counts()
-            .rename_axis("GenreID")
-            .reset_index(name="Count")
-        )
-        genre_count = genre_count.merge(genres_df, on="GenreID")
+        genre_count = query("GenreCounts")
 
         st.subheader("Number of Films per Genre")
-        st.bar_chart(genre_count.set_index("Genre")["Count"])
+        show_bar_chart(genre_count.set_index("Genre")["Count"])
 
         st.subheader("Genre Distribution")
         fig = px.pie(
             genre_count, values="Count", names="Genre", title="Genre Distribution"
         )
-        st.plotly_chart(fig)
+        show_chart(fig)
 
         st.subheader("Genre Co-occurrence")
-        film_genres = (
-            film_genre_df.groupby("FilmID")["GenreID"].apply(list).reset_index()
-        )
-
-        from itertools import combinations
-
-        genre_pairs = []
-        for genres in film_genres["GenreID"]:
-            if len(genres) > 1:
-                genre_pairs.extend(combinations(genres, 2))
-
-        genre_pair_count = pd.DataFrame(genre_pairs, columns=["Genre1", "Genre2"])
-        genre_pair_count = genre_pair_count.merge(
-            genres_df, left_on="Genre1", right_on="GenreID"
-        ).drop(columns=["GenreID"])
-        genre_pair_count = genre_pair_count.merge(
-            genres_df, left_on="Genre2", right_on="GenreID"
-        ).drop(columns=["GenreID"])
-        genre_pair_count.columns = ["Genre1", "Genre2", "Genre1Name", "Genre2Name"]
-        genre_pair_count = (
-            genre_pair_count.groupby(["Genre1Name", "Genre2Name"])
-            .size()
-            .reset_index(name="Count")
-        )
+        genre_pair_count = query("GenrePairs")
 
         if not genre_pair_count.empty:
             fig = px.treemap(
@@ -226,67 +241,46 @@ elif main_page == "Analysis Page":
                 values="Count",
                 title="Genre Co-occurrence",
             )
-            st.plotly_chart(fig)
+            show_chart(fig)
         else:
             st.write("No genre co-occurrence data available.")
 
     if analysis_option == "Directors":
         st.header("Directors")
 
-        director_count = (
-            film_director_df["DirectorID"]
-            .value_counts()
-            .rename_axis("DirectorID")
-            .reset_index(name="Count")
-        )
-        director_count = director_count.merge(directors_df, on="DirectorID")
+        director_count, held_back = top_k(query("DirectorCounts"), "Count")
 
         st.subheader("Number of Films per Director")
-        st.bar_chart(director_count.set_index("Director")["Count"])
+        show_bar_chart(director_count.set_index("Director")["Count"], held_back)
+        held_back_caption(len(director_count), held_back, "directors")
 
         st.subheader("Films by Selected Director")
-        director = st.selectbox("Select a director", directors_df["Director"])
-        director_id = directors_df[directors_df["Director"] == director][
-            "DirectorID"
-        ].values[0]
-        films_by_director = film_director_df[
-            film_director_df["DirectorID"] == director_id
-        ].merge(films_df, on="FilmID")
-        st.table(films_by_director[["Film Title", "IMDb Rating", "Release Year"]])
+        director_id, director = search_select(
+            "Select a director", load_name_index("Director"), key="director"
+        )
+        if director_id is not None:
+            show_table(
+                query("FilmsByDirector", director_id=director_id),
+                key=f"director_films_{director_id}",
+            )
 
     if analysis_option == "Stars":
         st.header("Stars")
 
-        star_count = (
-            film_star_df["StarID"]
-            .value_counts()
-            .rename_axis("StarID")
-            .reset_index(name="Count")
-        )
-        star_count = star_count.merge(stars_df, on="StarID")
+        star_count, held_back = top_k(query("StarCounts"), "Count")
 
         st.subheader("Number of Films per Star")
-        st.bar_chart(star_count.set_index("Star")["Count"])
+        show_bar_chart(star_count.set_index("Star")["Count"], held_back)
+        held_back_caption(len(star_count), held_back, "stars")
 
         st.subheader("Films by Selected Star")
-        star = st.selectbox("Select a star", stars_df["Star"])
-        star_id = stars_df[stars_df["Star"] == star]["StarID"].values[0]
-        films_by_star = film_star_df[film_star_df["StarID"] == star_id].merge(
-            films_df, on="FilmID"
-        )
-        st.table(films_by_star[["Film Title", "IMDb Rating", "Release Year"]])
+        star_id, star = search_select("Select a star", load_name_index("Star"), key="star")
+        if star_id is not None:
+            show_table(query("FilmsByStar", star_id=star_id), key=f"star_films_{star_id}")
 
     if analysis_option == "Genre Popularity Over Time":
         st.header("Genre Popularity Over Time")
-        film_genre_merged = film_genre_df.merge(
-            films_df[["FilmID", "Release Year"]], on="FilmID"
-        )
-        film_genre_merged = film_genre_merged.merge(genres_df, on="GenreID")
-        genre_popularity = (
-            film_genre_merged.groupby(["Release Year", "Genre"])
-            .size()
-            .reset_index(name="Count")
-        )
+        genre_popularity = query("GenrePopularity")
         fig = px.line(
             genre_popularity,
             x="Release Year",
@@ -294,77 +288,50 @@ elif main_page == "Analysis Page":
             color="Genre",
             title="Genre Popularity Over Time",
         )
-        st.plotly_chart(fig)
+        show_chart(fig)
 
     if analysis_option == "Top Stars by Genre":
         st.header("Top Stars by Genre")
-        genre = st.selectbox("Select a genre", genres_df["Genre"])
-        genre_id = genres_df[genres_df["Genre"] == genre]["GenreID"].values[0]
-        films_in_genre = film_genre_df[film_genre_df["GenreID"] == genre_id][
-            "FilmID"
-        ].unique()
-        stars_in_genre = film_star_df[film_star_df["FilmID"].isin(films_in_genre)]
-        star_count_genre = (
-            stars_in_genre["StarID"]
-            .value_counts()
-            .rename_axis("StarID")
-            .reset_index(name="Count")
-        )
-        star_count_genre = star_count_genre.merge(stars_df, on="StarID")
+        genres = query("Genres")
+        genre = st.selectbox("Select a genre", genres["Genre"])
+        genre_id = genres[genres["Genre"] == genre]["GenreID"].values[0]
+        star_count_genre = query("GenreTopStars", genre_id=int(genre_id), limit=10)
         fig = px.bar(
-            star_count_genre.head(10),
+            star_count_genre,
             x="Star",
             y="Count",
             title=f"Top Stars in {genre}",
         )
-        st.plotly_chart(fig)
+        show_chart(fig)
 
     if analysis_option == "Director Film Ratings":
         st.header("Director's Film Ratings")
-        film_director_merged = film_director_df.merge(
-            films_df[["FilmID", "IMDb Rating"]], on="FilmID"
-        )
-        film_director_merged = film_director_merged.merge(directors_df, on="DirectorID")
-        director_ratings = (
-            film_director_merged.groupby("Director").mean()["IMDb Rating"].reset_index()
-        )
+        director_ratings, held_back = top_k(query("DirectorRatings"), "IMDb Rating")
         fig = px.bar(
             director_ratings,
             x="Director",
             y="IMDb Rating",
             title="Average IMDb Rating per Director",
         )
-        st.plotly_chart(fig)
+        show_chart(fig, held_back)
+        held_back_caption(len(director_ratings), held_back, "directors")
 
     if analysis_option == "Star Film Ratings":
         st.header("Star's Film Ratings")
-        film_star_merged = film_star_df.merge(
-            films_df[["FilmID", "IMDb Rating"]], on="FilmID"
-        )
-        film_star_merged = film_star_merged.merge(stars_df, on="StarID")
-        star_ratings = (
-            film_star_merged.groupby("Star").mean()["IMDb Rating"].reset_index()
-        )
+        star_ratings, held_back = top_k(query("StarRatings"), "IMDb Rating")
         fig = px.bar(
             star_ratings,
             x="Star",
             y="IMDb Rating",
             title="Average IMDb Rating per Star",
         )
-        st.plotly_chart(fig)
+        show_chart(fig, held_back)
+        held_back_caption(len(star_ratings), held_back, "stars")
 
     if analysis_option == "Film Release Trends":
         st.header("Film Release Trends")
 
-        films_df["Release Year"] = pd.to_numeric(
-            films_df["Release Year"], errors="coerce"
-        )
-        films_df = films_df.dropna(subset=["Release Year"])
-        films_df["Release Year"] = films_df["Release Year"].astype(int)
-
-        release_trends = films_df["Release Year"].value_counts().reset_index()
-        release_trends.columns = ["Release Year", "Count"]  # Correctly rename columns
-        release_trends = release_trends.sort_values("Release Year")
+        release_trends = query("ReleaseTrends")
 
         fig = px.line(
             release_trends,
@@ -372,11 +339,109 @@ elif main_page == "Analysis Page":
             y="Count",
             title="Film Release Trends Over Years",
         )
-        st.plotly_chart(fig)
+        show_chart(fig)
 
     if analysis_option == "IMDb Rating Distribution":
         st.header("IMDb Rating Distribution")
-        fig = px.histogram(
-            films_df, x="IMDb Rating", nbins=20, title="Distribution of IMDb Ratings"
+        # Binned here, the browser gets 20 bars instead of every rating
+        fig = px.bar(
+            bin_values(query("Ratings")["IMDb Rating"], bins=20),
+            x="Bin",
+            y="Count",
+            title="Distribution of IMDb Ratings",
+        )
+        show_chart(fig)
+
+    if analysis_option == "Star Collaborations":
+        st.header("Star Collaborations")
+
+        st.subheader("Stars Sharing the Most Films")
+        star_pairs = load_pairs("Star", top_k=20)
+        star_pairs = star_pairs.merge(
+            stars_df.rename(columns={"StarID": "StarID1", "Star": "Star 1"})
+        ).merge(stars_df.rename(columns={"StarID": "StarID2", "Star": "Star 2"}))
+        star_pairs = star_pairs.sort_values("Count", ascending=False)
+        show_table(
+            star_pairs[["Star 1", "Star 2", "Count"]].rename(columns={"Count": "Films"}),
+            key="star_pairs",
         )
-        st.plotly_chart(fig)
+
+        st.subheader("Top Collaborators of a Star")
+        star_id, star = search_select("Select a star", load_name_index("Star"), key="star")
+        if star_id is not None:
+            collaborator_ids, shared_films = load_graph().co_stars(star_id, top_k=10)
+            collaborators = pd.DataFrame(
+                {"StarID": collaborator_ids, "Count": shared_films}
+            ).merge(stars_df, on="StarID")
+            fig = px.bar(
+                collaborators,
+                x="Star",
+                y="Count",
+                title=f"Stars Sharing the Most Films with {star}",
+            )
+            show_chart(fig)
+
+        st.subheader("Director and Star Collaborations")
+        director_star_pairs = (
+            load_pairs("Director", "Star", top_k=20)
+            .merge(directors_df, on="DirectorID")
+            .merge(stars_df, on="StarID")
+            .sort_values("Count", ascending=False)
+        )
+        show_table(
+            director_star_pairs[["Director", "Star", "Count"]].rename(
+                columns={"Count": "Films"}
+            ),
+            key="director_star_pairs",
+        )
+
+    if analysis_option == "Collaboration Network":
+        st.header("Collaboration Network")
+        graph = load_graph()
+        star_index = load_name_index("Star")
+        star_names = stars_df.set_index("StarID")["Star"]
+        film_titles = films_df.set_index("FilmID")["Film Title"]
+
+        st.subheader("Shortest Collaboration Path")
+        col1, col2 = st.columns(2)
+        first_id, first_star = search_select("From star", star_index, "from_star", column=col1)
+        second_id, second_star = search_select(
+            "To star", star_index, "to_star", column=col2, default=1
+        )
+        path = None
+        if first_id is not None and second_id is not None:
+            path = graph.collaboration_path(first_id, second_id)
+        if first_id is None or second_id is None:
+            st.write("Pick two stars to find the films that connect them.")
+        elif path is None:
+            st.write(f"{first_star} and {second_star} are not connected by any film.")
+        else:
+            st.write(f"{(len(path) - 1) // 2} film(s) apart:")
+            st.write(
+                " → ".join(
+                    f"**{star_names[node]}**" if position % 2 == 0 else film_titles[node]
+                    for position, node in enumerate(path)
+                )
+            )
+
+        star_rankings, director_rankings = load_rankings()
+
+        st.subheader("Most Connected Stars")
+        metric = st.radio("Rank stars by", ["Films", "Co-credits"], horizontal=True)
+        top_stars = star_rankings.nlargest(20, metric).merge(stars_df, on="StarID")
+        top_stars["Different Co-stars"] = graph.distinct_co_stars(
+            top_stars["StarID"].to_numpy()
+        )
+        show_table(
+            top_stars[["Star", "Films", "Co-credits", "Different Co-stars"]],
+            key="top_stars",
+        )
+
+        st.subheader("Most Connected Directors")
+        top_directors = director_rankings.nlargest(20, "Stars").merge(
+            directors_df, on="DirectorID"
+        )
+        show_table(top_directors[["Director", "Films", "Stars"]], key="top_directors")
+
+    show_timing()
+    show_render_stats()
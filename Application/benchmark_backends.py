@@ -0,0 +1,95 @@
+import time
+import argparse
+import statistics
+import pandas as pd
+import data_layer
+from data_layer import query
+
+# The queries every view runs on a rerun, with the selection the view starts on
+VIEW_QUERIES = {
+    "Overview": [("CatalogCounts", {}), ("TopRatedFilms", {"limit": 10})],
+    "Genres": [("GenreCounts", {}), ("GenrePairs", {})],
+    "Directors": [("DirectorCounts", {}), ("Directors", {}), ("FilmsByDirector", "director_id")],
+    "Stars": [("StarCounts", {}), ("Stars", {}), ("FilmsByStar", "star_id")],
+    "Star Film Ratings": [("StarRatings", {})],
+    "Director Film Ratings": [("DirectorRatings", {})],
+    "Genre Popularity Over Time": [("GenrePopularity", {})],
+    "Top Stars by Genre": [("Genres", {}), ("GenreTopStars", "genre_id")],
+    "Film Release Trends": [("ReleaseTrends", {})],
+    "IMDb Rating Distribution": [("Ratings", {})],
+}
+
+
+def first_ids():
+    return {
+        "director_id": int(query("Directors", backend="pandas")["DirectorID"].iloc[0]),
+        "star_id": int(query("Stars", backend="pandas")["StarID"].iloc[0]),
+        "genre_id": int(query("Genres", backend="pandas")["GenreID"].iloc[0]),
+    }
+
+
+def view_params(params, ids):
+    if isinstance(params, str):
+        return {params: ids[params], **({"limit": 10} if params == "genre_id" else {})}
+    return params
+
+
+def run_view(view, backend, ids):
+    return [
+        query(name, backend=backend, **view_params(params, ids))
+        for name, params in VIEW_QUERIES[view]
+    ]
+
+
+def same_result(left, right):
+    """
+    Same rows up to the order of ties and the rounding of averages
+    """
+    if len(left) != len(right) or set(left.columns) != set(right.columns):
+        return False
+    columns = list(left.columns)
+    left, right = (
+        df[columns].round(6).astype(str).sort_values(columns).reset_index(drop=True)
+        for df in (left, right)
+    )
+    return left.equals(right)
+
+
+def time_view(view, backend, ids, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run_view(view, backend, ids)
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-view latency of the pandas and SQLite dashboard backends"
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    ids = first_ids()
+    # Warm both backends: tables parsed and cached, database built
+    for view in VIEW_QUERIES:
+        for backend in ["pandas", "sqlite"]:
+            run_view(view, backend, ids)
+
+    rows = []
+    for view in VIEW_QUERIES:
+        pandas_results = run_view(view, "pandas", ids)
+        sqlite_results = run_view(view, "sqlite", ids)
+        rows.append(
+            {
+                "View": view,
+                "pandas ms": round(time_view(view, "pandas", ids, args.repeat), 2),
+                "sqlite ms": round(time_view(view, "sqlite", ids, args.repeat), 2),
+                "Same rows": all(
+                    same_result(*pair) for pair in zip(pandas_results, sqlite_results)
+                ),
+            }
+        )
+    print(f"Data folder: {data_layer.DATA_DIR}")
+    print(pd.DataFrame(rows).to_string(index=False))
@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+import argparse
+from collections import Counter
+from itertools import combinations
+import pandas as pd
+from cooccurrence import cooccurrence, cross_occurrence
+
+# The synthetic catalog is generated and normalized with the normalization code
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Normalization Code")
+)
+from benchmark_normalize import make_synthetic_data  # noqa: E402
+from normalize import normalize  # noqa: E402
+
+
+def combinations_counts(link_df, id_column):
+    """
+    The per-film itertools.combinations loop the Genres view used to run
+    """
+    counts = Counter()
+    for ids in link_df.groupby("FilmID")[id_column].apply(list):
+        counts.update(tuple(sorted(pair)) for pair in combinations(set(ids), 2))
+    return counts
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def compare(label, link_df, id_column, top_k, legacy=True):
+    pairs, sparse_time = timed(cooccurrence, link_df, id_column)
+    line = f"{label}: {len(pairs)} pairs, sparse {sparse_time:.3f}s"
+    if legacy:
+        counts, legacy_time = timed(combinations_counts, link_df, id_column)
+        same = len(counts) == len(pairs) and all(
+            counts[(a, b)] == c
+            for a, b, c in pairs[[f"{id_column}1", f"{id_column}2", "Count"]].itertuples(index=False)
+        )
+        line += (
+            f", combinations {legacy_time:.3f}s ({legacy_time / sparse_time:.0f}x, "
+            f"{'same counts' if same else 'COUNTS DIFFER'})"
+        )
+    _, top_time = timed(cooccurrence, link_df, id_column, top_k=top_k)
+    print(f"{line}, top {top_k} {top_time:.3f}s")
+
+
+def run(tables, label, top_k, legacy_stars=True):
+    compare(f"{label} genre pairs", tables["FilmGenre"], "GenreID", top_k)
+    compare(f"{label} star pairs", tables["FilmStar"], "StarID", top_k, legacy=legacy_stars)
+    pairs, elapsed = timed(
+        cross_occurrence,
+        tables["FilmDirector"], "DirectorID", tables["FilmStar"], "StarID", top_k=top_k,
+    )
+    print(f"{label} director-star top {top_k}: {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the sparse co-occurrence counts against the combinations loop"
+    )
+    parser.add_argument(
+        "--data", default=os.path.join("Normalization Code", "Final_Normalized_Sheets")
+    )
+    parser.add_argument("--films", type=int, default=25_000)
+    parser.add_argument("--top-k", type=int, default=100)
+    parser.add_argument(
+        "--legacy-stars",
+        action="store_true",
+        help="Also time the combinations loop on the synthetic star pairs (slow)",
+    )
+    args = parser.parse_args()
+
+    tables = {
+        name: pd.read_csv(os.path.join(args.data, f"{name}.csv"))
+        for name in ["FilmGenre", "FilmDirector", "FilmStar"]
+    }
+    run(tables, "Scraped", args.top_k)
+
+    if args.films:
+        tables = normalize(make_synthetic_data(args.films))
+        run(tables, f"{args.films} films", args.top_k, legacy_stars=args.legacy_stars)
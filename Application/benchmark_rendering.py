@@ -0,0 +1,101 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import pandas as pd
+from benchmark_storage import TABLES, scale_tables
+from rendering import MEASURE_PAYLOAD_KEY
+from storage import write_table  # on the path set by benchmark_storage
+
+VIEWS = [
+    "Overview",
+    "Directors",
+    "Stars",
+    "Star Film Ratings",
+    "Director Film Ratings",
+    "Genres",
+    "Genre Popularity Over Time",
+    "Top Stars by Genre",
+    "Film Release Trends",
+    "IMDb Rating Distribution",
+    "Star Collaborations",
+    "Collaboration Network",
+]
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def measure_views(repeat):
+    """
+    Run every analysis view headless and report its payload, render time and rerun
+    time, the first run of a view (cold caches) is reported apart
+    """
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_file(APP_PATH, default_timeout=600).run()
+    app.sidebar.selectbox[0].select("Analysis Page").run()
+    app.sidebar.checkbox(key=MEASURE_PAYLOAD_KEY).check().run()
+    results = []
+    for view in VIEWS:
+        start = time.perf_counter()
+        app.sidebar.selectbox[1].select(view).run()
+        cold_ms = (time.perf_counter() - start) * 1000
+        rerun_times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            app.run()
+            rerun_times.append((time.perf_counter() - start) * 1000)
+        if app.exception:
+            raise RuntimeError(f"{view}: {app.exception[0].value}")
+        stats = app.session_state["render_stats"]
+        results.append(
+            {
+                "View": view,
+                "Payload KB": round(stats["bytes"] / 1024, 1),
+                "Render ms": round(stats["ms"], 1),
+                "Rows kept on server": stats["rows_held_back"],
+                "Cold ms": round(cold_ms),
+                "Rerun ms": round(sorted(rerun_times)[len(rerun_times) // 2]),
+            }
+        )
+    return results
+
+
+def run_scale(tables, factor, repeat):
+    with tempfile.TemporaryDirectory() as folder_path:
+        for name, df in scale_tables(tables, factor).items():
+            write_table(df, folder_path, name, "arrow")
+        # The data folder is read when the data layer is imported, so one process
+        # per scale
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--measure", str(repeat)],
+            stdout=subprocess.PIPE,
+            text=True,
+            check=True,
+            env={**os.environ, "IMDB_DATA_DIR": folder_path},
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Payload size and render time of every dashboard view"
+    )
+    parser.add_argument(
+        "--data", default=os.path.join("Normalization Code", "Final_Normalized_Sheets")
+    )
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--measure", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure is not None:
+        print(json.dumps(measure_views(args.measure)))
+        sys.exit()
+
+    tables = {name: pd.read_csv(os.path.join(args.data, f"{name}.csv")) for name in TABLES}
+    for factor in args.scales:
+        print(f"\n{factor}x catalog")
+        print(pd.DataFrame(run_scale(tables, factor, args.repeat)).to_string(index=False))
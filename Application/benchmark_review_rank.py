@@ -0,0 +1,68 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import torch
+from review_rank import load_model, load_tokenizer, RankPredictor
+
+WORDS = (
+    "the film story acting director cast scene plot ending character music camera "
+    "performance brilliant boring masterpiece slow classic script drama"
+).split()
+
+
+def load_texts(review_path, count, seed=0):
+    """
+    Headline + review texts from Review.csv, or random word salad of review length
+    when the file has too few rows
+    """
+    if os.path.exists(review_path):
+        reviews = pd.read_csv(review_path, nrows=count).dropna(subset=["Review"])
+        if len(reviews) >= count:
+            return (reviews["Title"].fillna("") + " " + reviews["Review"]).tolist()
+    rng = np.random.default_rng(seed)
+    return [" ".join(rng.choice(WORDS, rng.integers(60, 400))) for _ in range(count)]
+
+
+def throughput(predictor, texts, repeat=3):
+    predictor.predict(texts[: predictor.batch_size])
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        predictor.predict(texts)
+        best = min(best, time.perf_counter() - start)
+    return len(texts) / best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Reviews per second of the rank predictor by batch size"
+    )
+    parser.add_argument("--reviews", type=int, default=2048)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128, 512])
+    parser.add_argument("--input", default=os.path.join("CSV Folder", "Review.csv"))
+    parser.add_argument("--threads", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    texts = load_texts(args.input, args.reviews)
+    tokenizer = load_tokenizer()
+    models = {"fp32": load_model(), "int8": load_model(quantize=True)}
+
+    reference = RankPredictor(models["fp32"], tokenizer).predict(texts)
+    for name, model in models.items():
+        for batch_size in args.batch_sizes:
+            predictor = RankPredictor(model, tokenizer, batch_size)
+            rate = throughput(predictor, texts)
+            print(f"{name} batch {batch_size:>4}: {rate:,.0f} reviews/s")
+        agreement = (RankPredictor(model, tokenizer).predict(texts) == reference).mean()
+        print(f"{name} agrees with fp32 on {agreement:.1%} of the reviews")
+
+    # Tokenization alone, the share of the time the model does not account for
+    predictor = RankPredictor(models["fp32"], tokenizer, max(args.batch_sizes))
+    start = time.perf_counter()
+    for offset in range(0, len(texts), predictor.batch_size):
+        predictor.encode(texts[offset : offset + predictor.batch_size])
+    print(f"Tokenization only: {len(texts) / (time.perf_counter() - start):,.0f} reviews/s")
@@ -0,0 +1,125 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import pandas as pd
+
+# The table formats are defined next to the normalization writing them
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Normalization Code")
+)
+from storage import FORMATS, read_table, write_table  # noqa: E402
+
+TABLES = ["Films", "Genres", "Directors", "Stars", "FilmGenre", "FilmDirector", "FilmStar"]
+ID_COLUMNS = {
+    "Films": "FilmID",
+    "Genres": "GenreID",
+    "Directors": "DirectorID",
+    "Stars": "StarID",
+}
+NAME_COLUMNS = {"Films": "Film Title", "Directors": "Director", "Stars": "Star"}
+
+
+def scale_tables(tables, factor):
+    """
+    factor copies of the catalog with shifted IDs and suffixed names, so the copies
+    are distinct films, directors and stars (the genres are shared)
+    """
+    if factor == 1:
+        return tables
+    offsets = {column: int(tables[name][column].max()) for name, column in ID_COLUMNS.items()}
+    scaled = {}
+    for name, df in tables.items():
+        copies = []
+        for copy in range(factor):
+            df_copy = df.copy()
+            for column in df_copy.columns:
+                if column in offsets and column != "GenreID":
+                    df_copy[column] += offsets[column] * copy
+            if name in NAME_COLUMNS and copy:
+                df_copy[NAME_COLUMNS[name]] = df_copy[NAME_COLUMNS[name]] + f" ({copy})"
+            copies.append(df_copy)
+        scaled[name] = df if name == "Genres" else pd.concat(copies, ignore_index=True)
+    return scaled
+
+
+def rss_mb():
+    """
+    Resident memory in MB: RssAnon is what the process allocated (parsed or copied
+    data), RssFile the pages of mapped files it touched, which the OS can drop and
+    re-read and which every process mapping the file shares
+    """
+    rss = {"RssAnon": 0.0, "RssFile": 0.0}
+    with open("/proc/self/status") as file:
+        for line in file:
+            name = line.split(":", 1)[0]
+            if name in rss:
+                rss[name] = int(line.split()[1]) / 1024
+    return rss
+
+
+def measure_load(folder_path, file_format):
+    """
+    Load every table in the format and report the time and resident memory it took,
+    meant to run in a fresh interpreter so formats do not share caches
+    """
+    before = rss_mb()
+    start = time.perf_counter()
+    tables = {
+        name: read_table(os.path.join(folder_path, f"{name}{FORMATS[file_format]}"))
+        for name in TABLES
+    }
+    elapsed = time.perf_counter() - start
+    rows = sum(len(df) for df in tables.values())
+    after = rss_mb()
+    return {
+        "seconds": elapsed,
+        "anonMB": after["RssAnon"] - before["RssAnon"],
+        "fileMB": after["RssFile"] - before["RssFile"],
+        "rows": rows,
+    }
+
+
+def run_scale(tables, factor):
+    scaled = scale_tables(tables, factor)
+    with tempfile.TemporaryDirectory() as folder_path:
+        for file_format in FORMATS:
+            size = 0
+            for name, df in scaled.items():
+                size += os.path.getsize(write_table(df, folder_path, name, file_format))
+            result = json.loads(
+                subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "--measure", folder_path, file_format],
+                    capture_output=True,
+                    text=True,
+                    check=True,
+                ).stdout
+            )
+            print(
+                f"{factor}x {file_format:>7}: {result['rows']} rows, {size / 2**20:.1f} MB on "
+                f"disk, loaded in {result['seconds']:.3f}s, +{result['anonMB']:.1f} MB "
+                f"allocated, +{result['fileMB']:.1f} MB of mapped pages"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare load time and memory of the CSV, Parquet and Arrow tables"
+    )
+    parser.add_argument(
+        "--data", default=os.path.join("Normalization Code", "Final_Normalized_Sheets")
+    )
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100])
+    parser.add_argument("--measure", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure_load(*args.measure)))
+        sys.exit()
+
+    tables = {name: pd.read_csv(os.path.join(args.data, f"{name}.csv")) for name in TABLES}
+    for factor in args.scales:
+        run_scale(tables, factor)
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+def incidence_matrix(link_df, id_column, n_films=None):
+    """
+    Binary film x entity matrix of a link table (FilmGenre, FilmDirector, FilmStar),
+    rows are FilmIDs and columns the position of the entity in entity_ids
+    """
+    codes, entity_ids = pd.factorize(link_df[id_column], sort=True)
+    film_ids = link_df["FilmID"].to_numpy()
+    n_films = int(film_ids.max()) + 1 if n_films is None else n_films
+    matrix = sp.csr_matrix(
+        (np.ones(len(codes), dtype=np.int32), (film_ids, codes)),
+        shape=(n_films, len(entity_ids)),
+    )
+    # A repeated credit counts once
+    matrix.data[:] = 1
+    return matrix, np.asarray(entity_ids)
+
+
+def _merge_top(candidates, rows, cols, counts, top_k):
+    rows = np.concatenate([candidates[0], rows])
+    cols = np.concatenate([candidates[1], cols])
+    counts = np.concatenate([candidates[2], counts])
+    if top_k is not None and len(counts) > top_k:
+        keep = np.argpartition(-counts, top_k - 1)[:top_k]
+        rows, cols, counts = rows[keep], cols[keep], counts[keep]
+    return rows, cols, counts
+
+
+def pair_counts(left, right=None, top_k=None, min_count=1, block_size=2048):
+    """
+    Number of films shared by every pair of entities: leftᵀ·right, or leftᵀ·left with
+    each unordered pair counted once. The product is computed a block of left columns
+    at a time and pruned to the top_k pairs as it goes, so the full pair matrix of a
+    large cast is never held in memory. Returns (left index, right index, count).
+    """
+    same = right is None
+    right = left if same else right
+    left_columns = left.T.tocsr()
+    empty = np.array([], dtype=np.int64)
+    candidates = (empty, empty, empty)
+
+    for start in range(0, left.shape[1], block_size):
+        block = (left_columns[start : start + block_size] @ right).tocoo()
+        rows = block.row.astype(np.int64) + start
+        cols = block.col.astype(np.int64)
+        counts = block.data.astype(np.int64)
+        keep = counts >= min_count
+        if same:
+            keep &= cols > rows
+        candidates = _merge_top(candidates, rows[keep], cols[keep], counts[keep], top_k)
+
+    order = np.lexsort((candidates[1], candidates[0], -candidates[2]))
+    return tuple(values[order] for values in candidates)
+
+
+def cooccurrence(link_df, id_column, top_k=None, min_count=1):
+    """
+    Pairs of entities of the same kind appearing in the same films
+    """
+    matrix, entity_ids = incidence_matrix(link_df, id_column)
+    rows, cols, counts = pair_counts(matrix, top_k=top_k, min_count=min_count)
+    return pd.DataFrame(
+        {
+            f"{id_column}1": entity_ids[rows],
+            f"{id_column}2": entity_ids[cols],
+            "Count": counts,
+        }
+    )
+
+
+def cross_occurrence(left_df, left_column, right_df, right_column, top_k=None, min_count=1):
+    """
+    Pairs of entities of two kinds (e.g. director and star) appearing in the same films
+    """
+    n_films = int(max(left_df["FilmID"].max(), right_df["FilmID"].max())) + 1
+    left, left_ids = incidence_matrix(left_df, left_column, n_films)
+    right, right_ids = incidence_matrix(right_df, right_column, n_films)
+    rows, cols, counts = pair_counts(left, right, top_k=top_k, min_count=min_count)
+    return pd.DataFrame(
+        {left_column: left_ids[rows], right_column: right_ids[cols], "Count": counts}
+    )
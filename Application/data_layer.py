@@ -0,0 +1,375 @@
+import os
+import sys
+import json
+import time
+import functools
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+# The table formats and the aggregates are defined next to the normalization writing them
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Normalization Code")
+)
+from aggregates import (  # noqa: E402
+    AGGREGATES,
+    AGGREGATES_FOLDER,
+    MANIFEST_FILE,
+    compute_aggregate,
+    file_digest,
+)
+from cooccurrence import incidence_matrix, pair_counts  # noqa: E402
+from graph_index import GraphIndex  # noqa: E402
+from name_index import NameIndex  # noqa: E402
+from storage import FORMATS, read_table, table_file  # noqa: E402
+import sql_backend  # noqa: E402
+
+
+# All the normalized tables are read from one folder
+DATA_DIR = os.environ.get(
+    "IMDB_DATA_DIR", os.path.join("Normalization Code", "Final_Normalized_Sheets")
+)
+# Storage format read first when a table exists in several, e.g. IMDB_DATA_FORMAT=csv
+DATA_FORMAT = os.environ.get("IMDB_DATA_FORMAT")
+# Where the view queries run: "pandas" on the cached tables or "sqlite" in an
+# indexed database built from them
+BACKEND = os.environ.get("IMDB_BACKEND", "pandas")
+DATABASE_PATH = os.path.join(DATA_DIR, "Dashboard.db")
+TABLES = ["Films", "Genres", "Directors", "Stars", "FilmGenre", "FilmDirector", "FilmStar"]
+
+# Tables the graph views load next to their queries, the other views only query
+VIEW_TABLES = {
+    "Star Collaborations": ["Stars", "Directors"],
+    "Collaboration Network": ["Films", "Stars", "Directors"],
+}
+
+# Link table and ID column of every entity kind of the co-occurrence engine
+ENTITY_LINKS = {
+    "Genre": ("FilmGenre", "GenreID"),
+    "Director": ("FilmDirector", "DirectorID"),
+    "Star": ("FilmStar", "StarID"),
+}
+
+# Table and name column of every entity kind
+ENTITY_TABLES = {
+    "Genre": ("Genres", "Genre"),
+    "Director": ("Directors", "Director"),
+    "Star": ("Stars", "Star"),
+}
+
+# Files actually parsed since the process started, a cached rerun does not add to it
+disk_reads = {"count": 0}
+
+
+def table_path(name):
+    formats = [DATA_FORMAT, *FORMATS] if DATA_FORMAT in FORMATS else None
+    return table_file(DATA_DIR, name, formats)
+
+
+def aggregate_path(name):
+    return os.path.join(DATA_DIR, AGGREGATES_FOLDER, name)
+
+
+def file_fingerprint(path):
+    """
+    Changes whenever the file is rewritten, without reading its content
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def rerun_timing():
+    return st.session_state.setdefault(
+        "data_timing",
+        {
+            "tables": 0,
+            "ms": 0.0,
+            "disk_reads": 0,
+            "precomputed": 0,
+            "computed": 0,
+            "queries": 0,
+        },
+    )
+
+
+def begin_rerun():
+    st.session_state.pop("data_timing", None)
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def _read_table(path, fingerprint):
+    # The fingerprint is only part of the cache key, a new one means a new file
+    disk_reads["count"] += 1
+    return read_table(path)
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def _source_digest(path, fingerprint):
+    return file_digest(path)
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _read_manifest(path, fingerprint):
+    with open(path) as file:
+        return json.load(file)
+
+
+def load_table(name):
+    """
+    The table is parsed once per process and shared by every rerun and session,
+    callers must not modify it in place
+    """
+    path = table_path(name)
+    return _read_table(path, file_fingerprint(path))
+
+
+def load_tables(*names):
+    """
+    Load the named tables and add how long it took to the timing readout
+    """
+    start = time.perf_counter()
+    reads_before = disk_reads["count"]
+    tables = {name: load_table(name) for name in names}
+    timing = rerun_timing()
+    timing["tables"] += len(names)
+    timing["ms"] += (time.perf_counter() - start) * 1000
+    timing["disk_reads"] += disk_reads["count"] - reads_before
+    return tables
+
+
+def load_view_tables(view):
+    return load_tables(*VIEW_TABLES.get(view, []))
+
+
+def aggregate_is_fresh(name):
+    """
+    An aggregate is fresh when the tables it was computed from still have the digest
+    stamped in the manifest by the normalization step
+    """
+    manifest_path = aggregate_path(MANIFEST_FILE)
+    if not os.path.exists(manifest_path) or not os.path.exists(aggregate_path(f"{name}.csv")):
+        return False
+    manifest = _read_manifest(manifest_path, file_fingerprint(manifest_path))
+    _, sources = AGGREGATES[name]
+    return all(
+        manifest["sources"].get(os.path.basename(path))
+        == _source_digest(path, file_fingerprint(path))
+        for path in map(table_path, sources)
+    )
+
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def _compute_aggregate(name, fingerprints):
+    _, sources = AGGREGATES[name]
+    return compute_aggregate(name, {source: load_table(source) for source in sources})
+
+
+def load_aggregate(name):
+    """
+    Read the aggregate materialized by the normalization step, or compute it from the
+    tables when it is missing or stale (the result is cached until the tables change)
+    """
+    timing = rerun_timing()
+    if aggregate_is_fresh(name):
+        path = aggregate_path(f"{name}.csv")
+        timing["precomputed"] += 1
+        return _read_table(path, file_fingerprint(path))
+    _, sources = AGGREGATES[name]
+    fingerprints = tuple(file_fingerprint(table_path(source)) for source in sources)
+    timing["computed"] += 1
+    return _compute_aggregate(name, fingerprints)
+
+
+def _fingerprints(*names):
+    return tuple(file_fingerprint(table_path(name)) for name in names)
+
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def _incidence(kind, fingerprints):
+    link_name, id_column = ENTITY_LINKS[kind]
+    n_films = int(load_table("Films")["FilmID"].max()) + 1
+    return incidence_matrix(load_table(link_name), id_column, n_films)
+
+
+def load_incidence(kind):
+    """
+    Film x entity sparse matrix and the entity ID of every column, built once per
+    version of the link table
+    """
+    return _incidence(kind, _fingerprints("Films", ENTITY_LINKS[kind][0]))
+
+
+@st.cache_resource(max_entries=16, show_spinner=False)
+def _pairs(left_kind, right_kind, top_k, fingerprints):
+    left, left_ids = load_incidence(left_kind)
+    if right_kind is None:
+        rows, cols, counts = pair_counts(left, top_k=top_k)
+        id_column = ENTITY_LINKS[left_kind][1]
+        columns = [f"{id_column}1", f"{id_column}2"]
+        right_ids = left_ids
+    else:
+        right, right_ids = load_incidence(right_kind)
+        rows, cols, counts = pair_counts(left, right, top_k=top_k)
+        columns = [ENTITY_LINKS[left_kind][1], ENTITY_LINKS[right_kind][1]]
+    return pd.DataFrame(
+        {columns[0]: left_ids[rows], columns[1]: right_ids[cols], "Count": counts}
+    )
+
+
+def load_pairs(left_kind, right_kind=None, top_k=None):
+    """
+    Entity pairs sharing films and the number of films they share, ("Genre") for
+    genre co-occurrence or ("Director", "Star") for director-star collaborations
+    """
+    names = ["Films", ENTITY_LINKS[left_kind][0]]
+    if right_kind is not None:
+        names.append(ENTITY_LINKS[right_kind][0])
+    return _pairs(left_kind, right_kind, top_k, _fingerprints(*names))
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _graph(fingerprints):
+    return GraphIndex(
+        load_table("FilmStar"),
+        load_table("FilmDirector"),
+        film_ids=load_table("Films")["FilmID"].to_numpy(),
+    )
+
+
+def load_graph():
+    """
+    Film-star-director graph index, built once per version of the link tables
+    """
+    return _graph(_fingerprints("Films", "FilmStar", "FilmDirector"))
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _rankings(fingerprints):
+    graph = load_graph()
+    films, co_credits = graph.star_degrees()
+    stars = pd.DataFrame(
+        {"StarID": np.arange(graph.n_stars), "Films": films, "Co-credits": co_credits}
+    )
+    films, distinct_stars = graph.director_degrees()
+    directors = pd.DataFrame(
+        {"DirectorID": np.arange(graph.n_directors), "Films": films, "Stars": distinct_stars}
+    )
+    return stars[stars["Films"] > 0], directors[directors["Films"] > 0]
+
+
+def load_rankings():
+    """
+    Degree of every star (films, co-credits) and director (films, different stars)
+    """
+    return _rankings(_fingerprints("Films", "FilmStar", "FilmDirector"))
+
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def _name_index(kind, fingerprints):
+    table_name, name_column = ENTITY_TABLES[kind]
+    link_name, id_column = ENTITY_LINKS[kind]
+    entities = load_table(table_name)
+    ids = entities[id_column].to_numpy()
+    films = np.bincount(
+        load_table(link_name)[id_column].to_numpy(), minlength=int(ids.max()) + 1
+    )
+    return NameIndex(ids, entities[name_column].astype(str).to_numpy(), films[ids])
+
+
+def load_name_index(kind):
+    """
+    Prefix search over the names of a kind, ranked by number of films
+    """
+    table_name, _ = ENTITY_TABLES[kind]
+    return _name_index(kind, _fingerprints(table_name, ENTITY_LINKS[kind][0]))
+
+
+def _films_by_link(id_column, entity_id):
+    films = load_table("Films")
+    graph = load_graph()
+    if id_column == "StarID":
+        film_ids = graph.films_of_star(entity_id)
+    else:
+        film_ids = graph.films_of_director(entity_id)
+    return films.iloc[graph.film_rows(np.sort(film_ids))][
+        ["Film Title", "IMDb Rating", "Release Year"]
+    ].reset_index(drop=True)
+
+
+def _genre_pairs():
+    genres = load_table("Genres")
+    return load_pairs("Genre").merge(
+        genres.rename(columns={"GenreID": "GenreID1", "Genre": "Genre1Name"})
+    ).merge(genres.rename(columns={"GenreID": "GenreID2", "Genre": "Genre2Name"}))
+
+
+def _genre_top_stars(genre_id, limit=10):
+    top_stars = load_aggregate("GenreTopStars")
+    return top_stars[top_stars["GenreID"] == genre_id].head(limit)
+
+
+# The pandas side of every query of sql_backend.QUERIES
+PANDAS_QUERIES = {
+    "CatalogCounts": lambda: pd.DataFrame(
+        {name: [len(load_table(name))] for name in ["Films", "Genres", "Directors", "Stars"]}
+    ),
+    "TopRatedFilms": lambda limit=10: load_table("Films")
+    .nlargest(limit, "IMDb Rating")[["Film Title", "IMDb Rating", "Release Year"]],
+    "Genres": lambda: load_table("Genres"),
+    "Directors": lambda: load_table("Directors"),
+    "Stars": lambda: load_table("Stars"),
+    "FilmsByDirector": lambda director_id: _films_by_link("DirectorID", director_id),
+    "FilmsByStar": lambda star_id: _films_by_link("StarID", star_id),
+    "Ratings": lambda: load_table("Films")[["IMDb Rating"]],
+    "GenrePairs": _genre_pairs,
+    "GenreTopStars": _genre_top_stars,
+    **{
+        name: functools.partial(load_aggregate, name)
+        for name in AGGREGATES
+        if name != "GenreTopStars"
+    },
+}
+
+
+@st.cache_resource(max_entries=2, show_spinner=False)
+def _database(fingerprints):
+    sources = {
+        os.path.basename(path): _source_digest(path, file_fingerprint(path))
+        for path in map(table_path, sql_backend.TABLES)
+    }
+    return sql_backend.ensure_database(
+        DATABASE_PATH, lambda: {name: load_table(name) for name in sql_backend.TABLES}, sources
+    )
+
+
+def query(name, backend=None, **params):
+    """
+    Result of the named view query, from the pandas tables or pushed down to SQLite
+    so only the result rows reach pandas
+    """
+    backend = backend or BACKEND
+    start = time.perf_counter()
+    reads_before = disk_reads["count"]
+    if backend == "sqlite":
+        db_path = _database(_fingerprints(*sql_backend.TABLES))
+        result = sql_backend.run_query(db_path, name, **params)
+    else:
+        result = PANDAS_QUERIES[name](**params)
+    timing = rerun_timing()
+    timing["queries"] += 1
+    timing["ms"] += (time.perf_counter() - start) * 1000
+    timing["disk_reads"] += disk_reads["count"] - reads_before
+    return result
+
+
+def show_timing():
+    timing = st.session_state.get("data_timing")
+    if timing is None:
+        return
+    st.sidebar.caption(
+        f"Data ({BACKEND}): {timing['queries']} queries, {timing['tables']} tables and "
+        f"{timing['precomputed'] + timing['computed']} aggregates "
+        f"({timing['computed']} computed on the fly) in {timing['ms']:.1f} ms, "
+        f"{timing['disk_reads']} read from disk this rerun "
+        f"({disk_reads['count']} since start)"
+    )
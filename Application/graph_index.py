@@ -0,0 +1,173 @@
+import numpy as np
+
+
+def csr_adjacency(sources, targets, n_sources):
+    """
+    Compressed sparse row adjacency of the edges sources -> targets: the neighbours of
+    node n are indices[indptr[n]:indptr[n + 1]], in the order the edges were given
+    """
+    order = np.argsort(sources, kind="stable")
+    indices = np.asarray(targets, dtype=np.int32)[order]
+    counts = np.bincount(sources, minlength=n_sources)
+    indptr = np.zeros(n_sources + 1, dtype=np.int32)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, indices
+
+
+def gather(indptr, indices, nodes):
+    """
+    Neighbours of every node in nodes and the node each one was reached from, in one
+    vectorized pass over the slices of the CSR arrays
+    """
+    starts = indptr[nodes]
+    degrees = indptr[nodes + 1] - starts
+    owners = np.repeat(nodes, degrees)
+    # Position of every neighbour: its slice start plus its offset inside the slice
+    offsets = np.arange(degrees.sum()) - np.repeat(np.cumsum(degrees) - degrees, degrees)
+    return indices[np.repeat(starts, degrees) + offsets], owners
+
+
+class GraphIndex:
+    """
+    Film <-> star and film <-> director adjacency in both directions, built once from
+    the FilmStar and FilmDirector tables. Nodes are the IDs themselves, so every
+    neighbour lookup is a slice of the CSR arrays, O(degree). film_ids is the FilmID
+    column of the Films table, to find the rows of films without a merge.
+    """
+
+    def __init__(self, film_star_df, film_director_df, film_ids=None):
+        film_stars = film_star_df.drop_duplicates()
+        film_directors = film_director_df.drop_duplicates()
+        star_film = film_stars["FilmID"].to_numpy(np.int32)
+        star_ids = film_stars["StarID"].to_numpy(np.int32)
+        director_film = film_directors["FilmID"].to_numpy(np.int32)
+        director_ids = film_directors["DirectorID"].to_numpy(np.int32)
+
+        film_ids = np.asarray([] if film_ids is None else film_ids, dtype=np.int32)
+        self.n_films = int(
+            max(star_film.max(initial=0), director_film.max(initial=0), film_ids.max(initial=0))
+        ) + 1
+        self.n_stars = int(star_ids.max(initial=0)) + 1
+        self.n_directors = int(director_ids.max(initial=0)) + 1
+
+        self.star_films = csr_adjacency(star_ids, star_film, self.n_stars)
+        self.film_stars = csr_adjacency(star_film, star_ids, self.n_films)
+        self.director_films = csr_adjacency(director_ids, director_film, self.n_directors)
+        self.film_directors = csr_adjacency(director_film, director_ids, self.n_films)
+
+        self.film_row = np.full(self.n_films, -1, dtype=np.int32)
+        self.film_row[film_ids] = np.arange(len(film_ids), dtype=np.int32)
+
+    @staticmethod
+    def _neighbours(adjacency, node):
+        indptr, indices = adjacency
+        if node < 0 or node >= len(indptr) - 1:
+            return indices[:0]
+        return indices[indptr[node] : indptr[node + 1]]
+
+    def films_of_star(self, star_id):
+        return self._neighbours(self.star_films, star_id)
+
+    def stars_of_film(self, film_id):
+        return self._neighbours(self.film_stars, film_id)
+
+    def films_of_director(self, director_id):
+        return self._neighbours(self.director_films, director_id)
+
+    def directors_of_film(self, film_id):
+        return self._neighbours(self.film_directors, film_id)
+
+    def film_rows(self, film_ids):
+        rows = self.film_row[film_ids]
+        return rows[rows >= 0]
+
+    def co_stars(self, star_id, top_k=None):
+        """
+        Stars sharing films with star_id and the number of films they share, most
+        shared first, in O(total cast size of the star's films)
+        """
+        films = self.films_of_star(star_id)
+        stars, _ = gather(*self.film_stars, films)
+        stars = stars[stars != star_id]
+        ids, counts = np.unique(stars, return_counts=True)
+        order = np.lexsort((ids, -counts))[:top_k]
+        return ids[order], counts[order]
+
+    def collaboration_path(self, source_star, target_star, max_depth=12):
+        """
+        Shortest chain star, film, star, ... linking two stars through shared films,
+        found with a breadth-first search expanding a whole level at a time. Returns
+        None when the stars are not connected within max_depth films.
+        """
+        if source_star == target_star:
+            return [int(source_star)]
+        if not (0 <= source_star < self.n_stars and 0 <= target_star < self.n_stars):
+            return None
+        star_parent = np.full(self.n_stars, -1, dtype=np.int32)
+        film_parent = np.full(self.n_films, -1, dtype=np.int32)
+        star_parent[source_star] = source_star
+        frontier = np.array([source_star], dtype=np.int32)
+
+        for _ in range(max_depth):
+            films, owners = gather(*self.star_films, frontier)
+            films, first = np.unique(films, return_index=True)
+            new = film_parent[films] < 0
+            films = films[new]
+            film_parent[films] = owners[first[new]]
+
+            stars, owners = gather(*self.film_stars, films)
+            stars, first = np.unique(stars, return_index=True)
+            new = star_parent[stars] < 0
+            stars = stars[new]
+            star_parent[stars] = owners[first[new]]
+
+            if star_parent[target_star] >= 0:
+                path = [int(target_star)]
+                while path[-1] != source_star:
+                    film = star_parent[path[-1]]
+                    path += [int(film), int(film_parent[film])]
+                return path[::-1]
+            if len(stars) == 0:
+                return None
+            frontier = stars
+        return None
+
+    def star_degrees(self):
+        """
+        Films of every star and its co-credits, the sum of the other cast members
+        over its films (a weighted degree in the star collaboration graph)
+        """
+        star_indptr, star_films = self.star_films
+        film_indptr, _ = self.film_stars
+        films = np.diff(star_indptr)
+        cast_sizes = np.diff(film_indptr)
+        co_credits = np.bincount(
+            np.repeat(np.arange(self.n_stars), films),
+            weights=cast_sizes[star_films] - 1,
+            minlength=self.n_stars,
+        )
+        return films, co_credits.astype(np.int64)
+
+    def distinct_co_stars(self, star_ids):
+        """
+        Number of different stars each star has shared a film with
+        """
+        counts = np.zeros(len(star_ids), dtype=np.int64)
+        for position, star_id in enumerate(star_ids):
+            films = self.films_of_star(star_id)
+            stars, _ = gather(*self.film_stars, films)
+            counts[position] = len(np.unique(stars)) - (len(films) > 0)
+        return counts
+
+    def director_degrees(self):
+        """
+        Films of every director and the number of different stars they directed
+        """
+        indptr, films = self.director_films
+        film_count = np.diff(indptr)
+        stars, _ = gather(*self.film_stars, films)
+        cast_sizes = np.diff(self.film_stars[0])[films]
+        directors = np.repeat(np.repeat(np.arange(self.n_directors), film_count), cast_sizes)
+        pairs = np.unique(directors.astype(np.int64) * self.n_stars + stars)
+        distinct_stars = np.bincount(pairs // self.n_stars, minlength=self.n_directors)
+        return film_count, distinct_stars
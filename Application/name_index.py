@@ -0,0 +1,57 @@
+import numpy as np
+
+
+class NameIndex:
+    """
+    Prefix search over the names of a dimension (stars, directors, ...). Every word of
+    a name starts a key ("tom hanks" and "hanks"), the keys are sorted once, and a
+    prefix is answered with two binary searches. Matches are ranked by weight, e.g.
+    the number of films, so the most relevant names come first.
+    """
+
+    def __init__(self, ids, names, weights=None):
+        self.ids = np.asarray(ids)
+        self.names = np.asarray(names, dtype=object)
+        self.weights = (
+            np.zeros(len(self.ids)) if weights is None else np.asarray(weights, dtype=float)
+        )
+        self.position = dict(zip(self.ids.tolist(), range(len(self.ids))))
+
+        keys, owners = [], []
+        for row, name in enumerate(self.names):
+            words = str(name).lower().split()
+            for start in range(len(words)):
+                keys.append(" ".join(words[start:]))
+                owners.append(row)
+        order = np.argsort(np.array(keys, dtype=str), kind="stable")
+        self.keys = np.array(keys, dtype=str)[order]
+        self.owners = np.array(owners, dtype=np.int64)[order]
+        # Whole index, heaviest first, for an empty prefix
+        self.by_weight = np.lexsort((np.arange(len(self.ids)), -self.weights))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def name_of(self, entity_id):
+        return self.names[self.position[entity_id]]
+
+    def matching_rows(self, prefix):
+        prefix = " ".join(prefix.lower().split())
+        if not prefix:
+            return self.by_weight
+        low = np.searchsorted(self.keys, prefix, side="left")
+        high = np.searchsorted(self.keys, prefix + "\U0010ffff", side="left")
+        return np.unique(self.owners[low:high])
+
+    def search(self, prefix, limit=50):
+        """
+        IDs and names of the names with a word starting with prefix, the limit
+        heaviest ones, and how many names matched in total
+        """
+        rows = self.matching_rows(prefix)
+        total = len(rows)
+        if total > limit:
+            heaviest = np.argpartition(-self.weights[rows], limit - 1)[:limit]
+            rows = rows[heaviest]
+        rows = rows[np.lexsort((rows, -self.weights[rows]))]
+        return self.ids[rows], self.names[rows], total
@@ -0,0 +1,154 @@
+import time
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+# Bars a chart shows at most, the rest of the dimension stays on the server
+CHART_TOP_K = 30
+TABLE_PAGE_SIZE = 25
+SEARCH_LIMIT = 50
+# Session key of the sidebar checkbox that weighs what every element sends
+MEASURE_PAYLOAD_KEY = "measure_payload"
+
+
+def render_stats():
+    return st.session_state.setdefault(
+        "render_stats", {"elements": 0, "bytes": 0, "ms": 0.0, "rows_held_back": 0}
+    )
+
+
+def begin_render():
+    st.session_state.pop("render_stats", None)
+
+
+def _record(start, payload_bytes, rows_held_back=0):
+    """
+    payload_bytes returns the size of what the element sent. It encodes the element a
+    second time (Streamlit encodes it for itself), so it is only called when the
+    payload is measured.
+    """
+    stats = render_stats()
+    stats["elements"] += 1
+    stats["ms"] += (time.perf_counter() - start) * 1000
+    stats["rows_held_back"] += rows_held_back
+    if st.session_state.get(MEASURE_PAYLOAD_KEY, False):
+        stats["bytes"] += payload_bytes()
+
+
+def frame_bytes(df):
+    """
+    Size of the Arrow buffers Streamlit sends for a dataframe
+    """
+    return pa.Table.from_pandas(df, preserve_index=False).nbytes
+
+
+def top_k(df, column, k=CHART_TOP_K):
+    """
+    The k rows with the largest column and the number of rows left out
+    """
+    if len(df) <= k:
+        return df, 0
+    return df.nlargest(k, column), len(df) - k
+
+
+def bin_values(values, bins=20):
+    """
+    Histogram computed on the server, one row per bin instead of one per value
+    """
+    values = pd.Series(values).dropna().to_numpy(dtype=float)
+    counts, edges = np.histogram(values, bins=bins)
+    return pd.DataFrame(
+        {
+            "Bin": [f"{low:.2f}–{high:.2f}" for low, high in zip(edges[:-1], edges[1:])],
+            "Start": edges[:-1],
+            "Count": counts,
+        }
+    )
+
+
+def show_chart(fig, rows_held_back=0):
+    start = time.perf_counter()
+    st.plotly_chart(fig)
+    _record(start, lambda: len(fig.to_json()), rows_held_back)
+
+
+def show_bar_chart(series, rows_held_back=0):
+    start = time.perf_counter()
+    st.bar_chart(series)
+    _record(start, lambda: frame_bytes(series.reset_index()), rows_held_back)
+
+
+def held_back_caption(shown, held_back, noun):
+    if held_back:
+        st.caption(f"Top {shown} of {shown + held_back} {noun}")
+
+
+def paginate(df, key, page_size=TABLE_PAGE_SIZE):
+    """
+    The rows of the page picked with a page number input, every row when they fit
+    on one page
+    """
+    pages = max(1, -(-len(df) // page_size))
+    if pages == 1:
+        return df
+    page = st.number_input(
+        f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1, key=key
+    )
+    first = (page - 1) * page_size
+    st.caption(f"Rows {first + 1}–{min(first + page_size, len(df))} of {len(df)}")
+    return df.iloc[first : first + page_size]
+
+
+def show_table(df, key, page_size=TABLE_PAGE_SIZE, interactive=False):
+    """
+    st.table (or st.dataframe) of one page of the rows
+    """
+    start = time.perf_counter()
+    page = paginate(df, key, page_size)
+    if interactive:
+        st.dataframe(page)
+    else:
+        st.table(page)
+    _record(start, lambda: frame_bytes(page), len(df) - len(page))
+
+
+def search_select(label, index, key, limit=SEARCH_LIMIT, column=st, default=0):
+    """
+    Pick a name by typing the start of any of its words, only the best matches of the
+    sorted index reach the select box. Returns the ID and name, None when nothing
+    matches. default is the position of the match selected first.
+    """
+    prefix = column.text_input(f"{label} (type to search)", key=f"{key}_search")
+    ids, names, total = index.search(prefix, limit)
+    if total == 0:
+        column.write(f"No name starts with '{prefix}'.")
+        return None, None
+    # IDs as options, so the selection survives a prefix that still matches it
+    labels = dict(zip(ids.tolist(), names))
+    choice = column.selectbox(
+        label,
+        list(labels),
+        index=min(default, len(labels) - 1),
+        format_func=labels.get,
+        key=key,
+    )
+    if total > limit:
+        column.caption(f"{limit} of {total} matches, keep typing to narrow them down")
+    return choice, labels[choice]
+
+
+def show_render_stats():
+    measured = st.sidebar.checkbox(
+        "Measure the payload",
+        key=MEASURE_PAYLOAD_KEY,
+        help="Weighs what every chart and table sends, by encoding it a second time",
+    )
+    stats = st.session_state.get("render_stats")
+    if stats is None:
+        return
+    payload = f", {stats['bytes'] / 1024:.1f} KB sent" if measured else ""
+    st.sidebar.caption(
+        f"Render: {stats['elements']} elements{payload} in {stats['ms']:.1f} ms, "
+        f"{stats['rows_held_back']} rows kept on the server"
+    )
@@ -0,0 +1,137 @@
+import os
+import argparse
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from transformers import AutoTokenizer
+
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Models")
+MODEL_PATH = os.environ.get(
+    "IMDB_RANK_MODEL", os.path.join(MODELS_DIR, "review_rank_predictor_model.pth")
+)
+# The tokenizer the model was trained with, saved locally so loading never hits the hub
+TOKENIZER_NAME = "bert-base-multilingual-cased"
+TOKENIZER_PATH = os.environ.get("IMDB_TOKENIZER_PATH", os.path.join(MODELS_DIR, "tokenizer"))
+
+# Training configuration: the model reads the first 128 token IDs of a review
+INPUT_DIM = 128
+HIDDEN_DIM = 256
+OUTPUT_DIM = 10  # Number of unique ranks (classes)
+
+
+class ReviewRankPredictor(nn.Module):
+    def __init__(self, input_dim, hidden_dim, output_dim):
+        super(ReviewRankPredictor, self).__init__()
+        self.fc1 = nn.Linear(input_dim, hidden_dim)
+        self.relu = nn.ReLU()
+        self.fc2 = nn.Linear(hidden_dim, hidden_dim)
+        self.fc3 = nn.Linear(hidden_dim, output_dim)
+
+    def forward(self, x):
+        out = self.fc1(x)
+        out = self.relu(out)
+        out = self.fc2(out)
+        out = self.relu(out)
+        out = self.fc3(out)
+        return out
+
+
+def load_model(model_path=MODEL_PATH, quantize=False):
+    """
+    The trained model in evaluation mode, with its Linear layers dynamically
+    quantized to int8 when quantize is set (CPU only)
+    """
+    model = ReviewRankPredictor(INPUT_DIM, HIDDEN_DIM, OUTPUT_DIM)
+    model.load_state_dict(
+        torch.load(model_path, map_location=torch.device("cpu"), weights_only=True)
+    )
+    model.eval()
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def load_tokenizer(tokenizer_path=TOKENIZER_PATH):
+    if not os.path.isdir(tokenizer_path):
+        raise FileNotFoundError(
+            f"No tokenizer in '{tokenizer_path}', save it once with "
+            f"`python Application/review_rank.py --save-tokenizer`"
+        )
+    return AutoTokenizer.from_pretrained(tokenizer_path, local_files_only=True)
+
+
+def encode(tokenizer, texts):
+    """
+    Token IDs of a batch of reviews, the model's inputs. The batch is padded to its
+    longest review only, then extended with padding to the 128 inputs of the model,
+    which gives the same features as padding every review to 128 tokens.
+    """
+    encoding = tokenizer(
+        list(texts),
+        truncation=True,
+        max_length=INPUT_DIM,
+        padding="longest",
+        return_tensors="pt",
+    )
+    input_ids = encoding["input_ids"]
+    return F.pad(input_ids, (0, INPUT_DIM - input_ids.shape[1]), value=tokenizer.pad_token_id)
+
+
+class RankPredictor:
+    """
+    Batched review rank inference, the model and tokenizer are loaded once and
+    shared by every call
+    """
+
+    def __init__(self, model, tokenizer, batch_size=256):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.batch_size = batch_size
+
+    def encode(self, texts):
+        return encode(self.tokenizer, texts).float()
+
+    def predict_features(self, features):
+        with torch.inference_mode():
+            return torch.argmax(self.model(features), dim=1).numpy()
+
+    def predict(self, texts):
+        """
+        Predicted rank (0-9) of every review, batch_size reviews per forward pass
+        """
+        texts = list(texts)
+        ranks = [
+            self.predict_features(self.encode(texts[start : start + self.batch_size]))
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        return np.concatenate(ranks) if ranks else np.array([], dtype=np.int64)
+
+
+def load_predictor(
+    model_path=MODEL_PATH, tokenizer_path=TOKENIZER_PATH, quantize=False, batch_size=256
+):
+    return RankPredictor(
+        load_model(model_path, quantize), load_tokenizer(tokenizer_path), batch_size
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Predict the rank of reviews")
+    parser.add_argument("texts", nargs="*", help="Reviews to rank")
+    parser.add_argument(
+        "--save-tokenizer",
+        action="store_true",
+        help=f"Download {TOKENIZER_NAME} once and save it to {TOKENIZER_PATH}",
+    )
+    parser.add_argument("--quantize", action="store_true", help="Dynamic int8 quantization")
+    args = parser.parse_args()
+
+    if args.save_tokenizer:
+        AutoTokenizer.from_pretrained(TOKENIZER_NAME).save_pretrained(TOKENIZER_PATH)
+        print(f"Tokenizer saved to '{TOKENIZER_PATH}'")
+    if args.texts:
+        predictor = load_predictor(quantize=args.quantize)
+        for text, rank in zip(args.texts, predictor.predict(args.texts)):
+            print(f"{rank}/10  {text[:80]}")
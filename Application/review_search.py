@@ -0,0 +1,176 @@
+import os
+import re
+import sqlite3
+import numpy as np
+import pandas as pd
+
+# Built and kept up to date by Scrapping/ReviewIndex.py, ReviewScraper.py updates it
+# after every movie
+REVIEW_INDEX_PATH = os.environ.get(
+    "IMDB_REVIEW_INDEX", os.path.join("CSV Folder", "Review Index.db")
+)
+
+# Only the IDs of the page asked for leave FTS5, a title match counts twice as much as
+# a match in the review text and the movie token does not count
+RANKED_SQL = """
+    SELECT rowid AS ReviewID, rank AS Score
+    FROM reviewsText
+    WHERE reviewsText MATCH :match AND rank MATCH 'bm25(2.0, 1.0, 0.0)'
+    ORDER BY rank LIMIT :limit OFFSET :offset
+"""
+
+HITS_SQL = """
+    SELECT reviews.ReviewID, movies.Movie, reviews.Rank, reviews.Title, reviews.Review
+    FROM reviews JOIN movies ON movies.MovieID = reviews.MovieID
+    WHERE reviews.ReviewID IN (SELECT value FROM json_each(:ids))
+"""
+
+HIT_COLUMNS = ["Movie", "Rank", "Title", "Excerpt", "Score"]
+FACET_COLUMNS = ["MovieID", "Movie", "Hits", "Average Rank"]
+
+
+def query_words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def match_expression(text, movie_id=None):
+    """
+    FTS5 query of the words typed: every word must appear in the title or the review,
+    the last one can be the start of a word so results show up while typing
+    """
+    words = query_words(text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    match = "{Title Review} : (" + " ".join(terms) + ")"
+    if movie_id is not None:
+        match = f'MovieKey : "movie{int(movie_id)}" AND {match}'
+    return match
+
+
+def excerpt(text, words, width=24):
+    """
+    The words of the review around the first match, matches in bold
+    """
+    if not words:
+        return ""
+    # Same rule as the match: whole words, the last one as a prefix
+    alternatives = [re.escape(word) + r"\b" for word in words[:-1]] + [re.escape(words[-1])]
+    pattern = re.compile(r"\b(?:" + "|".join(alternatives) + r")\w*", re.IGNORECASE)
+    tokens = str(text).split()
+    first = next((i for i, token in enumerate(tokens) if pattern.search(token)), 0)
+    start = max(0, first - width // 4)
+    shown = " ".join(
+        pattern.sub(lambda found: f"**{found.group(0)}**", token)
+        for token in tokens[start : start + width]
+    )
+    return ("… " if start else "") + shown + (" …" if start + width < len(tokens) else "")
+
+
+def connect(db_path):
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+
+
+def index_exists(db_path=REVIEW_INDEX_PATH):
+    return os.path.exists(db_path)
+
+
+def index_fingerprint(db_path=REVIEW_INDEX_PATH):
+    """
+    Changes whenever the index is updated, the write-ahead log included
+    """
+    return tuple(
+        (os.path.getmtime(path), os.path.getsize(path))
+        for path in (db_path, db_path + "-wal")
+        if os.path.exists(path)
+    )
+
+
+def search(text, movie_id=None, limit=20, offset=0, db_path=REVIEW_INDEX_PATH):
+    """
+    Best ranked reviews matching the text, in one movie when movie_id is given
+    """
+    match = match_expression(text, movie_id)
+    if match is None:
+        return pd.DataFrame(columns=HIT_COLUMNS)
+    connection = connect(db_path)
+    try:
+        ranked = pd.read_sql_query(
+            RANKED_SQL,
+            connection,
+            params={"match": match, "limit": limit, "offset": offset},
+        )
+        hits = pd.read_sql_query(
+            HITS_SQL, connection, params={"ids": ranked["ReviewID"].to_json(orient="values")}
+        )
+    finally:
+        connection.close()
+    hits = ranked.merge(hits, on="ReviewID")
+    words = query_words(text)
+    hits["Excerpt"] = [excerpt(review, words) for review in hits["Review"]]
+    return hits[HIT_COLUMNS]
+
+
+def review_movies(db_path=REVIEW_INDEX_PATH):
+    """
+    Movie and rank of every review, indexed by ReviewID, to count the hits of a query
+    per movie without looking the matching reviews up one at a time
+    """
+    connection = connect(db_path)
+    try:
+        rows = pd.read_sql_query(
+            "SELECT ReviewID, MovieID, Rank FROM reviews", connection
+        )
+        movies = pd.read_sql_query(
+            "SELECT MovieID, Movie FROM movies", connection
+        ).set_index("MovieID")["Movie"]
+    finally:
+        connection.close()
+    size = int(rows["ReviewID"].max()) + 1 if len(rows) else 1
+    movie_of = np.zeros(size, dtype=np.int64)
+    rank_of = np.full(size, np.nan)
+    movie_of[rows["ReviewID"]] = rows["MovieID"]
+    rank_of[rows["ReviewID"]] = rows["Rank"]
+    return movie_of, rank_of, movies
+
+
+def facets(text, reviews=None, db_path=REVIEW_INDEX_PATH):
+    """
+    Number of matching reviews per movie, the movies with the most hits first.
+    reviews is review_movies(db_path), loaded here when not given.
+    """
+    match = match_expression(text)
+    if match is None:
+        return pd.DataFrame(columns=FACET_COLUMNS)
+    movie_of, rank_of, movies = reviews if reviews is not None else review_movies(db_path)
+    connection = connect(db_path)
+    try:
+        review_ids = np.fromiter(
+            (row[0] for row in connection.execute(
+                "SELECT rowid FROM reviewsText WHERE reviewsText MATCH ?", (match,)
+            )),
+            dtype=np.int64,
+        )
+    finally:
+        connection.close()
+    # Reviews indexed after review_movies was loaded have no movie yet
+    review_ids = review_ids[review_ids < len(movie_of)]
+    hit_movies = movie_of[review_ids]
+    ranks = rank_of[review_ids]
+    ranked = ~np.isnan(ranks)
+    hits = np.bincount(hit_movies)
+    rank_sums = np.bincount(hit_movies[ranked], weights=ranks[ranked], minlength=len(hits))
+    rank_counts = np.bincount(hit_movies[ranked], minlength=len(hits))
+    movie_ids = np.flatnonzero(hits)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        average = rank_sums[movie_ids] / rank_counts[movie_ids]
+    result = pd.DataFrame(
+        {
+            "MovieID": movie_ids,
+            "Movie": movies.reindex(movie_ids).to_numpy(),
+            "Hits": hits[movie_ids],
+            "Average Rank": average,
+        }
+    )
+    return result.sort_values(["Hits", "Movie"], ascending=[False, True], ignore_index=True)
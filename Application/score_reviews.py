@@ -0,0 +1,258 @@
+import os
+import json
+import argparse
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import torch
+from review_rank import (
+    MODEL_PATH,
+    TOKENIZER_PATH,
+    RankPredictor,
+    encode,
+    load_model,
+    load_tokenizer,
+)
+
+CHECKPOINT_FILE = "checkpoint.json"
+PREDICTIONS_FOLDER = "predictions"
+
+# Tokenizer of every worker process, loaded once by the pool initializer
+worker_tokenizer = None
+
+
+def init_worker(tokenizer_path):
+    global worker_tokenizer
+    # One thread per worker, the pool already has a process per core
+    torch.set_num_threads(1)
+    worker_tokenizer = load_tokenizer(tokenizer_path)
+
+
+def tokenize_chunk(texts):
+    return encode(worker_tokenizer, texts).numpy().astype(np.int32)
+
+
+def review_texts(chunk):
+    # Headline and review together, like the prediction page
+    titles = chunk["Title"].fillna("").astype(str)
+    return (titles + " " + chunk["Review"].fillna("").astype(str)).tolist()
+
+
+def input_stamp(input_path):
+    stat = os.stat(input_path)
+    return {"input": os.path.abspath(input_path), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+
+def write_json(path, data):
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(data, file)
+    os.replace(temporary_path, path)
+
+
+def load_checkpoint(output_path, stamp, chunk_rows):
+    """
+    Where a previous run on the same input stopped: the next chunk and the confusion
+    counts of the chunks already written
+    """
+    checkpoint_path = os.path.join(output_path, CHECKPOINT_FILE)
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as file:
+            checkpoint = json.load(file)
+        if checkpoint["stamp"] == stamp and checkpoint["chunkRows"] == chunk_rows:
+            confusion = Counter(
+                {
+                    (movie, rank, predicted): count
+                    for movie, rank, predicted, count in checkpoint["confusion"]
+                }
+            )
+            return checkpoint["nextChunk"], confusion
+        print("Input or chunk size changed since the checkpoint, starting over")
+    return 0, Counter()
+
+
+def save_checkpoint(output_path, stamp, chunk_rows, next_chunk, confusion):
+    write_json(
+        os.path.join(output_path, CHECKPOINT_FILE),
+        {
+            "stamp": stamp,
+            "chunkRows": chunk_rows,
+            "nextChunk": next_chunk,
+            "confusion": [[*key, count] for key, count in confusion.items()],
+        },
+    )
+
+
+def write_predictions(output_path, chunk_index, chunk, predicted):
+    """
+    One Parquet file per chunk, written under a temporary name and renamed so a
+    crashed run never leaves a partial file behind
+    """
+    folder_path = os.path.join(output_path, PREDICTIONS_FOLDER)
+    os.makedirs(folder_path, exist_ok=True)
+    table = pa.table(
+        {
+            "Row": pa.array(chunk.index.to_numpy(), pa.int64()),
+            "Movie": pa.array(chunk["Movie"].astype(str).tolist()).dictionary_encode(),
+            "Rank": pa.array(pd.to_numeric(chunk["Rank"], errors="coerce").astype("Int8")),
+            "PredictedRank": pa.array(predicted.astype(np.int8)),
+        }
+    )
+    file_path = os.path.join(folder_path, f"part-{chunk_index:06d}.parquet")
+    pq.write_table(table, f"{file_path}.tmp", compression="zstd")
+    os.replace(f"{file_path}.tmp", file_path)
+
+
+def clear_predictions(output_path):
+    # Parts of an older run would otherwise outlive a shorter input
+    folder_path = os.path.join(output_path, PREDICTIONS_FOLDER)
+    if os.path.isdir(folder_path):
+        for file_name in os.listdir(folder_path):
+            if file_name.startswith("part-"):
+                os.remove(os.path.join(folder_path, file_name))
+
+
+def update_confusion(confusion, chunk, predicted):
+    ranks = pd.to_numeric(chunk["Rank"], errors="coerce")
+    pairs = pd.DataFrame(
+        {"Movie": chunk["Movie"].astype(str), "Rank": ranks, "Predicted": predicted}
+    )
+    pairs = pairs.dropna(subset=["Rank"])
+    counts = pairs.groupby(["Movie", "Rank", "Predicted"]).size()
+    for (movie, rank, predicted_rank), count in counts.items():
+        confusion[(movie, int(rank), int(predicted_rank))] += int(count)
+
+
+def write_aggregates(output_path, confusion):
+    """
+    Predicted vs actual rank counts per movie and a per-movie summary
+    """
+    confusion_df = pd.DataFrame(
+        [(*key, count) for key, count in confusion.items()],
+        columns=["Movie", "Rank", "PredictedRank", "Count"],
+    ).sort_values(["Movie", "Rank", "PredictedRank"])
+    confusion_df.to_parquet(os.path.join(output_path, "confusion.parquet"), index=False)
+
+    count = confusion_df["Count"]
+    error = confusion_df["Rank"] - confusion_df["PredictedRank"]
+    movies = (
+        confusion_df.assign(
+            RankSum=confusion_df["Rank"] * count,
+            PredictedSum=confusion_df["PredictedRank"] * count,
+            Exact=(error == 0) * count,
+            AbsoluteError=error.abs() * count,
+        )
+        .groupby("Movie")[["Count", "RankSum", "PredictedSum", "Exact", "AbsoluteError"]]
+        .sum()
+    )
+    summary = pd.DataFrame(
+        {
+            "Reviews": movies["Count"],
+            "MeanRank": movies["RankSum"] / movies["Count"],
+            "MeanPredictedRank": movies["PredictedSum"] / movies["Count"],
+            "Accuracy": movies["Exact"] / movies["Count"],
+            "MeanAbsoluteError": movies["AbsoluteError"] / movies["Count"],
+        }
+    ).reset_index()
+    summary.to_parquet(os.path.join(output_path, "movies.parquet"), index=False)
+    return summary
+
+
+def score_reviews(
+    input_path,
+    output_path,
+    chunk_rows=10_000,
+    workers=None,
+    batch_size=512,
+    quantize=False,
+    model_path=MODEL_PATH,
+    tokenizer_path=TOKENIZER_PATH,
+    restart=False,
+):
+    """
+    Stream Review.csv in chunks: workers tokenize the chunks, the model predicts them
+    in batches, and every chunk is written and checkpointed before the next ones are
+    read, so memory stays at a few chunks whatever the size of the input
+    """
+    os.makedirs(output_path, exist_ok=True)
+    stamp = input_stamp(input_path)
+    next_chunk, confusion = 0, Counter()
+    if not restart:
+        next_chunk, confusion = load_checkpoint(output_path, stamp, chunk_rows)
+    if next_chunk:
+        print(f"Resuming at chunk {next_chunk} (row {next_chunk * chunk_rows})")
+    else:
+        clear_predictions(output_path)
+
+    model = load_model(model_path, quantize)
+    predictor = RankPredictor(model, tokenizer=None, batch_size=batch_size)
+    workers = workers or os.cpu_count()
+    reader = pd.read_csv(
+        input_path, chunksize=chunk_rows, dtype={"Movie": str, "Title": str, "Review": str}
+    )
+    pending = deque()
+    scored = 0
+
+    def finish_oldest():
+        nonlocal scored
+        chunk_index, chunk, future = pending.popleft()
+        features = torch.from_numpy(future.result()).float()
+        predicted = np.concatenate(
+            [
+                predictor.predict_features(features[start : start + batch_size])
+                for start in range(0, len(features), batch_size)
+            ]
+        )
+        write_predictions(output_path, chunk_index, chunk, predicted)
+        update_confusion(confusion, chunk, predicted)
+        save_checkpoint(output_path, stamp, chunk_rows, chunk_index + 1, confusion)
+        scored += len(chunk)
+        print(f"Chunk {chunk_index}: {len(chunk)} reviews scored ({scored} this run)")
+
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(tokenizer_path,)) as pool:
+        for chunk_index, chunk in enumerate(reader):
+            # Reviews span lines, so the chunks already scored are parsed and skipped
+            if chunk_index < next_chunk:
+                continue
+            future = pool.submit(tokenize_chunk, review_texts(chunk))
+            pending.append((chunk_index, chunk, future))
+            # Bounded read-ahead: at most two chunks per worker in memory
+            if len(pending) >= 2 * workers:
+                finish_oldest()
+        while pending:
+            finish_oldest()
+
+    summary = write_aggregates(output_path, confusion)
+    print(f"Scored {scored} reviews, {len(summary)} movies in '{output_path}'")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Score Review.csv with the review rank model, chunk by chunk"
+    )
+    parser.add_argument("--input", default=os.path.join("CSV Folder", "Review.csv"))
+    parser.add_argument("--output", default=os.path.join("CSV Folder", "Review Scores"))
+    parser.add_argument("--chunk-rows", type=int, default=10_000)
+    parser.add_argument(
+        "--workers", type=int, default=None, help="Tokenizer processes (default: one per core)"
+    )
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--quantize", action="store_true", help="Dynamic int8 quantization")
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore the checkpoint and score everything again"
+    )
+    args = parser.parse_args()
+
+    score_reviews(
+        args.input,
+        args.output,
+        chunk_rows=args.chunk_rows,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        quantize=args.quantize,
+        restart=args.restart,
+    )
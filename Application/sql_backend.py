@@ -0,0 +1,186 @@
+import os
+import json
+import sqlite3
+import pandas as pd
+
+
+SCHEMA = """
+CREATE TABLE Films (
+    FilmID INTEGER PRIMARY KEY,
+    "Film Title" TEXT,
+    "IMDb Rating" REAL,
+    "Release Year" INTEGER,
+    "Movie Image" TEXT
+);
+CREATE TABLE Genres (GenreID INTEGER PRIMARY KEY, Genre TEXT);
+CREATE TABLE Directors (DirectorID INTEGER PRIMARY KEY, Director TEXT);
+CREATE TABLE Stars (StarID INTEGER PRIMARY KEY, Star TEXT);
+CREATE TABLE FilmGenre (FilmID INTEGER, GenreID INTEGER);
+CREATE TABLE FilmDirector (FilmID INTEGER, DirectorID INTEGER);
+CREATE TABLE FilmStar (FilmID INTEGER, StarID INTEGER);
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Both directions of every link table, each index covers the join it serves
+INDEXES = """
+CREATE INDEX FilmGenreByFilm ON FilmGenre (FilmID, GenreID);
+CREATE INDEX FilmGenreByGenre ON FilmGenre (GenreID, FilmID);
+CREATE INDEX FilmDirectorByFilm ON FilmDirector (FilmID, DirectorID);
+CREATE INDEX FilmDirectorByDirector ON FilmDirector (DirectorID, FilmID);
+CREATE INDEX FilmStarByFilm ON FilmStar (FilmID, StarID);
+CREATE INDEX FilmStarByStar ON FilmStar (StarID, FilmID);
+CREATE INDEX FilmsByRating ON Films ("IMDb Rating" DESC, FilmID);
+"""
+
+TABLES = ["Films", "Genres", "Directors", "Stars", "FilmGenre", "FilmDirector", "FilmStar"]
+
+# The query behind every dashboard view, named parameters are bound by run_query
+QUERIES = {
+    "CatalogCounts": """
+        SELECT (SELECT COUNT(*) FROM Films) AS Films,
+               (SELECT COUNT(*) FROM Genres) AS Genres,
+               (SELECT COUNT(*) FROM Directors) AS Directors,
+               (SELECT COUNT(*) FROM Stars) AS Stars
+    """,
+    "TopRatedFilms": """
+        SELECT "Film Title", "IMDb Rating", "Release Year" FROM Films
+        ORDER BY "IMDb Rating" DESC, FilmID LIMIT :limit
+    """,
+    "Genres": "SELECT GenreID, Genre FROM Genres ORDER BY GenreID",
+    "Directors": "SELECT DirectorID, Director FROM Directors ORDER BY DirectorID",
+    "Stars": "SELECT StarID, Star FROM Stars ORDER BY StarID",
+    "FilmsByDirector": """
+        SELECT Films."Film Title", Films."IMDb Rating", Films."Release Year"
+        FROM FilmDirector JOIN Films ON Films.FilmID = FilmDirector.FilmID
+        WHERE FilmDirector.DirectorID = :director_id ORDER BY FilmDirector.FilmID
+    """,
+    "FilmsByStar": """
+        SELECT Films."Film Title", Films."IMDb Rating", Films."Release Year"
+        FROM FilmStar JOIN Films ON Films.FilmID = FilmStar.FilmID
+        WHERE FilmStar.StarID = :star_id ORDER BY FilmStar.FilmID
+    """,
+    "Ratings": 'SELECT "IMDb Rating" FROM Films ORDER BY FilmID',
+    "GenrePairs": """
+        WITH FilmGenres AS (SELECT DISTINCT FilmID, GenreID FROM FilmGenre)
+        SELECT a.GenreID AS GenreID1, b.GenreID AS GenreID2, COUNT(*) AS Count,
+               g1.Genre AS Genre1Name, g2.Genre AS Genre2Name
+        FROM FilmGenres a
+        JOIN FilmGenres b ON b.FilmID = a.FilmID AND b.GenreID > a.GenreID
+        JOIN Genres g1 ON g1.GenreID = a.GenreID
+        JOIN Genres g2 ON g2.GenreID = b.GenreID
+        GROUP BY a.GenreID, b.GenreID ORDER BY Count DESC, a.GenreID, b.GenreID
+    """,
+    "GenreCounts": """
+        SELECT FilmGenre.GenreID, COUNT(*) AS Count, Genres.Genre
+        FROM FilmGenre JOIN Genres ON Genres.GenreID = FilmGenre.GenreID
+        GROUP BY FilmGenre.GenreID ORDER BY Count DESC, FilmGenre.GenreID
+    """,
+    "DirectorCounts": """
+        SELECT FilmDirector.DirectorID, COUNT(*) AS Count, Directors.Director
+        FROM FilmDirector JOIN Directors ON Directors.DirectorID = FilmDirector.DirectorID
+        GROUP BY FilmDirector.DirectorID ORDER BY Count DESC, FilmDirector.DirectorID
+    """,
+    "StarCounts": """
+        SELECT FilmStar.StarID, COUNT(*) AS Count, Stars.Star
+        FROM FilmStar JOIN Stars ON Stars.StarID = FilmStar.StarID
+        GROUP BY FilmStar.StarID ORDER BY Count DESC, FilmStar.StarID
+    """,
+    "DirectorRatings": """
+        SELECT Directors.Director, AVG(Films."IMDb Rating") AS "IMDb Rating"
+        FROM FilmDirector
+        JOIN Films ON Films.FilmID = FilmDirector.FilmID
+        JOIN Directors ON Directors.DirectorID = FilmDirector.DirectorID
+        GROUP BY Directors.Director ORDER BY Directors.Director
+    """,
+    "StarRatings": """
+        SELECT Stars.Star, AVG(Films."IMDb Rating") AS "IMDb Rating"
+        FROM FilmStar
+        JOIN Films ON Films.FilmID = FilmStar.FilmID
+        JOIN Stars ON Stars.StarID = FilmStar.StarID
+        GROUP BY Stars.Star ORDER BY Stars.Star
+    """,
+    "GenrePopularity": """
+        SELECT Films."Release Year", Genres.Genre, COUNT(*) AS Count
+        FROM FilmGenre
+        JOIN Films ON Films.FilmID = FilmGenre.FilmID
+        JOIN Genres ON Genres.GenreID = FilmGenre.GenreID
+        GROUP BY Films."Release Year", Genres.Genre
+        ORDER BY Films."Release Year", Genres.Genre
+    """,
+    "GenreTopStars": """
+        WITH FilmsInGenre AS (
+            SELECT DISTINCT FilmID FROM FilmGenre WHERE GenreID = :genre_id
+        )
+        SELECT :genre_id AS GenreID, FilmStar.StarID, COUNT(*) AS Count, Stars.Star
+        FROM FilmsInGenre
+        JOIN FilmStar ON FilmStar.FilmID = FilmsInGenre.FilmID
+        JOIN Stars ON Stars.StarID = FilmStar.StarID
+        GROUP BY FilmStar.StarID ORDER BY Count DESC, FilmStar.StarID LIMIT :limit
+    """,
+    "ReleaseTrends": """
+        SELECT "Release Year", COUNT(*) AS Count FROM Films
+        WHERE "Release Year" IS NOT NULL
+        GROUP BY "Release Year" ORDER BY "Release Year"
+    """,
+}
+
+
+def read_sources(connection):
+    row = connection.execute("SELECT value FROM meta WHERE key = 'sources'").fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def build_database(db_path, tables, sources):
+    """
+    Write the normalized tables to a new SQLite file with the link table indexes, and
+    swap it in place of the old one so readers never see a half-built database
+    """
+    temporary_path = f"{db_path}.building"
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+    connection = sqlite3.connect(temporary_path)
+    try:
+        connection.executescript(SCHEMA)
+        for name in TABLES:
+            df = tables[name]
+            # Categorical columns of the Arrow files go in as plain values
+            df = df.astype({column: object for column in df.select_dtypes("category")})
+            df.to_sql(name, connection, if_exists="append", index=False)
+        connection.executescript(INDEXES)
+        connection.execute(
+            "INSERT INTO meta (key, value) VALUES ('sources', ?)", (json.dumps(sources),)
+        )
+        connection.commit()
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+    os.replace(temporary_path, db_path)
+
+
+def ensure_database(db_path, load_tables, sources):
+    """
+    Rebuild the database when the tables it was loaded from changed, sources is any
+    JSON-able stamp of those tables (e.g. their file digests)
+    """
+    if os.path.exists(db_path):
+        connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            if read_sources(connection) == sources:
+                return db_path
+        except sqlite3.DatabaseError:
+            pass
+        finally:
+            connection.close()
+    build_database(db_path, load_tables(), sources)
+    return db_path
+
+
+def run_query(db_path, name, **params):
+    """
+    Run a view query on a read-only connection, only the result rows are fetched
+    """
+    connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return pd.read_sql_query(QUERIES[name], connection, params=params)
+    finally:
+        connection.close()
@@ -0,0 +1,129 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urljoin
+import pytest
+import requests
+from lxml import html
+from selenium.common.exceptions import NoSuchElementException
+from fixtures import read_fixture
+from parsing_cases import ROUTES
+
+# Header the HtmlDriver sends, the fixture site fails only the other clients
+DRIVER_HEADER = "X-Html-Driver"
+
+
+class HtmlElement:
+    def __init__(self, driver, node):
+        self.driver = driver
+        self.node = node
+
+    @property
+    def text(self):
+        return self.node.text_content().strip()
+
+    def get_attribute(self, name):
+        if name == "innerText":
+            return self.text
+        value = self.node.get(name)
+        # Selenium returns the links resolved against the page
+        return urljoin(self.driver.current_url, value) if name == "href" else value
+
+    def is_displayed(self):
+        return True
+
+    def find_element(self, by, xpath):
+        return self.driver.first(self.node.xpath(xpath), xpath)
+
+    def find_elements(self, by, xpath):
+        return [HtmlElement(self.driver, node) for node in self.node.xpath(xpath)]
+
+
+class HtmlDriver:
+    """
+    The part of a Chrome WebDriver the scrapers use, loading the pages over HTTP and
+    finding the elements with lxml: the Selenium paths run without a browser
+    """
+
+    def __init__(self):
+        self.session = requests.Session()
+        self.session.headers[DRIVER_HEADER] = "1"
+        self.current_url = None
+        self.page_source = ""
+        self.tree = None
+        self.visited = []
+
+    def get(self, url):
+        response = self.session.get(url, timeout=10)
+        self.current_url = url
+        self.page_source = response.text
+        self.tree = html.fromstring(response.text)
+        self.visited.append(url)
+
+    def first(self, nodes, xpath):
+        if not nodes:
+            raise NoSuchElementException(f"no element matches {xpath}")
+        return HtmlElement(self, nodes[0])
+
+    def find_element(self, by, xpath):
+        return self.first(self.tree.xpath(xpath), xpath)
+
+    def find_elements(self, by, xpath):
+        return [HtmlElement(self, node) for node in self.tree.xpath(xpath)]
+
+    def execute_script(self, script, *args):
+        return {"bytes": len(self.page_source.encode()), "resources": 0, "loadTime": 0}
+
+    def quit(self):
+        self.session.close()
+
+
+class FixtureSite:
+    """
+    The fixture pages on a local port, pages maps a page type to its source and can be
+    replaced between requests. A page type in failures answers that status to every
+    client but the HtmlDriver, as a site throttling the plain HTTP backend.
+    """
+
+    def __init__(self):
+        self.pages = {page_type: read_fixture(page_type) for _, page_type in ROUTES}
+        self.failures = {}
+        self.requests = []
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                page_type = next(
+                    (name for pattern, name in ROUTES if pattern.match(path)), None
+                )
+                client = "driver" if self.headers.get(DRIVER_HEADER) else "http"
+                site.requests.append((client, page_type))
+                status = 200 if page_type else 404
+                if client == "http" and page_type in site.failures:
+                    status = site.failures[page_type]
+                body = site.pages[page_type].encode() if status == 200 else b"Unavailable"
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def site():
+    fixture_site = FixtureSite()
+    yield fixture_site
+    fixture_site.close()
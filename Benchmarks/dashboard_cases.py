@@ -0,0 +1,121 @@
+import os
+import sys
+import functools
+import numpy as np
+from harness import Case
+from normalization_cases import FILM_COUNTS, synthetic_tables, timed_runs
+from aggregates import compute_aggregate
+
+# The dashboard computations are imported from the application folder
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Application")
+)
+from cooccurrence import cooccurrence, cross_occurrence  # noqa: E402
+from graph_index import GraphIndex  # noqa: E402
+from name_index import NameIndex  # noqa: E402
+from rendering import bin_values  # noqa: E402
+
+
+# Every view of the Analysis Page computes from the tables with its caches cold: the
+# aggregates it shows (as when they are not materialized), the indexes it builds and
+# the lookups it runs on the selection it starts with. Only the charts are left out.
+
+
+def tables_setup(n_films):
+    return (synthetic_tables(n_films),)
+
+
+def graph_index(tables):
+    film_ids = tables["Films"]["FilmID"].to_numpy()
+    return GraphIndex(tables["FilmStar"], tables["FilmDirector"], film_ids=film_ids)
+
+
+def first_id(tables, link_name, id_column):
+    return int(tables[link_name][id_column].iloc[0])
+
+
+def overview(tables):
+    counts = {name: len(tables[name]) for name in ["Films", "Genres", "Directors", "Stars"]}
+    top_rated = tables["Films"].nlargest(10, "IMDb Rating")
+    return counts, top_rated
+
+
+def genres(tables):
+    genre_pairs = cooccurrence(tables["FilmGenre"], "GenreID")
+    return compute_aggregate("GenreCounts", tables), genre_pairs
+
+
+def directors(tables):
+    graph = graph_index(tables)
+    films = graph.films_of_director(first_id(tables, "FilmDirector", "DirectorID"))
+    return compute_aggregate("DirectorCounts", tables), graph.film_rows(np.sort(films))
+
+
+def stars(tables):
+    star_ids = tables["Stars"]["StarID"].to_numpy()
+    films = np.bincount(
+        tables["FilmStar"]["StarID"].to_numpy(), minlength=int(star_ids.max()) + 1
+    )
+    names = tables["Stars"]["Star"].astype(str).to_numpy()
+    index = NameIndex(star_ids, names, films[star_ids])
+    graph = graph_index(tables)
+    films = graph.films_of_star(first_id(tables, "FilmStar", "StarID"))
+    return compute_aggregate("StarCounts", tables), index.search("star 1"), films
+
+
+def top_stars_by_genre(tables):
+    top_stars = compute_aggregate("GenreTopStars", tables)
+    genre_id = int(tables["Genres"]["GenreID"].iloc[0])
+    return top_stars[top_stars["GenreID"] == genre_id].head(10)
+
+
+def rating_distribution(tables):
+    return bin_values(tables["Films"]["IMDb Rating"], bins=20)
+
+
+def star_collaborations(tables):
+    star_pairs = cooccurrence(tables["FilmStar"], "StarID", top_k=20)
+    star_id = first_id(tables, "FilmStar", "StarID")
+    collaborators = graph_index(tables).co_stars(star_id, top_k=10)
+    director_star_pairs = cross_occurrence(
+        tables["FilmDirector"], "DirectorID", tables["FilmStar"], "StarID", top_k=20
+    )
+    return star_pairs, collaborators, director_star_pairs
+
+
+def collaboration_network(tables):
+    graph = graph_index(tables)
+    film_star = tables["FilmStar"]["StarID"]
+    path = graph.collaboration_path(int(film_star.iloc[0]), int(film_star.iloc[-1]))
+    films, co_credits = graph.star_degrees()
+    top_stars = np.argsort(-films, kind="stable")[:20]
+    return path, co_credits, graph.distinct_co_stars(top_stars), graph.director_degrees()
+
+
+VIEWS = {
+    "Overview": overview,
+    "Genres": genres,
+    "Directors": directors,
+    "Stars": stars,
+    "Star Film Ratings": functools.partial(compute_aggregate, "StarRatings"),
+    "Director Film Ratings": functools.partial(compute_aggregate, "DirectorRatings"),
+    "Genre Popularity Over Time": functools.partial(compute_aggregate, "GenrePopularity"),
+    "Top Stars by Genre": top_stars_by_genre,
+    "Film Release Trends": functools.partial(compute_aggregate, "ReleaseTrends"),
+    "IMDb Rating Distribution": rating_distribution,
+    "Star Collaborations": star_collaborations,
+    "Collaboration Network": collaboration_network,
+}
+
+
+def dashboard_cases(film_counts=FILM_COUNTS, views=VIEWS):
+    return [
+        Case(
+            f"dashboard/{view}/{n_films} films",
+            compute,
+            functools.partial(tables_setup, n_films),
+            repeat=timed_runs(n_films),
+        )
+        for n_films in film_counts
+        for view, compute in views.items()
+    ]
@@ -0,0 +1,216 @@
+import os
+import json
+import argparse
+import numpy as np
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Fixtures")
+
+# Page type of every fixture file, a page saved from the site can replace any of them
+FIXTURE_FILES = {
+    "chart": "chart.html",
+    "title": "title.html",
+    "credits": "credits.html",
+    "reviews": "reviews.html",
+    "reviewFeed": "review_feed.html",
+}
+
+WORDS = (
+    "the film story acting director cast scene plot ending character music camera "
+    "performance brilliant boring masterpiece slow classic script drama score tension "
+    "visual editing dialogue twist pacing memorable cinematography emotional"
+).split()
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS, rng.integers(low, high)))
+
+
+def page(title, body, state):
+    """
+    The frame of an IMDb page: head, navigation and the JSON state the site ships next
+    to the markup, so the fixtures weigh about what the real pages do
+    """
+    navigation = "".join(
+        f'<li class="ipc-list__item"><a href="/section/{i}/">Section {i}</a></li>'
+        for i in range(120)
+    )
+    return (
+        "<!DOCTYPE html><html lang=\"en-US\"><head><meta charset=\"utf-8\">"
+        f"<title>{title}</title></head><body>"
+        f'<nav><ul class="ipc-list">{navigation}</ul></nav><main>{body}</main>'
+        f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(state)}</script>'
+        "</body></html>"
+    )
+
+
+def chart_page(rng, count=250):
+    metadata_item = '<span class="sc-b189961a-8 kLaxqf cli-title-metadata-item">'
+    rows = []
+    for rank in range(1, count + 1):
+        rows.append(
+            '<li class="ipc-metadata-list-summary-item sc-10233bc-0 iherUv cli-parent">'
+            '<div class="ipc-poster"><img class="ipc-image" alt="poster" '
+            f'src="https://m.media-amazon.com/images/M/{rank:07d}.jpg" width="140"></div>'
+            '<div class="sc-b189961a-0 hBZnfJ cli-children">'
+            '<a class="ipc-title-link-wrapper" '
+            f'href="/title/tt{rank:07d}/?ref_=chttp_t_{rank}">'
+            f'<h3 class="ipc-title__text">{rank}. Film {rank}</h3></a>'
+            '<div class="sc-b189961a-7 feoqjK cli-title-metadata">'
+            f"{metadata_item}{1920 + rank % 105}</span>"
+            f"{metadata_item}{90 + rank % 90}m</span>"
+            f"{metadata_item}PG-13</span></div>"
+            '<span class="ipc-rating-star ipc-rating-star--base ipc-rating-star--imdb '
+            f'ratingGroup--imdb-rating">{rng.uniform(8.0, 9.3):.1f}'
+            f'<span class="ipc-rating-star--voteCount"> ({rng.integers(25, 2900)}K)</span>'
+            "</span></div></li>"
+        )
+    state = {
+        "props": {
+            "pageProps": {
+                "chartTitles": [
+                    {"id": f"tt{rank:07d}", "plot": sentence(rng, 20, 40)}
+                    for rank in range(1, count + 1)
+                ]
+            }
+        }
+    }
+    body = f'<ul class="ipc-metadata-list compact-list-view">{"".join(rows)}</ul>'
+    return page("IMDb Top 250 Movies", body, state)
+
+
+def title_page(rng):
+    genres = "".join(
+        '<a class="ipc-chip ipc-chip--on-baseAlt" href="/search/title/?genres={0}">'
+        '<span class="ipc-chip__text">{0}</span></a>'.format(genre)
+        for genre in ["Crime", "Drama", "Thriller"]
+    )
+    directors = "".join(
+        '<a class="ipc-metadata-list-item__list-content-item '
+        f'ipc-metadata-list-item__list-content-item--link" href="/name/nm{i:07d}/">'
+        f"Director {i}</a>"
+        for i in range(2)
+    )
+    body = (
+        f'<div class="ipc-chip-list__scroller">{genres}</div>'
+        f'<ul><li data-testid="title-pc-principal-credit">{directors}</li></ul>'
+        '<div data-testid="title-cast-header"><a class="ipc-title-link-wrapper" '
+        'href="/title/tt0000001/fullcredits/?ref_=tt_cst_sm">Top cast</a></div>'
+        '<div data-testid="reviews-header"><a class="ipc-title-link-wrapper" '
+        'href="/title/tt0000001/reviews/?ref_=tt_urv">User reviews</a></div>'
+        '<script type="application/ld+json">'
+        + json.dumps(
+            {
+                "@type": "Movie",
+                "name": "Film 1",
+                "genre": ["Crime", "Drama", "Thriller"],
+                "director": [{"@type": "Person", "name": f"Director {i}"} for i in range(2)],
+            }
+        )
+        + "</script>"
+    )
+    state = {
+        "props": {
+            "pageProps": {
+                "aboveTheFold": {"plot": sentence(rng, 40, 80)},
+                "mainColumnData": {
+                    "cast": [
+                        {"name": f"Star {i}", "characters": [sentence(rng, 1, 3)]}
+                        for i in range(300)
+                    ],
+                    "trivia": [sentence(rng, 30, 60) for _ in range(150)],
+                },
+            }
+        }
+    }
+    return page("Film 1 (1994) - IMDb", body, state)
+
+
+def credits_page(rng, cast=120):
+    rows = "".join(
+        '<li class="ipc-metadata-list-summary-item">'
+        '<div class="media-body media-vertical-align">'
+        f'<h4><a href="/name/nm{i:07d}/">Star {i}</a></h4>'
+        f"<span>{sentence(rng, 1, 4)}</span></div></li>"
+        for i in range(cast)
+    )
+    crew = "".join(
+        f'<tr><td class="name"><a href="/name/nm{i:07d}/">Crew {i}</a></td>'
+        f'<td class="credit">{sentence(rng, 1, 3)}</td></tr>'
+        for i in range(400)
+    )
+    body = f'<ul class="ipc-metadata-list">{rows}</ul><table class="crew">{crew}</table>'
+    return page("Film 1 (1994) - Full Cast & Crew - IMDb", body, {"props": {}})
+
+
+def review_blocks(rng, count):
+    return "".join(
+        '<li class="ipl-content-list__item"><div class="review-container">'
+        '<span class="rating-other-user-rating"><span>'
+        f'{rng.integers(1, 11)}</span><span class="point-scale">/10</span></span>'
+        f'<a class="title" href="/review/rw{i:07d}/"> {sentence(rng, 2, 8)}\n</a>'
+        f'<div class="display-name-date"><a href="/user/ur{i:07d}/">user{i}</a></div>'
+        f'<div class="content"><div class="text">{sentence(rng, 60, 400)}'
+        "</div></div></div></li>"
+        for i in range(count)
+    )
+
+
+def reviews_page(rng, count=250):
+    """
+    A user review page after every "Load More" click, what ReviewScraper parses
+    """
+    body = (
+        f'<ul class="ipl-content-list">{review_blocks(rng, count)}</ul>'
+        '<div class="load-more-data"></div>'
+        '<button class="ipl-load-more__button">Load More</button>'
+    )
+    return page("Film 1 (1994) - User reviews - IMDb", body, {"props": {}})
+
+
+def review_feed_page(rng, count=25):
+    """
+    One page of the review feed, what ReviewHarvester and the queue workers parse
+    """
+    return (
+        f'<div><ul class="ipl-content-list">{review_blocks(rng, count)}</ul>'
+        '<div class="load-more-data" data-key="g4w6ddbmqyzdo6ic4oxwjnrwrhsmtiy"></div></div>'
+    )
+
+
+def write_fixtures(folder_path=FIXTURES_DIR, seed=0):
+    """
+    Write every fixture page, the same seed gives the same bytes
+    """
+    rng = np.random.default_rng(seed)
+    builders = {
+        "chart": chart_page,
+        "title": title_page,
+        "credits": credits_page,
+        "reviews": reviews_page,
+        "reviewFeed": review_feed_page,
+    }
+    os.makedirs(folder_path, exist_ok=True)
+    paths = []
+    for page_type, builder in builders.items():
+        path = os.path.join(folder_path, FIXTURE_FILES[page_type])
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(builder(rng))
+        paths.append(path)
+    return paths
+
+
+def read_fixture(page_type, folder_path=FIXTURES_DIR):
+    with open(os.path.join(folder_path, FIXTURE_FILES[page_type]), encoding="utf-8") as file:
+        return file.read()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write the HTML fixtures the parsing benchmarks read"
+    )
+    parser.add_argument("--output", default=FIXTURES_DIR)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for path in write_fixtures(args.output, args.seed):
+        print(f"Fixture '{path}' written ({os.path.getsize(path) / 1024:.0f} KB)")
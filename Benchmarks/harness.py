@@ -0,0 +1,137 @@
+import os
+import gc
+import sys
+import json
+import time
+import platform
+import statistics
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Baselines")
+
+
+@dataclass
+class Case:
+    """
+    One measurement: setup builds the inputs (not measured), run is timed on them.
+    repeat caps the number of timed runs for the cases too slow to run many times.
+    """
+
+    name: str
+    run: object
+    setup: object = None
+    repeat: int = None
+
+
+def measure(case, repeat):
+    """
+    Median and best time of the timed runs, and the peak memory allocated by one more
+    run under tracemalloc (kept apart because tracing slows the code down). The first
+    run warms the imports and lazy caches and is not counted.
+    """
+    inputs = case.setup() if case.setup is not None else ()
+    repeat = min(repeat, case.repeat or repeat)
+    case.run(*inputs)
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        case.run(*inputs)
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    case.run(*inputs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "seconds": statistics.median(times),
+        "bestSeconds": min(times),
+        "peakMB": peak / 2**20,
+        "repeat": repeat,
+    }
+
+
+def machine():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def baseline_path(name):
+    return name if name.endswith(".json") else os.path.join(BASELINES_DIR, f"{name}.json")
+
+
+def load_baseline(name):
+    path = baseline_path(name)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        return json.load(file)
+
+
+def save_results(path, results):
+    """
+    The results with the machine they were measured on, a baseline is a saved result
+    """
+    folder_path = os.path.dirname(path)
+    if folder_path:
+        os.makedirs(folder_path, exist_ok=True)
+    document = {
+        "createdAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": machine(),
+        "command": sys.argv[1:],
+        "results": results,
+    }
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+    return path
+
+
+def change(current, base):
+    return (current - base) / base if base else 0.0
+
+
+def compare(results, baseline, threshold, memory_threshold, min_seconds=0.001, min_mb=1.0):
+    """
+    One row per case with the change against the baseline. A case regressed when it
+    is slower or allocates more than the threshold (a fraction) over its baseline, the
+    differences under min_seconds and min_mb are noise and never count.
+    """
+    base_results = (baseline or {}).get("results", {})
+    rows = []
+    for name, result in results.items():
+        base = base_results.get(name)
+        row = {
+            "Case": name,
+            "Seconds": result["seconds"],
+            "Peak MB": result["peakMB"],
+            "Time change": None,
+            "Memory change": None,
+            "Status": "new",
+        }
+        if base is not None:
+            time_change = change(result["seconds"], base["seconds"])
+            memory_change = change(result["peakMB"], base["peakMB"])
+            slower = (
+                time_change > threshold
+                and result["seconds"] - base["seconds"] > min_seconds
+            )
+            bigger = (
+                memory_change > memory_threshold
+                and result["peakMB"] - base["peakMB"] > min_mb
+            )
+            row.update(
+                {
+                    "Time change": time_change,
+                    "Memory change": memory_change,
+                    "Status": "REGRESSION" if slower or bigger else "ok",
+                }
+            )
+        rows.append(row)
+    return rows
@@ -0,0 +1,58 @@
+import os
+import sys
+import functools
+import tempfile
+import pandas as pd
+from harness import Case
+
+# The synthetic catalog and the normalization come from the normalization folder
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Normalization Code")
+)
+from benchmark_normalize import make_synthetic_data  # noqa: E402
+from normalize import normalize  # noqa: E402
+
+FILM_COUNTS = [250, 25_000, 250_000]
+
+
+def timed_runs(n_films):
+    """
+    Fewer timed runs as the catalog grows, a 250k-film run takes seconds
+    """
+    return max(1, min(5, 250_000 // n_films))
+
+
+@functools.lru_cache(maxsize=1)
+def synthetic_tables(n_films, seed=0):
+    """
+    The normalized tables of a synthetic Data.csv, shared by the dashboard cases of
+    the same size
+    """
+    return normalize(make_synthetic_data(n_films, seed))
+
+
+def data_csv_setup(n_films, seed=0):
+    """
+    Write the synthetic Data.csv, the folder lives as long as the case inputs
+    """
+    folder = tempfile.TemporaryDirectory()
+    data_path = os.path.join(folder.name, "Data.csv")
+    make_synthetic_data(n_films, seed).to_csv(data_path, index=False)
+    return data_path, folder
+
+
+def normalize_data_csv(data_path, folder):
+    # Read from a real CSV so parsing is part of the measurement, as in the notebook
+    return normalize(pd.read_csv(data_path))
+
+
+def normalization_cases(film_counts=FILM_COUNTS):
+    return [
+        Case(
+            f"normalization/{n_films} films",
+            normalize_data_csv,
+            functools.partial(data_csv_setup, n_films),
+            repeat=timed_runs(n_films),
+        )
+        for n_films in film_counts
+    ]
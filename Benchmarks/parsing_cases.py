@@ -0,0 +1,150 @@
+import os
+import re
+import sys
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from fixtures import FIXTURES_DIR, read_fixture
+from harness import Case
+
+# The parsers are imported from the scraper folder, as the scrapers import them
+sys.path.append(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Scrapping")
+)
+from ChartParser import ChartEntry, movieKey, parseChart  # noqa: E402
+from Fetcher import (  # noqa: E402
+    HttpFetcher,
+    fetchChart,
+    fetchMovieDetails,
+    parseCreditsPage,
+    parseTitlePage,
+)
+from RateController import RateController  # noqa: E402
+from ReviewParser import (  # noqa: E402
+    filterReviews,
+    parseReviewPage,
+    parseReviews,
+    reviewFeedURL,
+)
+
+# Fixture served for every path of the site the scrapers request
+ROUTES = [
+    (re.compile(r"^/chart/top/?$"), "chart"),
+    (re.compile(r"^/title/tt\d+/fullcredits/?$"), "credits"),
+    (re.compile(r"^/title/tt\d+/reviews/_ajax$"), "reviewFeed"),
+    (re.compile(r"^/title/tt\d+/reviews/?$"), "reviews"),
+    (re.compile(r"^/title/tt\d+/?$"), "title"),
+]
+
+
+def fixture_handler(folder_path):
+    pages = {
+        page_type: read_fixture(page_type, folder_path).encode() for _, page_type in ROUTES
+    }
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            page_type = next((name for pattern, name in ROUTES if pattern.match(path)), None)
+            body = pages.get(page_type, b"Not Found")
+            self.send_response(200 if page_type else 404)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureHandler
+
+
+@functools.lru_cache(maxsize=None)
+def fixture_server(folder_path=FIXTURES_DIR):
+    """
+    Serve the fixtures on a local port for the rest of the process, returns its base
+    URL (what IMDB_URL points the scrapers to)
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), fixture_handler(folder_path))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def parsed_count(result):
+    """
+    Number of items a parser read: the length of its list, or of the first list of
+    the tuple it returns
+    """
+    while isinstance(result, tuple):
+        result = result[0]
+    return len(result)
+
+
+def parse_reviews(source):
+    return filterReviews(parseReviews(source))
+
+
+def parse_review_feed(source):
+    raw_reviews, pagination_key = parseReviewPage(source)
+    return filterReviews(raw_reviews), pagination_key
+
+
+def served_controller():
+    # The local server needs no spacing between requests
+    return RateController(initialInterval=0.0, minInterval=0.0)
+
+
+def served_setup(folder_path):
+    base_url = fixture_server(folder_path)
+    movie_url = f"{base_url}/title/tt0000001/"
+    entry = ChartEntry(1, movie_url, movieKey(movie_url), "Film 1", "1994", "9.3", "")
+    return base_url, entry, HttpFetcher(poolSize=1), served_controller()
+
+
+def fetch_chart(base_url, entry, http_fetcher, controller):
+    return fetchChart(http_fetcher, base_url, controller)
+
+
+def fetch_movie(base_url, entry, http_fetcher, controller):
+    return fetchMovieDetails(None, entry, controller, httpFetcher=http_fetcher, backend="http")
+
+
+def fetch_review_feed(base_url, entry, http_fetcher, controller):
+    source = controller.call(http_fetcher.fetch, reviewFeedURL(entry.url))
+    return parse_review_feed(source)
+
+
+def parsing_cases(folder_path=FIXTURES_DIR, base_url="https://m.imdb.com"):
+    """
+    The parsers on the saved pages, then the HTTP path of the scrapers (fetch, parse)
+    against the same pages served from a local port
+    """
+    movie_url = base_url + "/title/tt0000001/"
+    parsers = {
+        "chart": lambda source: parseChart(source, base_url),
+        "title": lambda source: parseTitlePage(source, movie_url),
+        "credits": parseCreditsPage,
+        "reviews": parse_reviews,
+        "reviewFeed": parse_review_feed,
+    }
+    cases = []
+    for page_type, parse in parsers.items():
+
+        def setup(page_type=page_type, parse=parse):
+            source = read_fixture(page_type, folder_path)
+            # A saved page the XPaths do not match anymore would time an empty parse
+            if not parsed_count(parse(source)):
+                raise ValueError(f"The {page_type} fixture parses to nothing")
+            return (source,)
+
+        cases.append(Case(f"parsing/{page_type}", parse, setup))
+
+    setup = functools.partial(served_setup, folder_path)
+    cases += [
+        Case("parsing/chart served", fetch_chart, setup),
+        Case("parsing/movie served", fetch_movie, setup),
+        Case("parsing/reviewFeed served", fetch_review_feed, setup),
+    ]
+    return cases
@@ -0,0 +1,123 @@
+import sys
+import argparse
+import pandas as pd
+from harness import baseline_path, compare, load_baseline, measure, save_results
+from normalization_cases import FILM_COUNTS
+
+GROUPS = ["parsing", "normalization", "dashboard"]
+
+
+def collect_cases(groups, film_counts):
+    # Groups are imported on demand so a missing scraper dependency only skips parsing
+    cases = []
+    if "parsing" in groups:
+        from parsing_cases import parsing_cases
+
+        cases += parsing_cases()
+    if "normalization" in groups:
+        from normalization_cases import normalization_cases
+
+        cases += normalization_cases(film_counts)
+    if "dashboard" in groups:
+        from dashboard_cases import dashboard_cases
+
+        cases += dashboard_cases(film_counts)
+    return cases
+
+
+def format_change(value):
+    return "" if value is None or pd.isna(value) else f"{value:+.1%}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time the parsers, the normalization and the dashboard views, and "
+        "compare them to a saved baseline"
+    )
+    parser.add_argument("--groups", nargs="+", choices=GROUPS, default=GROUPS)
+    parser.add_argument(
+        "--films",
+        type=int,
+        nargs="+",
+        default=FILM_COUNTS,
+        help="Sizes of the synthetic Data.csv for the normalization and dashboard cases",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per case")
+    parser.add_argument("--filter", default="", help="Only the cases whose name contains it")
+    parser.add_argument(
+        "--baseline",
+        default="baseline",
+        help="Baseline name in Benchmarks/Baselines, or the path of a .json file",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Store this run as the baseline instead of comparing to it",
+    )
+    parser.add_argument("--output", help="Also write the results of this run to a .json file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Slowdown over the baseline flagged as a regression (0.2 = 20%%)",
+    )
+    parser.add_argument(
+        "--memory-threshold",
+        type=float,
+        default=0.2,
+        help="Peak memory growth over the baseline flagged as a regression",
+    )
+    args = parser.parse_args()
+
+    cases = [
+        case
+        for case in collect_cases(args.groups, args.films)
+        if args.filter in case.name
+    ]
+    results = {}
+    for case in cases:
+        results[case.name] = measure(case, args.repeat)
+        result = results[case.name]
+        print(
+            f"{case.name}: {result['seconds'] * 1000:.1f} ms, "
+            f"{result['peakMB']:.1f} MB peak",
+            flush=True,
+        )
+
+    if args.output:
+        print(f"Results written to '{save_results(args.output, results)}'")
+
+    if args.save_baseline:
+        # Cases left out of this run keep their previous baseline
+        baseline = load_baseline(args.baseline) or {"results": {}}
+        results = {**baseline["results"], **results}
+        path = save_results(baseline_path(args.baseline), results)
+        print(f"Baseline '{path}' saved with {len(results)} cases")
+        sys.exit(0)
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"No baseline '{baseline_path(args.baseline)}', run with --save-baseline first")
+    else:
+        machine = baseline["machine"]
+        print(
+            f"Compared to the baseline of {baseline['createdAt']} (Python "
+            f"{machine['python']}, {machine['processor']}, {machine['cpus']} CPUs)"
+        )
+    rows = pd.DataFrame(
+        compare(results, baseline, args.threshold, args.memory_threshold)
+    )
+    if rows.empty:
+        print("No case matches the filter")
+        sys.exit(0)
+    rows["Seconds"] = rows["Seconds"].map("{:.4f}".format)
+    rows["Peak MB"] = rows["Peak MB"].map("{:.1f}".format)
+    rows["Time change"] = rows["Time change"].map(format_change)
+    rows["Memory change"] = rows["Memory change"].map(format_change)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(rows.to_string(index=False))
+
+    regressions = rows[rows["Status"] == "REGRESSION"]
+    if not regressions.empty:
+        print(f"{len(regressions)} regression(s) over the thresholds")
+        sys.exit(1)
@@ -0,0 +1,189 @@
+import re
+import threading
+import pytest
+import requests
+from conftest import HtmlDriver
+from ChartParser import ChartEntry, movieKey
+from Fetcher import HttpFetcher, fetchAutoPage, fetchChart, fetchMovieDetails
+from MovieDetails import scrapeMovieDetails
+from MovieStore import MovieStore
+from PageCache import PageCache
+from RateController import RateController, TransientError
+from RunMetrics import runMetrics
+from WorkerPool import runWorkerPool
+
+ROW_START = '<li class="ipc-metadata-list-summary-item'
+
+
+def served_controller(max_retries=1):
+    return RateController(initialInterval=0.0, minInterval=0.0, maxRetries=max_retries)
+
+
+def chart_entry(base_url, rank=1, number=1):
+    url = f"{base_url}/title/tt{number:07d}/?ref_=chttp_t_{rank}"
+    return ChartEntry(rank, url, movieKey(url), f"Film {number}", "1994", "9.0", "")
+
+
+def reranked_chart(source, order):
+    """
+    The chart page with the rows at the positions in order, their links and titles
+    renumbered to their new rank as the site does
+    """
+    head, *rows = source.split(ROW_START)
+    end = rows[-1].index("</li>") + len("</li>")
+    rows[-1], tail = rows[-1][:end], rows[-1][end:]
+    reranked = []
+    for rank, position in enumerate(order, start=1):
+        row = re.sub(r"chttp_t_\d+", f"chttp_t_{rank}", rows[position])
+        reranked.append(re.sub(r'ipc-title__text">\d+\. ', f'ipc-title__text">{rank}. ', row))
+    return head + "".join(ROW_START + row for row in reranked) + tail
+
+
+def fetch_chart(site):
+    http_fetcher = HttpFetcher(poolSize=1)
+    try:
+        return fetchChart(http_fetcher, site.base_url, served_controller())
+    finally:
+        http_fetcher.close()
+
+
+def fetch_details(site, backend, drivers):
+    def get_driver():
+        if not drivers:
+            drivers.append(HtmlDriver())
+        return drivers[0]
+
+    http_fetcher = HttpFetcher(poolSize=1)
+    try:
+        return fetchMovieDetails(
+            get_driver,
+            chart_entry(site.base_url),
+            served_controller(),
+            httpFetcher=http_fetcher,
+            backend=backend,
+        )
+    finally:
+        http_fetcher.close()
+        for driver in drivers:
+            driver.quit()
+
+
+def test_auto_mode_falls_back_to_selenium_on_a_503(site):
+    site.failures["title"] = 503
+    drivers = []
+    details = fetch_details(site, "auto", drivers)
+    assert details["Backends"] == {"title": "selenium", "credits": "http"}
+    assert details["Genre"] == "Crime, Drama, Thriller"
+    assert details["Director"] == "Director 0, Director 1"
+    # The HTTP backend was retried once before the browser loaded the page
+    assert site.requests.count(("http", "title")) == 2
+    assert [page for client, page in site.requests if client == "driver"] == ["title"]
+
+
+def test_http_mode_raises_the_503(site):
+    site.failures["title"] = 503
+    with pytest.raises(TransientError):
+        fetch_details(site, "http", [])
+    assert ("driver", "title") not in site.requests
+
+
+def test_worker_pool_scrapes_and_caches_the_fixture_site(site, tmp_path):
+    entries = [chart_entry(site.base_url, rank, rank) for rank in range(1, 9)]
+    page_cache = PageCache(str(tmp_path))
+    controller = served_controller()
+    drivers = []
+    threads = set()
+
+    def create_driver():
+        driver = HtmlDriver()
+        drivers.append(driver)
+        return driver
+
+    def work(get_driver, entry, controller):
+        threads.add(threading.get_ident())
+        return scrapeMovieDetails(get_driver(), entry, controller, page_cache)
+
+    results = runWorkerPool(entries, work, create_driver, workerCount=3, controller=controller)
+    assert [details["Director"] for details in results] == ["Director 0, Director 1"] * 8
+    assert all(details["Genre"] == "Crime, Drama, Thriller" for details in results)
+    # One driver per worker that took a task
+    assert 1 <= len(drivers) == len(threads) <= 3
+    # Every page load, with its genre and director waits, went through the controller
+    assert controller.stats()["requests"] == 2 * len(entries)
+    assert site.requests.count(("driver", "title")) == len(entries)
+
+    # The next run parses the cached pages and loads nothing
+    details = fetchMovieDetails(
+        None, entries[0], controller, backend="cache", pageCache=page_cache
+    )
+    assert details["Backends"] == {"title": "cache", "credits": "cache"}
+    assert details["Stars"] == results[0]["Stars"]
+    page_cache.close()
+
+
+def test_chart_keys_stay_with_the_movie_when_it_changes_rank(site):
+    entries = fetch_chart(site)
+    assert len(entries) == 250
+    assert len({entry.hashURL for entry in entries}) == 250
+    assert entries[0].url.endswith("/title/tt0000001/?ref_=chttp_t_1")
+    assert entries[0].hashURL == movieKey("https://m.imdb.com/title/tt0000001/")
+
+    site.pages["chart"] = reranked_chart(site.pages["chart"], [1, 0, *range(2, 250)])
+    reranked = fetch_chart(site)
+    assert [entry.title for entry in reranked[:2]] == ["Film 2", "Film 1"]
+    assert reranked[0].url.endswith("/title/tt0000002/?ref_=chttp_t_1")
+    keys = {entry.title: entry.hashURL for entry in entries}
+    assert {entry.title: entry.hashURL for entry in reranked} == keys
+
+
+def test_replace_chart_reports_the_moves_of_the_served_chart(site, tmp_path):
+    chart = site.pages["chart"]
+    site.pages["chart"] = reranked_chart(chart, range(249))
+    store = MovieStore(str(tmp_path / "Movies.db"))
+    entries = fetch_chart(site)
+    assert len(store.replaceChart(entries)["newEntries"]) == 249
+    for entry in entries:
+        store.upsertMovie(entry, {"Genre": "Drama", "Director": "", "Stars": ""})
+    assert store.detailQueue() == []
+
+    # Films 1 and 2 swap, film 249 drops out and film 250 enters
+    site.pages["chart"] = reranked_chart(chart, [1, 0, *range(2, 248), 249])
+    report = store.replaceChart(fetch_chart(site))
+    assert [(entry.title, entry.rank, rank) for entry, rank in report["rankChanges"]] == [
+        ("Film 2", 1, 2),
+        ("Film 1", 2, 1),
+    ]
+    assert [(entry.title, entry.rank) for entry in report["newEntries"]] == [("Film 250", 249)]
+    assert [title for _, title in report["dropped"]] == ["Film 249"]
+    assert report["ratingChanges"] == []
+    assert [row[2] for row in store.detailQueue()] == ["Film 250"]
+    store.close()
+
+
+def fallbacks(page_type):
+    return runMetrics.counters[("httpFallbacks", (("pageType", page_type),))]
+
+
+@pytest.mark.parametrize("status, fetches", [(403, 1), (404, 1), (429, 2), (503, 2)])
+def test_fetch_auto_page_falls_back_on_an_error_status(site, tmp_path, status, fetches):
+    site.failures["title"] = status
+    url = chart_entry(site.base_url).url
+    http_fetcher = HttpFetcher(poolSize=1)
+    page_cache = PageCache(str(tmp_path))
+    before = fallbacks("title")
+    try:
+        args = (http_fetcher, url, served_controller(), "title", page_cache)
+        assert fetchAutoPage(*args, "auto") is None
+        assert fallbacks("title") == before + 1
+        assert site.requests.count(("http", "title")) == fetches
+        with pytest.raises((requests.HTTPError, TransientError)):
+            fetchAutoPage(*args, "http")
+        assert page_cache.get(url, "title") is None
+
+        # A page served again is returned and cached
+        del site.failures["title"]
+        assert fetchAutoPage(*args, "auto") == site.pages["title"]
+        assert page_cache.get(url, "title") == site.pages["title"]
+    finally:
+        http_fetcher.close()
+        page_cache.close()
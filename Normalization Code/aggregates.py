@@ -0,0 +1,151 @@
+import os
+import json
+import hashlib
+from datetime import datetime, timezone
+import pandas as pd
+from storage import FORMATS
+
+
+AGGREGATES_FOLDER = "Aggregates"
+MANIFEST_FILE = "manifest.json"
+
+
+def genre_counts(tables):
+    genre_count = (
+        tables["FilmGenre"]["GenreID"]
+        .value_counts()
+        .rename_axis("GenreID")
+        .reset_index(name="Count")
+    )
+    return genre_count.merge(tables["Genres"], on="GenreID")
+
+
+def director_counts(tables):
+    director_count = (
+        tables["FilmDirector"]["DirectorID"]
+        .value_counts()
+        .rename_axis("DirectorID")
+        .reset_index(name="Count")
+    )
+    return director_count.merge(tables["Directors"], on="DirectorID")
+
+
+def star_counts(tables):
+    star_count = (
+        tables["FilmStar"]["StarID"]
+        .value_counts()
+        .rename_axis("StarID")
+        .reset_index(name="Count")
+    )
+    return star_count.merge(tables["Stars"], on="StarID")
+
+
+def director_ratings(tables):
+    film_director_merged = tables["FilmDirector"].merge(
+        tables["Films"][["FilmID", "IMDb Rating"]], on="FilmID"
+    )
+    film_director_merged = film_director_merged.merge(tables["Directors"], on="DirectorID")
+    return film_director_merged.groupby("Director")["IMDb Rating"].mean().reset_index()
+
+
+def star_ratings(tables):
+    film_star_merged = tables["FilmStar"].merge(
+        tables["Films"][["FilmID", "IMDb Rating"]], on="FilmID"
+    )
+    film_star_merged = film_star_merged.merge(tables["Stars"], on="StarID")
+    return film_star_merged.groupby("Star")["IMDb Rating"].mean().reset_index()
+
+
+def genre_popularity(tables):
+    film_genre_merged = tables["FilmGenre"].merge(
+        tables["Films"][["FilmID", "Release Year"]], on="FilmID"
+    )
+    film_genre_merged = film_genre_merged.merge(tables["Genres"], on="GenreID")
+    return (
+        film_genre_merged.groupby(["Release Year", "Genre"])
+        .size()
+        .reset_index(name="Count")
+    )
+
+
+def genre_top_stars(tables, top=10):
+    """
+    The stars with the most films in every genre
+    """
+    films_in_genre = tables["FilmGenre"].drop_duplicates(["GenreID", "FilmID"])
+    stars_in_genre = films_in_genre.merge(tables["FilmStar"], on="FilmID")
+    star_count_genre = (
+        stars_in_genre.groupby(["GenreID", "StarID"])
+        .size()
+        .reset_index(name="Count")
+        .sort_values(["GenreID", "Count", "StarID"], ascending=[True, False, True])
+    )
+    star_count_genre = star_count_genre.groupby("GenreID").head(top)
+    return star_count_genre.merge(tables["Stars"], on="StarID")
+
+
+def release_trends(tables):
+    release_years = (
+        pd.to_numeric(tables["Films"]["Release Year"], errors="coerce")
+        .dropna()
+        .astype(int)
+    )
+    release_trends = release_years.value_counts().reset_index()
+    release_trends.columns = ["Release Year", "Count"]
+    return release_trends.sort_values("Release Year").reset_index(drop=True)
+
+
+# Function and source tables of every aggregate
+AGGREGATES = {
+    "GenreCounts": (genre_counts, ["Genres", "FilmGenre"]),
+    "DirectorCounts": (director_counts, ["Directors", "FilmDirector"]),
+    "StarCounts": (star_counts, ["Stars", "FilmStar"]),
+    "DirectorRatings": (director_ratings, ["Films", "Directors", "FilmDirector"]),
+    "StarRatings": (star_ratings, ["Films", "Stars", "FilmStar"]),
+    "GenrePopularity": (genre_popularity, ["Films", "Genres", "FilmGenre"]),
+    "GenreTopStars": (genre_top_stars, ["Stars", "FilmGenre", "FilmStar"]),
+    "ReleaseTrends": (release_trends, ["Films"]),
+}
+
+
+def compute_aggregate(name, tables):
+    function, _ = AGGREGATES[name]
+    return function(tables)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_aggregates(tables, output_path):
+    """
+    Materialize every aggregate next to the normalized tables, the manifest stamps
+    them with the digest of the table files they were computed from, in every format
+    written
+    """
+    folder_path = os.path.join(output_path, AGGREGATES_FOLDER)
+    os.makedirs(folder_path, exist_ok=True)
+
+    for name in AGGREGATES:
+        file_path = os.path.join(folder_path, f"{name}.csv")
+        compute_aggregate(name, tables).to_csv(file_path, index=False)
+        print(f"{name} aggregate '{file_path}' created successfully.")
+
+    sources = {
+        file_name: file_digest(os.path.join(output_path, file_name))
+        for name in sorted({source for _, names in AGGREGATES.values() for source in names})
+        for extension in FORMATS.values()
+        if os.path.exists(os.path.join(output_path, file_name := f"{name}{extension}"))
+    }
+    manifest = {
+        "version": hashlib.sha256(json.dumps(sources, sort_keys=True).encode()).hexdigest(),
+        "createdAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "sources": sources,
+    }
+    with open(os.path.join(folder_path, MANIFEST_FILE), "w") as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
@@ -0,0 +1,129 @@
+import os
+import time
+import argparse
+import tempfile
+import numpy as np
+import pandas as pd
+from normalize import normalize
+
+
+GENRES = [
+    "Action", "Adventure", "Animation", "Biography", "Comedy", "Crime", "Drama",
+    "Family", "Fantasy", "Film-Noir", "History", "Horror", "Music", "Musical",
+    "Mystery", "Romance", "Sci-Fi", "Sport", "Thriller", "War", "Western",
+]
+
+
+def make_synthetic_data(n_films, seed=0, stars_per_film=(20, 80)):
+    """
+    A Data.csv shaped catalog of n_films movies: 1-3 genres, 1-2 directors and a cast
+    drawn with a skewed popularity so some stars appear in many films
+    """
+    rng = np.random.default_rng(seed)
+    n_directors = max(10, n_films // 2)
+    n_stars = max(100, n_films * 15)
+    genre_names = np.array(GENRES)
+    director_names = np.array([f"Director {i}" for i in range(n_directors)])
+    star_names = np.array([f"Star {i}" for i in range(n_stars)])
+
+    def join_sample(names, counts, popularity=None):
+        picks = (
+            rng.zipf(popularity, counts.sum()) % len(names)
+            if popularity
+            else rng.integers(0, len(names), counts.sum())
+        )
+        joined = np.split(names[picks], np.cumsum(counts)[:-1])
+        return [", ".join(dict.fromkeys(film)) for film in joined]
+
+    return pd.DataFrame(
+        {
+            "Film Title": [f"Film {i}" for i in range(n_films)],
+            "IMDb Rating": np.round(rng.uniform(7.5, 9.3, n_films), 1),
+            "Release Year": rng.integers(1920, 2025, n_films),
+            "Genre": join_sample(genre_names, rng.integers(1, 4, n_films)),
+            "Director": join_sample(director_names, rng.integers(1, 3, n_films)),
+            "Movie Image": [f"https://example.com/{i}.jpg" for i in range(n_films)],
+            "Stars": join_sample(
+                star_names, rng.integers(*stars_per_film, n_films), popularity=1.3
+            ),
+        }
+    )
+
+
+def normalize_iterrows(DF):
+    """
+    The row-by-row lookups of main.ipynb, kept as the reference to compare against
+    """
+    films_df = DF[["Film Title", "IMDb Rating", "Release Year", "Movie Image"]].copy()
+    films_df.index += 1
+    films_df["FilmID"] = films_df.index
+    tables = {}
+    for column, name, id_column in [
+        ("Genre", "Genre", "GenreID"),
+        ("Director", "Director", "DirectorID"),
+        ("Stars", "Star", "StarID"),
+    ]:
+        all_names = set()
+        for names in DF[column]:
+            all_names.update(x.strip() for x in names.split(","))
+        dimension_df = pd.DataFrame(list(all_names), columns=[name])
+        dimension_df.index += 1
+        dimension_df[id_column] = dimension_df.index
+
+        link_data = []
+        for idx, row in DF.iterrows():
+            film_id = films_df[films_df["Film Title"] == row["Film Title"]]["FilmID"].values[0]
+            for x in [x.strip() for x in row[column].split(",")]:
+                link_data.append(
+                    (film_id, dimension_df[dimension_df[name] == x][id_column].values[0])
+                )
+        tables[column] = pd.DataFrame(link_data, columns=["FilmID", id_column])
+    return tables
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the normalization on a synthetic Data.csv"
+    )
+    parser.add_argument("--films", type=int, default=100_000)
+    parser.add_argument(
+        "--legacy-films",
+        type=int,
+        default=500,
+        help="Size of the sample the notebook's iterrows version is timed on (0 to skip)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    data_df, elapsed = timed(make_synthetic_data, args.films, args.seed)
+    print(f"Generated {len(data_df)} films in {elapsed:.2f}s")
+
+    # Go through a real CSV so parsing is part of the measurement
+    with tempfile.TemporaryDirectory() as folder:
+        data_path = os.path.join(folder, "Data.csv")
+        data_df.to_csv(data_path, index=False)
+        data_df, read_time = timed(pd.read_csv, data_path)
+
+    tables, elapsed = timed(normalize, data_df)
+    print(f"Read Data.csv in {read_time:.2f}s, normalized in {elapsed:.2f}s")
+    for name, df in tables.items():
+        print(f"  {name}: {len(df)} rows")
+
+    existing = {name: tables[name] for name in ["Films", "Genres", "Directors", "Stars"]}
+    _, rerun = timed(normalize, data_df, existing)
+    print(f"Re-run keeping the existing IDs: {rerun:.2f}s")
+
+    if args.legacy_films:
+        sample = data_df.head(args.legacy_films)
+        _, vectorized = timed(normalize, sample)
+        _, legacy = timed(normalize_iterrows, sample)
+        print(
+            f"{args.legacy_films} films: iterrows {legacy:.2f}s, vectorized "
+            f"{vectorized:.3f}s ({legacy / vectorized:.0f}x)"
+        )
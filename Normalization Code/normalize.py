@@ -0,0 +1,187 @@
+import os
+import argparse
+import pandas as pd
+from aggregates import write_aggregates
+from storage import FORMATS, read_table, table_file, write_table
+
+
+# Link table, ID column, name column and Data.csv column of every dimension
+DIMENSIONS = {
+    "Genres": ("FilmGenre", "GenreID", "Genre", "Genre"),
+    "Directors": ("FilmDirector", "DirectorID", "Director", "Director"),
+    "Stars": ("FilmStar", "StarID", "Star", "Stars"),
+}
+FILM_COLUMNS = ["FilmID", "Film Title", "IMDb Rating", "Release Year", "Movie Image"]
+
+
+def read_existing(output_path, name):
+    file_path = table_file(output_path, name)
+    if os.path.exists(file_path):
+        return read_table(file_path)
+    return None
+
+
+def assign_ids(names, existing, id_column, name_column):
+    """
+    Keep the ID of every name already in the existing table and give the new names
+    the next free IDs in sorted order, so IDs stay the same from one run to the next
+    """
+    if existing is None or existing.empty:
+        existing = pd.DataFrame({id_column: pd.Series(dtype="int64"), name_column: []})
+    known = existing[existing[name_column].isin(names)]
+    new_names = names[~names.isin(existing[name_column])].sort_values()
+    start = int(existing[id_column].max()) + 1 if len(existing) else 1
+    new = pd.DataFrame(
+        {
+            id_column: range(start, start + len(new_names)),
+            name_column: new_names.astype(str).to_numpy(),
+        }
+    )
+    return (
+        pd.concat([known[[id_column, name_column]], new], ignore_index=True)
+        .sort_values(id_column)
+        .reset_index(drop=True)
+    )
+
+
+def build_films(data_df, existing):
+    """
+    Films keep the FilmID of the same title from the previous run, new titles are
+    numbered after them in the order of Data.csv
+    """
+    films_df = data_df[FILM_COLUMNS[1:]].drop_duplicates("Film Title").copy()
+    if existing is None or existing.empty:
+        films_df.insert(0, "FilmID", range(1, len(films_df) + 1))
+        return films_df.reset_index(drop=True)
+
+    known_ids = existing.set_index("Film Title")["FilmID"]
+    film_ids = films_df["Film Title"].map(known_ids)
+    is_new = film_ids.isna()
+    start = int(existing["FilmID"].max()) + 1
+    film_ids[is_new] = range(start, start + int(is_new.sum()))
+    films_df.insert(0, "FilmID", film_ids.astype("int64"))
+    return films_df.sort_values("FilmID").reset_index(drop=True)
+
+
+def explode_names(data_df, film_ids, column):
+    """
+    One row per (FilmID, name) in the order of Data.csv, from the comma-joined column
+    of a CSV or the list column of an Arrow/Parquet scrape
+    """
+    names = data_df[column]
+    if names.dtype == object and names.map(pd.api.types.is_list_like).all():
+        names = names.map(list)
+    else:
+        names = names.fillna("").str.split(",")
+    exploded = pd.DataFrame({"FilmID": film_ids, "Name": names}).explode(
+        "Name", ignore_index=True
+    )
+    exploded["Name"] = exploded["Name"].fillna("").astype(str).str.strip()
+    return exploded[exploded["Name"] != ""].reset_index(drop=True)
+
+
+def normalize(data_df, existing=None):
+    """
+    Build the seven normalized tables from the scraped Data.csv, existing holds the
+    tables of the previous run (by name) so their IDs are kept
+    """
+    existing = existing or {}
+    tables = {}
+
+    films_df = build_films(data_df, existing.get("Films"))
+    tables["Films"] = films_df
+
+    # FilmID of every row of Data.csv (repeated titles link to the same film)
+    film_ids = (
+        data_df["Film Title"]
+        .map(films_df.set_index("Film Title")["FilmID"])
+        .to_numpy()
+    )
+
+    for name, (link_name, id_column, name_column, column) in DIMENSIONS.items():
+        exploded = explode_names(data_df, film_ids, column)
+        codes, uniques = pd.factorize(exploded["Name"])
+        dimension_df = assign_ids(
+            pd.Series(uniques), existing.get(name), id_column, name_column
+        )
+        tables[name] = dimension_df
+
+        # Map each factorized code to its dimension ID in one vectorized lookup
+        ids_by_code = (
+            pd.Series(dimension_df[id_column].to_numpy(), index=dimension_df[name_column])
+            .reindex(uniques)
+            .to_numpy()
+        )
+        tables[link_name] = pd.DataFrame(
+            {"FilmID": exploded["FilmID"].to_numpy(), id_column: ids_by_code[codes]}
+        )
+
+    return tables
+
+
+def write_tables(tables, output_path, formats=("csv",)):
+    os.makedirs(output_path, exist_ok=True)
+    for name, df in tables.items():
+        for file_format in formats:
+            file_path = write_table(df, output_path, name, file_format)
+            print(f"{name} {file_format} file '{file_path}' created successfully.")
+
+
+def load_existing(output_path):
+    return {
+        name: df
+        for name in ["Films", *DIMENSIONS]
+        if (df := read_existing(output_path, name)) is not None
+    }
+
+
+def run(input_path, output_path, keep_ids=True, with_aggregates=True, formats=("csv",)):
+    data_df = read_table(input_path)
+    existing = load_existing(output_path) if keep_ids else {}
+    tables = normalize(data_df, existing)
+    write_tables(tables, output_path, formats)
+    if with_aggregates:
+        write_aggregates(tables, output_path)
+    return tables
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Normalize the scraped Data.csv into the Films, Genres, Directors, "
+        "Stars, FilmGenre, FilmDirector and FilmStar tables"
+    )
+    parser.add_argument(
+        "--input",
+        default=os.path.join("CSV Folder", "Data.csv"),
+        help="Scraped Data.csv, or the Data.arrow written with --export-arrow",
+    )
+    parser.add_argument(
+        "--output", default=os.path.join("Normalization Code", "Final_Normalized_Sheets")
+    )
+    parser.add_argument(
+        "--fresh-ids",
+        action="store_true",
+        help="Number everything from 1 instead of keeping the IDs of the existing tables",
+    )
+    parser.add_argument(
+        "--format",
+        nargs="+",
+        choices=list(FORMATS),
+        default=["arrow", "csv"],
+        help="Formats the tables are written in, the dashboard reads the first of "
+        "arrow, parquet, csv it finds",
+    )
+    parser.add_argument(
+        "--no-aggregates",
+        action="store_true",
+        help="Do not materialize the dashboard aggregates",
+    )
+    args = parser.parse_args()
+
+    run(
+        args.input,
+        args.output,
+        keep_ids=not args.fresh_ids,
+        with_aggregates=not args.no_aggregates,
+        formats=args.format,
+    )
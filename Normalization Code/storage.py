@@ -0,0 +1,99 @@
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+
+# File extension of every storage format, in the order the readers prefer them
+FORMATS = {"arrow": ".arrow", "parquet": ".parquet", "csv": ".csv"}
+ID_COLUMNS = ["FilmID", "GenreID", "DirectorID", "StarID"]
+
+
+def is_repeated(column):
+    # A dictionary only pays off when values repeat, not for a column of unique names
+    return len(column) > 0 and pc.count_distinct(column).as_py() <= len(column) // 2
+
+
+def to_arrow(df):
+    """
+    Arrow table of a normalized table: ID columns as int32 and string columns with
+    repeated values dictionary-encoded, so each distinct value is stored once
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fields = []
+    for field, column in zip(table.schema, table.columns):
+        if field.name in ID_COLUMNS:
+            fields.append(pa.field(field.name, pa.int32()))
+        elif pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            if is_repeated(column):
+                fields.append(pa.field(field.name, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                # The type pandas keeps its strings in, read without widening the offsets
+                fields.append(pa.field(field.name, pa.large_string()))
+        elif pa.types.is_list(field.type) or pa.types.is_large_list(field.type):
+            # The comma-joined columns of the raw scrape, stored as lists of names
+            fields.append(
+                pa.field(field.name, pa.list_(pa.dictionary(pa.int32(), pa.string())))
+            )
+        else:
+            fields.append(field)
+    return table.cast(pa.schema(fields))
+
+
+def write_table(df, folder_path, name, file_format="csv"):
+    """
+    Write a table as name.csv, name.parquet or name.arrow (Arrow IPC file, left
+    uncompressed so readers can memory-map it). The file is written next to the old
+    one and renamed over it: a reader still holding the old file mapped keeps it.
+    """
+    file_path = os.path.join(folder_path, f"{name}{FORMATS[file_format]}")
+    temporary_path = file_path + ".tmp"
+    if file_format == "csv":
+        df.to_csv(temporary_path, index=False)
+    elif file_format == "parquet":
+        pq.write_table(to_arrow(df), temporary_path, compression="zstd")
+    else:
+        # One contiguous buffer per column, what read_table can hand to pandas uncopied
+        table = to_arrow(df).combine_chunks()
+        with pa.OSFile(temporary_path, "wb") as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+    os.replace(temporary_path, file_path)
+    return file_path
+
+
+def read_arrow(file_path, memory_map=True):
+    """
+    Arrow table of a .arrow or .parquet file. An Arrow IPC file is memory-mapped, its
+    buffers are paged in from the OS cache instead of being parsed and copied.
+    """
+    if file_path.endswith(FORMATS["parquet"]):
+        return pq.read_table(file_path, memory_map=memory_map)
+    source = pa.memory_map(file_path) if memory_map else pa.OSFile(file_path)
+    return ipc.open_file(source).read_all()
+
+
+def read_table(file_path, memory_map=True):
+    """
+    DataFrame of a table in any of the storage formats. Dictionary-encoded columns
+    come back as pandas categoricals, the IDs as int32. The numeric and string
+    columns of an Arrow file are views of the mapped file, not copies: split_blocks
+    keeps pandas from consolidating them into one copied block.
+    """
+    if file_path.endswith(FORMATS["csv"]):
+        return pd.read_csv(file_path)
+    return read_arrow(file_path, memory_map).to_pandas(split_blocks=True)
+
+
+def table_file(folder_path, name, formats=None):
+    """
+    Path of the table in the first of the formats that exists in the folder, the
+    CSV path when there is none
+    """
+    for file_format in formats or FORMATS:
+        file_path = os.path.join(folder_path, f"{name}{FORMATS[file_format]}")
+        if os.path.exists(file_path):
+            return file_path
+    return os.path.join(folder_path, f"{name}{FORMATS['csv']}")
@@ -0,0 +1,113 @@
+import hashlib
+from dataclasses import dataclass
+from urllib.parse import urljoin, urlsplit
+from lxml import html
+from DriverFactory import pageLoadReport
+from RateController import TransientError
+from RunMetrics import runMetrics
+
+
+# XPaths of the Top 250 chart, relative to a single chart row
+BLOCK_XPATH = '//li[contains(@class, "ipc-metadata-list-summary-item sc-10233bc-0 iherUv cli-parent")]'
+LINK_XPATH = './/a[@class="ipc-title-link-wrapper"]'
+TITLE_XPATH = './/div[@class="sc-b189961a-0 hBZnfJ cli-children"]//h3[@class="ipc-title__text"]'
+YEAR_XPATH = './/div[@class="sc-b189961a-7 feoqjK cli-title-metadata"]//span[@class="sc-b189961a-8 kLaxqf cli-title-metadata-item"]'
+RATING_XPATH = './/span[@class="ipc-rating-star ipc-rating-star--base ipc-rating-star--imdb ratingGroup--imdb-rating"]'
+IMAGE_XPATH = './/img[@class="ipc-image"]'
+
+
+@dataclass
+class ChartEntry:
+    rank: int
+    url: str
+    hashURL: str
+    title: str
+    year: str
+    rating: str
+    image: str
+
+
+def generateHash(s):
+    return hashlib.sha256(s.encode()).hexdigest()
+
+
+def titlePath(url):
+    """
+    The path of a title link (/title/tt0111161/), without the query and fragment: the
+    chart links carry the rank of the movie in their ref_ query
+    """
+    path = urlsplit(url).path
+    return path if path.endswith("/") else path + "/"
+
+
+def movieKey(url):
+    """
+    Key of a movie in the store, the review partitions and the queue, the same when
+    the movie changes rank or the site is served from another host
+    """
+    return generateHash(titlePath(url))
+
+
+def firstText(block, xpath):
+    nodes = block.xpath(xpath)
+    return nodes[0].text_content().strip() if nodes else ""
+
+
+def firstAttribute(block, xpath, attribute):
+    nodes = block.xpath(xpath)
+    return nodes[0].get(attribute, "") if nodes else ""
+
+
+@runMetrics.timed("parse")
+def parseChart(pageSource, baseURL):
+    """
+    Parse every row of the chart page in a single pass
+    """
+    tree = html.fromstring(pageSource)
+    entries = []
+    for rank, block in enumerate(tree.xpath(BLOCK_XPATH), start=1):
+        # Links are relative in the raw HTML, Selenium used to return them absolute
+        movieURL = urljoin(baseURL, firstAttribute(block, LINK_XPATH, "href"))
+
+        movieTitle = firstText(block, TITLE_XPATH)
+        movieTitle = movieTitle.split(". ", 1)[-1]
+
+        entries.append(
+            ChartEntry(
+                rank=rank,
+                url=movieURL,
+                hashURL=movieKey(movieURL),
+                title=movieTitle,
+                year=firstText(block, YEAR_XPATH),
+                rating=firstText(block, RATING_XPATH)[:3],
+                image=firstAttribute(block, IMAGE_XPATH, "src"),
+            )
+        )
+    return entries
+
+
+def chartURL(baseURL):
+    return baseURL + "/chart/top/"
+
+
+def cachedChart(pageCache, baseURL):
+    """
+    The chart parsed from the page cache, empty when it is not cached
+    """
+    pageSource = pageCache.get(chartURL(baseURL), "chart")
+    return parseChart(pageSource, baseURL) if pageSource is not None else []
+
+
+def snapshotChart(driver, baseURL, pageCache=None):
+    """
+    Read the whole chart with one WebDriver round-trip
+    """
+    driver.get(chartURL(baseURL))
+    pageLoadReport.record(driver, "chart")
+    pageSource = driver.page_source
+    entries = parseChart(pageSource, baseURL)
+    if not entries:
+        raise TransientError("the chart page has no movie rows")
+    if pageCache is not None:
+        pageCache.put(chartURL(baseURL), pageSource, "chart")
+    return entries
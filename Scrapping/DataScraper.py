@@ -1,20 +1,16 @@
 import os
-import time
-import hashlib
+import argparse
+import functools
+from collections import Counter
 import pandas as pd
-from tqdm import tqdm
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-
-
-def convertArrToString(arr):
-    string = ""
-    for i in arr:
-        string += i
-        string += ", "
-    return string[:-2]
+from ChartParser import cachedChart, snapshotChart
+from DriverFactory import BLOCKING_PROFILES, createDriver, pageLoadReport
+from Fetcher import HttpFetcher, fetchChart, fetchMovieDetails
+from MovieStore import MovieStore
+from PageCache import PageCache
+from RateController import RateController, TransientError
+from RunMetrics import runMetrics
+from WorkerPool import runWorkerPool
 
 
 def create_empty_csv_file(file_path, headers):
@@ -31,26 +27,81 @@ def append_to_csv(csvFilePath, data):
     df.to_csv(csvFilePath, mode="a", header=False, index=False)
 
 
-def generateHash(s):
-    return hashlib.sha256(s.encode()).hexdigest()
-
-
-def readCSVToDict(csvFilePath):
-    if os.path.exists(csvFilePath):
-        print(f"CSV file '{csvFilePath}' has been read successfully.")
-        return pd.read_csv(csvFilePath).to_dict(orient="records")
-    return []
-
-
-def updateCSV(csvFilePath, updatedData, hashValue):
-    df = pd.read_csv(csvFilePath)
-    df.loc[df["HashURL"] == hashValue] = updatedData
-    df.to_csv(csvFilePath, index=False)
-
-
-URL = "https://m.imdb.com"
+parser = argparse.ArgumentParser(description="Scrape the IMDb Top 250 movies")
+parser.add_argument(
+    "--workers", type=int, default=4, help="Number of concurrent Chrome drivers"
+)
+parser.add_argument(
+    "--request-interval",
+    type=float,
+    default=5.0,
+    help="Initial seconds between two page loads across all workers",
+)
+parser.add_argument(
+    "--max-retries",
+    type=int,
+    default=3,
+    help="Retries of a page that times out or returns a 429/503 error page",
+)
+parser.add_argument(
+    "--backend",
+    choices=["auto", "http", "selenium"],
+    default="auto",
+    help="Fetch title and credits pages over plain HTTP, with Chrome, or HTTP first "
+    "with Chrome as the fallback",
+)
+parser.add_argument(
+    "--block-resources",
+    choices=list(BLOCKING_PROFILES),
+    default="text",
+    help="Resources Chrome does not download: 'text' blocks images, fonts, media "
+    "and ad/tracker scripts, 'none' loads everything",
+)
+parser.add_argument(
+    "--refresh-ratings",
+    action="store_true",
+    help="Only read the chart and update the ratings and ranks that changed, new "
+    "entrants are queued for detail scraping instead of being scraped",
+)
+parser.add_argument(
+    "--export-arrow",
+    action="store_true",
+    help="Also write Data.arrow, with the genres, directors and stars as lists of "
+    "dictionary-encoded names",
+)
+parser.add_argument(
+    "--cache-dir",
+    default=os.path.join("CSV Folder", "Page Cache"),
+    help="Folder of the page cache, the rendered sources of every page fetched",
+)
+parser.add_argument(
+    "--cache-size-mb",
+    type=int,
+    default=1024,
+    help="Least recently used pages are evicted past this size",
+)
+parser.add_argument(
+    "--no-cache", action="store_true", help="Fetch every page and cache nothing"
+)
+parser.add_argument(
+    "--replay",
+    action="store_true",
+    help="Parse every movie of the chart again from the page cache, without fetching",
+)
+parser.add_argument(
+    "--report-dir",
+    default=os.path.join("CSV Folder", "Run Reports"),
+    help="Where the JSON run report and the Prometheus metrics of the run are written",
+)
+args = parser.parse_args()
+if args.replay and args.no_cache:
+    parser.error("--replay reads the page cache, it cannot be used with --no-cache")
+
+# The base URL can point to a local server that serves saved IMDb pages
+URL = os.environ.get("IMDB_URL", "https://m.imdb.com")
 csvFilePath = os.path.join(".", "CSV Folder", "Data.csv")
 csvHashMovies = os.path.join(".", "CSV Folder", "Hash Movies.csv")
+movieStorePath = os.path.join(".", "CSV Folder", "Movies.db")
 # create_empty_csv_file(
 #    csvFilePath,
 #    headers=[
@@ -64,141 +115,146 @@ csvHashMovies = os.path.join(".", "CSV Folder", "Hash Movies.csv")
 #    ],
 # )
 # create_empty_csv_file(csvHashMovies, headers=["HashURL"])
-# Read the hash CSV and the data CSV into dictionaries
-hashData = readCSVToDict(csvHashMovies)
-existingData = readCSVToDict(csvFilePath)
-header = "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-
-options = webdriver.ChromeOptions()
-options.add_argument("--headless")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-options.add_argument(header)
-driver = webdriver.Chrome(options=options)
-
-try:
-    driver.get(URL + "/chart/top/")
-    Blocks = driver.find_elements(
-        By.XPATH,
-        '//li[contains(@class, "ipc-metadata-list-summary-item sc-10233bc-0 iherUv cli-parent")]',
+store = MovieStore(movieStorePath)
+
+controller = RateController(
+    initialInterval=args.request_interval, maxRetries=args.max_retries
+)
+httpFetcher = HttpFetcher(poolSize=args.workers)
+pageCache = None
+if not args.no_cache:
+    pageCache = PageCache(
+        args.cache_dir, maxBytes=args.cache_size_mb * 2**20, replay=args.replay
     )
-    print(f"Total Blocks found: {len(Blocks)}")
+backend = "cache" if args.replay else args.backend
+
+
+def loadChart():
+    """
+    Read the chart from the page cache while it is fresh, then over HTTP when the
+    backend allows it, with Chrome otherwise
+    """
+    if pageCache is not None:
+        entries = cachedChart(pageCache, URL)
+        if entries:
+            return entries
+    if backend == "cache":
+        raise SystemExit(f"The chart page is not in the page cache '{args.cache_dir}'")
+    if backend in ("http", "auto"):
+        try:
+            return fetchChart(httpFetcher, URL, controller, pageCache)
+        except TransientError as e:
+            if backend == "http":
+                raise
+            print(f"Reading the chart with Chrome, the HTTP backend failed. Error: {e}")
+    driver = createDriver(profile=args.block_resources)
+    try:
+        return controller.call(snapshotChart, driver, URL, pageCache)
+    finally:
+        driver.quit()
+
+
+def printChartReport(report):
+    for entry, oldRating in report["ratingChanges"]:
+        print(f"Rating changed: {entry.title} {oldRating} -> {entry.rating}")
+    print(
+        f"{len(report['ratingChanges'])} ratings and {len(report['rankChanges'])} "
+        f"ranks changed"
+    )
+    for entry in report["newEntries"]:
+        print(f"New entrant queued for detail scraping: #{entry.rank} {entry.title}")
+    for hashURL, title in report["dropped"]:
+        print(f"Dropped out of the chart: {title or hashURL}")
+
+
+def scrapeAndStore(getDriver, entry, controller, httpFetcher):
+    with runMetrics.movie(entry.title):
+        details = fetchMovieDetails(
+            getDriver,
+            entry,
+            controller,
+            httpFetcher=httpFetcher,
+            backend=backend,
+            pageCache=pageCache,
+        )
+        # Committed as soon as the movie is done so a crash does not lose it
+        with runMetrics.span("storeWrite"):
+            store.upsertMovie(entry, details)
+        runMetrics.count("moviesScraped")
+        return details
+
 
-    for idx, Block in enumerate(tqdm(Blocks, desc="Processing Blocks")):
+try:
+    chartEntries = loadChart()
+    print(f"Total Blocks found: {len(chartEntries)}")
+    # Seed the store from the CSVs the first time it is used, and move the movies of
+    # earlier runs, keyed by their rank-bearing chart link, to their key
+    if store.isEmpty():
+        store.importCSV(csvFilePath, csvHashMovies, chartEntries)
+    else:
+        print(f"{store.rekey(chartEntries)} movies moved to the key of their title path")
+
+    # Write only the ranks and ratings that changed since the last run
+    report = store.replaceChart(chartEntries)
+    printChartReport(report)
+
+    if args.refresh_ratings:
+        print(f"{len(store.detailQueue())} movies in the detail queue")
+    else:
         """
         Hash The Link of The Movies
         """
 
-        movieURL = driver.find_elements(
-            By.XPATH,
-            '//a[@class="ipc-title-link-wrapper"]',
-        )[idx].get_attribute("href")
-        hashmovieURL = generateHash(movieURL)
-
-        if hashData[idx]["HashURL"] == hashmovieURL:
-            # Update the Movie Rating
-            rating = driver.find_elements(
-                By.XPATH,
-                '//span[@class="ipc-rating-star ipc-rating-star--base ipc-rating-star--imdb ratingGroup--imdb-rating"]',
-            )[idx].text
-            rating = rating[:3]
-            existingData[idx]["IMDb Rating"] = rating
-
-            print(f"Skipping already processed movie: {movieURL}")
-            continue
-        else:
-            """
-            Get The Data of The Movies
-            """
-
-            movieTitle = driver.find_elements(
-                By.XPATH,
-                '//div[@class="sc-b189961a-0 hBZnfJ cli-children"]//h3[@class="ipc-title__text"]',
-            )[idx].text
-            movieTitle = movieTitle.split(". ", 1)[1]
-
-            releaseYearBox = driver.find_elements(
-                By.XPATH, '//div[@class="sc-b189961a-7 feoqjK cli-title-metadata"]'
-            )[idx]
-            releaseYear = releaseYearBox.find_elements(
-                By.XPATH,
-                './/span[@class="sc-b189961a-8 kLaxqf cli-title-metadata-item"]',
-            )[0].text
-
-            rating = driver.find_elements(
-                By.XPATH,
-                '//span[@class="ipc-rating-star ipc-rating-star--base ipc-rating-star--imdb ratingGroup--imdb-rating"]',
-            )[idx].text
-            rating = rating[:3]
-
-            movieImage = driver.find_elements(
-                By.XPATH,
-                '//img[@class="ipc-image"]',
-            )[
-                idx
-            ].get_attribute("src")
-
-            # Navigate the Movie Page
-            driver.get(movieURL)
-
-            # Wait for genres to be present
-            genresTag = WebDriverWait(driver, 20).until(
-                EC.presence_of_all_elements_located(
-                    (
-                        By.XPATH,
-                        '//div[@class="ipc-chip-list__scroller"]//a[@class="ipc-chip ipc-chip--on-baseAlt"]//span[@class="ipc-chip__text"]',
-                    )
-                )
-            )
-            genres = [genre.text for genre in genresTag]
-            genres = convertArrToString(genres)
-
-            # Wait for directors to be present
-            directorTag = WebDriverWait(driver, 20).until(
-                EC.presence_of_element_located(
-                    (By.XPATH, '//li[@data-testid="title-pc-principal-credit"]')
-                )
-            )
-
-            directorsTags = directorTag.find_elements(
-                By.XPATH,
-                './/a[@class="ipc-metadata-list-item__list-content-item ipc-metadata-list-item__list-content-item--link"]',
-            )
-            directors = [
-                director.get_attribute("innerText") for director in directorsTags
-            ]
-            directors = convertArrToString(directors)
-
-            # Navigate to cast link
-            castLink = driver.find_element(
-                By.XPATH,
-                '//div[@data-testid="title-cast-header"]//a[@class="ipc-title-link-wrapper"]',
-            ).get_attribute("href")
-            driver.get(castLink)
-
-            # Wait for cast members to be present
-            castMembers = WebDriverWait(driver, 20).until(
-                EC.presence_of_all_elements_located(
-                    (By.XPATH, '//div[@class="media-body media-vertical-align"]//h4')
-                )
-            )
-            castCrew = [cast.text for cast in castMembers]
-            castCrew = convertArrToString(castCrew)
-
-            # Update the Movie Data
-            hashData[idx]["HashURL"] = hashmovieURL
-            existingData[idx]["Genre"] = genres
-            existingData[idx]["Stars"] = castCrew
-            existingData[idx]["IMDb Rating"] = rating
-            existingData[idx]["Director"] = directors
-            existingData[idx]["Film Title"] = movieTitle
-            existingData[idx]["Movie Image"] = movieImage
-            existingData[idx]["Release Year"] = releaseYear
-
-            # Return to the Main Page
-            driver.get(URL + "/chart/top/")
-
-            time.sleep(20)
+        # A replay parses every movie again, e.g. after an XPath fix
+        knownHashes = set() if args.replay else store.knownHashes()
+        pendingEntries = [
+            entry for entry in chartEntries if entry.hashURL not in knownHashes
+        ]
+        print(
+            f"Skipping {len(chartEntries) - len(pendingEntries)} already processed "
+            f"movies, {len(pendingEntries)} new movies to scrape"
+        )
+
+        """
+        Get The Data of The Movies
+        """
 
+        results = runWorkerPool(
+            pendingEntries,
+            functools.partial(scrapeAndStore, httpFetcher=httpFetcher),
+            functools.partial(createDriver, profile=args.block_resources),
+            workerCount=args.workers,
+            controller=controller,
+        )
+
+        backendCounts = Counter(
+            f"{page}={backend}"
+            for details in results
+            if details is not None
+            for page, backend in details["Backends"].items()
+        )
+        print(f"Pages served per backend: {dict(backendCounts)}")
+        runMetrics.count("moviesFailed", results.count(None))
 finally:
-    driver.quit()
+    httpFetcher.close()
+    if pageCache is not None:
+        cacheStats = pageCache.stats()
+        print(f"Page cache: {cacheStats}")
+        pageCache.close()
+print(f"Rate controller: {controller.stats()}")
+pageLoadReport.print()
+
+# Write the CSVs in chart order for the normalization step
+if not args.refresh_ratings or any(report.values()):
+    with runMetrics.span("export"):
+        store.exportCSV(csvFilePath, csvHashMovies)
+        if args.export_arrow:
+            store.exportArrow(os.path.splitext(csvFilePath)[0] + ".arrow")
+store.close()
+
+runMetrics.printSummary()
+sections = {"rateController": controller.stats(), "pageLoads": pageLoadReport.summary()}
+if pageCache is not None:
+    sections["pageCache"] = cacheStats
+reportPath = runMetrics.write(args.report_dir, "DataScraper", sections)
+print(f"Run report written to '{reportPath}'")
@@ -0,0 +1,146 @@
+import threading
+from collections import defaultdict
+from selenium import webdriver
+from RunMetrics import runMetrics
+
+
+header = "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+# What each profile keeps Chrome from downloading, we only read text and the image src
+BLOCKING_PROFILES = {
+    "none": {"prefs": {}, "blockedURLs": []},
+    "text": {
+        "prefs": {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.media_stream": 2,
+            "profile.managed_default_content_settings.plugins": 2,
+            "profile.managed_default_content_settings.notifications": 2,
+        },
+        "blockedURLs": [
+            # Images and posters
+            "*.jpg",
+            "*.jpeg",
+            "*.png",
+            "*.gif",
+            "*.webp",
+            "*.svg",
+            "*.ico",
+            # Fonts
+            "*.woff",
+            "*.woff2",
+            "*.ttf",
+            "*.otf",
+            # Media
+            "*.mp4",
+            "*.webm",
+            "*.m3u8",
+            # Ads and trackers
+            "*doubleclick.net*",
+            "*googletagmanager.com*",
+            "*google-analytics.com*",
+            "*googlesyndication.com*",
+            "*amazon-adsystem.com*",
+            "*fls-na.amazon.com*",
+            "*unagi.amazon.com*",
+            "*scorecardresearch.com*",
+            "*/ads/*",
+        ],
+    },
+}
+
+# Bytes transferred by the page and every resource it loaded, and how long it took
+PAGE_METRICS_SCRIPT = """
+const navigation = performance.getEntriesByType("navigation")[0];
+const resources = performance.getEntriesByType("resource");
+let bytes = navigation ? navigation.transferSize : 0;
+for (const resource of resources) {
+    bytes += resource.transferSize;
+}
+return {
+    bytes: bytes,
+    resources: resources.length,
+    loadTime: navigation ? navigation.domContentLoadedEventEnd : 0,
+};
+"""
+
+
+def createDriver(profile="text"):
+    """
+    Headless Chrome that returns from get() once the DOM is ready (eager) and does
+    not download the resources blocked by the profile
+    """
+    blocking = BLOCKING_PROFILES[profile]
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument(header)
+    options.page_load_strategy = "eager"
+    if blocking["prefs"]:
+        options.add_experimental_option("prefs", blocking["prefs"])
+
+    driver = webdriver.Chrome(options=options)
+    countRoundTrips(driver)
+    if blocking["blockedURLs"]:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd(
+            "Network.setBlockedURLs", {"urls": blocking["blockedURLs"]}
+        )
+    return driver
+
+
+def countRoundTrips(driver):
+    """
+    Every WebDriver command goes through driver.execute, count them per command
+    """
+    execute = driver.execute
+
+    def countedExecute(driverCommand, params=None):
+        runMetrics.count("webdriverCommands", command=driverCommand)
+        return execute(driverCommand, params)
+
+    driver.execute = countedExecute
+
+
+class PageLoadReport:
+    """
+    Bytes transferred and page-load time per page type (chart, title, credits, ...)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pages = defaultdict(lambda: {"pages": 0, "bytes": 0, "loadTime": 0.0})
+
+    def record(self, driver, pageType):
+        try:
+            metrics = driver.execute_script(PAGE_METRICS_SCRIPT)
+        except Exception as e:
+            print(f"Could not read the page metrics of a {pageType} page. Error: {e}")
+            return
+        with self.lock:
+            page = self.pages[pageType]
+            page["pages"] += 1
+            page["bytes"] += int(metrics["bytes"])
+            page["loadTime"] += float(metrics["loadTime"]) / 1000
+
+    def summary(self):
+        with self.lock:
+            return {
+                pageType: {
+                    "pages": page["pages"],
+                    "avgKB": round(page["bytes"] / page["pages"] / 1024, 1),
+                    "avgLoadTime": round(page["loadTime"] / page["pages"], 2),
+                }
+                for pageType, page in self.pages.items()
+            }
+
+    def print(self):
+        for pageType, page in self.summary().items():
+            print(
+                f"{pageType}: {page['pages']} pages, {page['avgKB']} KB and "
+                f"{page['avgLoadTime']}s per page"
+            )
+
+
+pageLoadReport = PageLoadReport()
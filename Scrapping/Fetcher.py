@@ -0,0 +1,216 @@
+import json
+import html as htmlEntities
+from urllib.parse import urljoin, urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import html
+from ChartParser import chartURL, parseChart
+from DriverFactory import header
+from MovieDetails import (
+    CAST_LINK_XPATH,
+    CAST_XPATH,
+    DIRECTOR_BLOCK_XPATH,
+    DIRECTOR_LINK_XPATH,
+    GENRES_XPATH,
+    convertArrToString,
+    scrapeCreditsPage,
+    scrapeTitlePage,
+)
+from RateController import TransientError
+from RunMetrics import runMetrics
+
+
+TRANSIENT_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class HttpFetcher:
+    """
+    Plain HTTP backend: one keep-alive connection pool shared by every worker,
+    responses are gzip-compressed on the wire and decoded by requests
+    """
+
+    def __init__(self, poolSize=4, timeout=20):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(
+            {
+                "User-Agent": header.split("=", 1)[1],
+                "Accept-Encoding": "gzip, deflate",
+                "Accept-Language": "en-US,en;q=0.9",
+            }
+        )
+
+    def fetch(self, url):
+        try:
+            with runMetrics.span("httpFetch"):
+                response = self.session.get(url, timeout=self.timeout)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise TransientError(f"request to {url} failed: {e}") from e
+        if response.status_code in TRANSIENT_STATUS_CODES:
+            raise TransientError(f"{url} returned {response.status_code}")
+        response.raise_for_status()
+        return response.text
+
+    def close(self):
+        self.session.close()
+
+
+def readJsonLD(tree):
+    for script in tree.xpath('//script[@type="application/ld+json"]'):
+        try:
+            return json.loads(script.text_content())
+        except ValueError:
+            continue
+    return {}
+
+
+def asList(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+@runMetrics.timed("parse")
+def parseTitlePage(pageSource, url):
+    """
+    Get the genres, directors and full cast link from the server-rendered title page,
+    the JSON-LD block is used when the rendered chips and credits are missing
+    """
+    tree = html.fromstring(pageSource)
+    jsonLD = None
+
+    genres = [genre.text_content().strip() for genre in tree.xpath(GENRES_XPATH)]
+    if not genres:
+        jsonLD = readJsonLD(tree)
+        genres = [htmlEntities.unescape(genre) for genre in asList(jsonLD.get("genre"))]
+
+    directors = []
+    directorBlocks = tree.xpath(DIRECTOR_BLOCK_XPATH)
+    if directorBlocks:
+        directors = [
+            director.text_content().strip()
+            for director in directorBlocks[0].xpath(DIRECTOR_LINK_XPATH)
+        ]
+    if not directors:
+        jsonLD = readJsonLD(tree) if jsonLD is None else jsonLD
+        directors = [
+            htmlEntities.unescape(director.get("name", ""))
+            for director in asList(jsonLD.get("director"))
+            if isinstance(director, dict) and director.get("name")
+        ]
+
+    castLinks = tree.xpath(CAST_LINK_XPATH)
+    if castLinks and castLinks[0].get("href"):
+        castLink = urljoin(url, castLinks[0].get("href"))
+    else:
+        castLink = urljoin(url, urlsplit(url).path.rstrip("/") + "/fullcredits/")
+
+    return genres, directors, castLink
+
+
+@runMetrics.timed("parse")
+def parseCreditsPage(pageSource):
+    tree = html.fromstring(pageSource)
+    return [cast.text_content().strip() for cast in tree.xpath(CAST_XPATH)]
+
+
+def fetchChart(httpFetcher, baseURL, controller, pageCache=None):
+    """
+    Read the chart from the server-rendered HTML without a browser
+    """
+
+    def fetch():
+        pageSource = httpFetcher.fetch(chartURL(baseURL))
+        entries = parseChart(pageSource, baseURL)
+        if not entries:
+            raise TransientError("the chart page has no movie rows")
+        if pageCache is not None:
+            pageCache.put(chartURL(baseURL), pageSource, "chart")
+        return entries
+
+    return controller.call(fetch)
+
+
+def fetchPage(httpFetcher, url, controller, pageType, pageCache=None):
+    pageSource = controller.call(httpFetcher.fetch, url)
+    if pageCache is not None:
+        pageCache.put(url, pageSource, pageType)
+    return pageSource
+
+
+def fetchAutoPage(httpFetcher, url, controller, pageType, pageCache, backend):
+    """
+    fetchPage, except that in "auto" mode a page HTTP cannot read (403, 404, or
+    429/503 still after the retries) is None, so the Selenium fallback loads it
+    """
+    try:
+        return fetchPage(httpFetcher, url, controller, pageType, pageCache)
+    except (requests.RequestException, TransientError) as e:
+        if backend != "auto":
+            raise
+        print(f"{url} could not be read over HTTP, falling back to Selenium. Error: {e}")
+        runMetrics.count("httpFallbacks", pageType=pageType)
+        return None
+
+
+def fetchMovieDetails(
+    getDriver, entry, controller, httpFetcher=None, backend="auto", pageCache=None
+):
+    """
+    Get the genres, directors and cast of a chart entry, backend is "http", "selenium"
+    or "auto" (HTTP first, Selenium only for the pages the fast parser cannot read).
+    Fresh pages of the page cache are parsed instead of being fetched, and the
+    "cache" backend reads nothing but the cache (replay).
+    The backend that served each page is recorded under "Backends".
+    """
+    backends = {}
+    genres, directors, castCrew = [], [], []
+    castLink = None
+
+    if pageCache is not None:
+        pageSource = pageCache.get(entry.url, "title")
+        if pageSource is not None:
+            genres, directors, castLink = parseTitlePage(pageSource, entry.url)
+            backends["title"] = "cache"
+    if backend in ("http", "auto") and (not genres or not directors):
+        pageSource = fetchAutoPage(
+            httpFetcher, entry.url, controller, "title", pageCache, backend
+        )
+        if pageSource is not None:
+            genres, directors, castLink = parseTitlePage(pageSource, entry.url)
+            backends["title"] = "http"
+    if not genres or not directors:
+        if backend in ("http", "cache"):
+            raise ValueError(f"Missing genres or directors on {entry.url}")
+        genres, directors, castLink = scrapeTitlePage(
+            getDriver(), entry.url, controller, pageCache
+        )
+        backends["title"] = "selenium"
+
+    if pageCache is not None:
+        pageSource = pageCache.get(castLink, "credits")
+        if pageSource is not None:
+            castCrew = parseCreditsPage(pageSource)
+            backends["credits"] = "cache"
+    if backend in ("http", "auto") and not castCrew:
+        pageSource = fetchAutoPage(
+            httpFetcher, castLink, controller, "credits", pageCache, backend
+        )
+        if pageSource is not None:
+            castCrew = parseCreditsPage(pageSource)
+            backends["credits"] = "http"
+    if not castCrew:
+        if backend in ("http", "cache"):
+            raise ValueError(f"Missing cast on {castLink}")
+        castCrew = scrapeCreditsPage(getDriver(), castLink, controller, pageCache)
+        backends["credits"] = "selenium"
+
+    return {
+        "Genre": convertArrToString(genres),
+        "Director": convertArrToString(directors),
+        "Stars": convertArrToString(castCrew),
+        "Backends": backends,
+    }
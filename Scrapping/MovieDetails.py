@@ -0,0 +1,123 @@
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException
+from DriverFactory import pageLoadReport
+from RateController import TransientError
+from RunMetrics import runMetrics
+
+
+GENRES_XPATH = '//div[@class="ipc-chip-list__scroller"]//a[@class="ipc-chip ipc-chip--on-baseAlt"]//span[@class="ipc-chip__text"]'
+DIRECTOR_BLOCK_XPATH = '//li[@data-testid="title-pc-principal-credit"]'
+DIRECTOR_LINK_XPATH = './/a[@class="ipc-metadata-list-item__list-content-item ipc-metadata-list-item__list-content-item--link"]'
+CAST_LINK_XPATH = '//div[@data-testid="title-cast-header"]//a[@class="ipc-title-link-wrapper"]'
+CAST_XPATH = '//div[@class="media-body media-vertical-align"]//h4'
+
+
+def convertArrToString(arr):
+    string = ""
+    for i in arr:
+        string += i
+        string += ", "
+    return string[:-2]
+
+
+def loadPage(
+    driver, url, controller=None, waitFor=None, timeout=20, pageType=None, pageCache=None
+):
+    """
+    Load a page through the rate controller, a page missing the waitFor element, or
+    one of the waitFor elements when it is a tuple of XPaths (timeout, 429 or 503
+    error page), is a transient failure and gets retried.
+    The transfer size and load time are recorded under pageType when given, and the
+    rendered source is kept in pageCache.
+    """
+    waitXPaths = (waitFor,) if isinstance(waitFor, str) else waitFor or ()
+
+    def load():
+        with runMetrics.span("pageLoad"):
+            driver.get(url)
+        if not waitXPaths:
+            return
+        try:
+            with runMetrics.span("wait"):
+                WebDriverWait(driver, timeout).until(
+                    EC.all_of(
+                        *(
+                            EC.presence_of_element_located((By.XPATH, xpath))
+                            for xpath in waitXPaths
+                        )
+                    )
+                )
+        except TimeoutException as e:
+            raise TransientError(f"timed out waiting for {url}") from e
+
+    if controller is None:
+        load()
+    else:
+        controller.call(load)
+    if pageType is not None:
+        pageLoadReport.record(driver, pageType)
+    if pageCache is not None:
+        pageCache.put(url, driver.page_source, pageType)
+
+
+def scrapeTitlePage(driver, url, controller=None, pageCache=None):
+    """
+    Get the genres, directors and full cast link from a rendered title page
+    """
+
+    # Navigate the Movie Page and wait for genres and directors to be present
+    loadPage(
+        driver,
+        url,
+        controller,
+        waitFor=(GENRES_XPATH, DIRECTOR_BLOCK_XPATH),
+        pageType="title",
+        pageCache=pageCache,
+    )
+    with runMetrics.span("extract"):
+        genresTag = driver.find_elements(By.XPATH, GENRES_XPATH)
+        genres = [genre.text for genre in genresTag]
+
+        directorTag = driver.find_element(By.XPATH, DIRECTOR_BLOCK_XPATH)
+        directorsTags = directorTag.find_elements(By.XPATH, DIRECTOR_LINK_XPATH)
+        directors = [director.get_attribute("innerText") for director in directorsTags]
+
+        # Navigate to cast link
+        castLink = driver.find_element(By.XPATH, CAST_LINK_XPATH).get_attribute("href")
+
+    return genres, directors, castLink
+
+
+def scrapeCreditsPage(driver, castLink, controller=None, pageCache=None):
+    """
+    Get the full cast from a rendered credits page
+    """
+
+    # Wait for cast members to be present
+    loadPage(
+        driver,
+        castLink,
+        controller,
+        waitFor=CAST_XPATH,
+        pageType="credits",
+        pageCache=pageCache,
+    )
+    with runMetrics.span("extract"):
+        castMembers = driver.find_elements(By.XPATH, CAST_XPATH)
+        return [cast.text for cast in castMembers]
+
+
+def scrapeMovieDetails(driver, entry, controller=None, pageCache=None):
+    """
+    Get the genres, directors and cast of a single chart entry
+    """
+    genres, directors, castLink = scrapeTitlePage(driver, entry.url, controller, pageCache)
+    castCrew = scrapeCreditsPage(driver, castLink, controller, pageCache)
+
+    return {
+        "Genre": convertArrToString(genres),
+        "Director": convertArrToString(directors),
+        "Stars": convertArrToString(castCrew),
+    }
@@ -0,0 +1,335 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+import pandas as pd
+from ChartParser import movieKey
+
+
+# Column of the exported Data.csv for every column of the movies table
+CSV_COLUMNS = {
+    "title": "Film Title",
+    "rating": "IMDb Rating",
+    "year": "Release Year",
+    "genre": "Genre",
+    "director": "Director",
+    "image": "Movie Image",
+    "stars": "Stars",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    hashURL TEXT PRIMARY KEY,
+    url TEXT,
+    title TEXT,
+    rating TEXT,
+    year TEXT,
+    genre TEXT,
+    director TEXT,
+    image TEXT,
+    stars TEXT,
+    updatedAt TEXT
+);
+CREATE TABLE IF NOT EXISTS chartRanks (
+    rank INTEGER PRIMARY KEY,
+    hashURL TEXT NOT NULL,
+    rating TEXT,
+    capturedAt TEXT
+);
+CREATE INDEX IF NOT EXISTS chartRanksHash ON chartRanks (hashURL);
+CREATE TABLE IF NOT EXISTS detailQueue (
+    hashURL TEXT PRIMARY KEY,
+    url TEXT,
+    title TEXT,
+    reason TEXT,
+    queuedAt TEXT
+);
+"""
+
+
+def now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+class MovieStore:
+    """
+    Scraped movies keyed by the hash of their title path, with the chart ranks kept in a
+    separate table so a movie moving up or down the chart does not need a re-scrape.
+    Every write is committed on its own so a crash only loses the movie in progress.
+    """
+
+    def __init__(self, dbPath):
+        folderPath = os.path.dirname(dbPath)
+        if folderPath and not os.path.exists(folderPath):
+            os.makedirs(folderPath)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(dbPath, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def isEmpty(self):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM movies LIMIT 1").fetchone() is None
+
+    def knownHashes(self):
+        with self.lock:
+            return {row[0] for row in self.connection.execute("SELECT hashURL FROM movies")}
+
+    def upsertMovie(self, entry, details):
+        """
+        Insert or update a fully scraped movie
+        """
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO movies
+                    (hashURL, url, title, rating, year, genre, director, image, stars, updatedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (hashURL) DO UPDATE SET
+                    url = excluded.url,
+                    title = excluded.title,
+                    rating = excluded.rating,
+                    year = excluded.year,
+                    genre = excluded.genre,
+                    director = excluded.director,
+                    image = excluded.image,
+                    stars = excluded.stars,
+                    updatedAt = excluded.updatedAt
+                """,
+                (
+                    entry.hashURL,
+                    entry.url,
+                    entry.title,
+                    entry.rating,
+                    entry.year,
+                    details["Genre"],
+                    details["Director"],
+                    entry.image,
+                    details["Stars"],
+                    now(),
+                ),
+            )
+            self.connection.execute(
+                "DELETE FROM detailQueue WHERE hashURL = ?", (entry.hashURL,)
+            )
+
+    def replaceChart(self, entries):
+        """
+        Compare a chart snapshot with the stored ranks and ratings by URL hash and write
+        only the rows that changed. New entrants are put in the detail queue, the
+        differences (including the movies that dropped out) are returned as a report.
+        """
+        capturedAt = now()
+        with self.lock, self.connection:
+            previousByRank = {
+                rank: (hashURL, rating)
+                for rank, hashURL, rating in self.connection.execute(
+                    "SELECT rank, hashURL, rating FROM chartRanks"
+                )
+            }
+            previousRanks = {hashURL: rank for rank, (hashURL, _) in previousByRank.items()}
+            storedMovies = {
+                hashURL: (rating, title)
+                for hashURL, rating, title in self.connection.execute(
+                    "SELECT hashURL, rating, title FROM movies"
+                )
+            }
+            currentHashes = {entry.hashURL for entry in entries}
+
+            report = {
+                "ratingChanges": [
+                    (entry, storedMovies[entry.hashURL][0])
+                    for entry in entries
+                    if entry.hashURL in storedMovies
+                    and storedMovies[entry.hashURL][0] != entry.rating
+                ],
+                "rankChanges": [
+                    (entry, previousRanks[entry.hashURL])
+                    for entry in entries
+                    if entry.hashURL in previousRanks
+                    and previousRanks[entry.hashURL] != entry.rank
+                ],
+                "newEntries": [
+                    entry for entry in entries if entry.hashURL not in storedMovies
+                ],
+                "dropped": [
+                    (hashURL, storedMovies.get(hashURL, (None, None))[1])
+                    for hashURL in previousRanks
+                    if hashURL not in currentHashes
+                ],
+            }
+
+            self.connection.executemany(
+                """
+                INSERT INTO chartRanks (rank, hashURL, rating, capturedAt) VALUES (?, ?, ?, ?)
+                ON CONFLICT (rank) DO UPDATE SET
+                    hashURL = excluded.hashURL,
+                    rating = excluded.rating,
+                    capturedAt = excluded.capturedAt
+                """,
+                [
+                    (entry.rank, entry.hashURL, entry.rating, capturedAt)
+                    for entry in entries
+                    if previousByRank.get(entry.rank) != (entry.hashURL, entry.rating)
+                ],
+            )
+            self.connection.execute(
+                "DELETE FROM chartRanks WHERE rank > ?", (len(entries),)
+            )
+            self.connection.executemany(
+                "UPDATE movies SET rating = ?, updatedAt = ? WHERE hashURL = ?",
+                [
+                    (entry.rating, capturedAt, entry.hashURL)
+                    for entry, _ in report["ratingChanges"]
+                ],
+            )
+            self.connection.executemany(
+                """
+                INSERT INTO detailQueue (hashURL, url, title, reason, queuedAt)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (hashURL) DO UPDATE SET reason = excluded.reason
+                """,
+                [
+                    (entry.hashURL, entry.url, entry.title, "new", capturedAt)
+                    for entry in report["newEntries"]
+                ],
+            )
+            # Nothing scrapes a movie that left the chart, earlier versions queued them
+            self.connection.execute("DELETE FROM detailQueue WHERE reason = 'dropped'")
+        return report
+
+    def detailQueue(self):
+        with self.lock:
+            return self.connection.execute(
+                "SELECT hashURL, url, title, reason, queuedAt FROM detailQueue ORDER BY queuedAt"
+            ).fetchall()
+
+    def rekey(self, entries):
+        """
+        Move the movies stored under the key of earlier versions, the hash of the whole
+        chart link with its rank-bearing query, to the key of their chart entry. A movie
+        is matched by its stored URL, or by its title when it was imported from Hash
+        Movies.csv without one. Returns the number of movies moved.
+        """
+        entryURLs = {entry.hashURL: entry.url for entry in entries}
+        byTitle = {}
+        for entry in entries:
+            # A title charted twice cannot tell its movies apart
+            byTitle[entry.title] = None if entry.title in byTitle else entry
+        with self.lock, self.connection:
+            stored = self.connection.execute("SELECT hashURL, url, title FROM movies").fetchall()
+            knownKeys = {hashURL for hashURL, _, _ in stored}
+            moves = []
+            for hashURL, url, title in stored:
+                if url:
+                    newKey = movieKey(url)
+                elif byTitle.get(title) is not None:
+                    newKey = byTitle[title].hashURL
+                else:
+                    continue
+                if newKey != hashURL:
+                    moves.append((hashURL, newKey))
+            for hashURL, newKey in moves:
+                if newKey in knownKeys:
+                    # Already scraped under its new key
+                    self.connection.execute("DELETE FROM movies WHERE hashURL = ?", (hashURL,))
+                else:
+                    self.connection.execute(
+                        "UPDATE movies SET hashURL = ?, url = COALESCE(url, ?) WHERE hashURL = ?",
+                        (newKey, entryURLs.get(newKey), hashURL),
+                    )
+                    knownKeys.add(newKey)
+                self.connection.execute(
+                    "UPDATE chartRanks SET hashURL = ? WHERE hashURL = ?", (newKey, hashURL)
+                )
+                self.connection.execute(
+                    "UPDATE OR IGNORE detailQueue SET hashURL = ? WHERE hashURL = ?",
+                    (newKey, hashURL),
+                )
+                self.connection.execute("DELETE FROM detailQueue WHERE hashURL = ?", (hashURL,))
+        return len(moves)
+
+    def importCSV(self, csvFilePath, csvHashMovies, entries=()):
+        """
+        Seed the store from the position-aligned Data.csv and Hash Movies.csv. The
+        hashes of Hash Movies.csv were taken over the rank-bearing chart links, the
+        movies of the chart entries are rekeyed to their title path.
+        """
+        if not os.path.exists(csvFilePath) or not os.path.exists(csvHashMovies):
+            return 0
+        dataDF = pd.read_csv(csvFilePath, dtype=str).fillna("")
+        hashDF = pd.read_csv(csvHashMovies, dtype=str)
+        movies = dataDF[list(CSV_COLUMNS.values())].itertuples(index=False, name=None)
+        rows = [
+            (hashURL, *movie, now())
+            for hashURL, movie in zip(hashDF["HashURL"], movies)
+            if isinstance(hashURL, str) and hashURL
+        ]
+        with self.lock, self.connection:
+            self.connection.executemany(
+                """
+                INSERT OR IGNORE INTO movies
+                    (hashURL, title, rating, year, genre, director, image, stars, updatedAt)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows,
+            )
+        print(f"Imported {len(rows)} movies from '{csvFilePath}'")
+        self.rekey(entries)
+        return len(rows)
+
+    def chartMovies(self):
+        with self.lock:
+            return pd.read_sql_query(
+                """
+                SELECT movies.hashURL, {columns}
+                FROM chartRanks JOIN movies ON movies.hashURL = chartRanks.hashURL
+                ORDER BY chartRanks.rank
+                """.format(columns=", ".join(f"movies.{column}" for column in CSV_COLUMNS)),
+                self.connection,
+            )
+
+    def exportCSV(self, csvFilePath, csvHashMovies):
+        """
+        Write the charted movies in rank order to Data.csv and Hash Movies.csv
+        """
+        df = self.chartMovies()
+        df[["hashURL"]].rename(columns={"hashURL": "HashURL"}).to_csv(
+            csvHashMovies, index=False
+        )
+        df.drop(columns=["hashURL"]).rename(columns=CSV_COLUMNS).to_csv(
+            csvFilePath, index=False
+        )
+        print(f"Exported {len(df)} movies to '{csvFilePath}'")
+
+    def exportArrow(self, arrowFilePath):
+        """
+        Write the charted movies in rank order to Data.arrow: genres, directors and
+        stars as lists of dictionary-encoded names instead of comma-joined strings
+        """
+        import pyarrow as pa
+        import pyarrow.ipc as ipc
+
+        df = self.chartMovies().drop(columns=["hashURL"]).rename(columns=CSV_COLUMNS)
+        df["IMDb Rating"] = pd.to_numeric(df["IMDb Rating"], errors="coerce")
+        df["Release Year"] = pd.to_numeric(df["Release Year"], errors="coerce").astype("Int64")
+        names = pa.list_(pa.dictionary(pa.int32(), pa.string()))
+        columns = {}
+        for column in df.columns:
+            if column in ("Genre", "Director", "Stars"):
+                lists = df[column].fillna("").map(
+                    lambda value: [name.strip() for name in value.split(",") if name.strip()]
+                )
+                columns[column] = pa.array(lists.tolist(), type=pa.list_(pa.string())).cast(names)
+            else:
+                columns[column] = pa.array(df[column])
+        table = pa.table(columns)
+        with pa.OSFile(arrowFilePath, "wb") as sink:
+            with ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        print(f"Exported {len(df)} movies to '{arrowFilePath}'")
@@ -0,0 +1,275 @@
+import os
+import time
+import zlib
+import hashlib
+import sqlite3
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from RunMetrics import runMetrics
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Seconds a cached page is served before it is fetched again, per page type
+DEFAULT_TTLS = {
+    "chart": 6 * 3600,
+    "title": 30 * 24 * 3600,
+    "credits": 30 * 24 * 3600,
+    "reviews": 7 * 24 * 3600,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    pageType TEXT,
+    storedAt REAL,
+    usedAt REAL
+);
+CREATE INDEX IF NOT EXISTS pagesByDigest ON pages (digest);
+CREATE INDEX IF NOT EXISTS pagesByUse ON pages (usedAt);
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    codec TEXT,
+    size INTEGER,
+    rawSize INTEGER
+);
+"""
+
+CODEC_EXTENSIONS = {"zstd": ".zst", "zlib": ".zz"}
+
+
+def compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=10).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def decompress(codec, data):
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if zstandard is None:
+        raise RuntimeError("the page was cached with zstd, install zstandard to read it")
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+def pageKey(url):
+    """
+    The URL a page is cached under, without the fragment and the ref_ query IMDb adds
+    to its links (the chart links carry the rank of the movie in it)
+    """
+    parts = urlsplit(url)
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name != "ref_"
+    ]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+class PageCache:
+    """
+    Rendered page sources keyed by URL (see pageKey). The pages are stored compressed under the
+    SHA-256 of their content, so identical pages share one file, a page older than the
+    TTL of its type is fetched again, and the least recently used pages are evicted
+    once the files take more than maxBytes. In replay mode the TTLs are ignored and
+    nothing is written, every page comes from the cache.
+    """
+
+    def __init__(self, cacheDir, maxBytes=1024 * 2**20, ttls=None, replay=False):
+        self.cacheDir = cacheDir
+        self.maxBytes = maxBytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.replay = replay
+        os.makedirs(os.path.join(cacheDir, "blobs"), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            os.path.join(cacheDir, "index.db"), check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        self.rekey()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.stored = 0
+        self.evicted = 0
+
+    def close(self):
+        self.connection.close()
+
+    def rekey(self):
+        """
+        Move the pages cached by earlier versions under their raw URL to their pageKey,
+        the copy stored last is kept
+        """
+        with self.lock, self.connection:
+            rows = self.connection.execute(
+                """
+                SELECT url, digest, storedAt FROM pages
+                WHERE url LIKE '%?%' OR url LIKE '%#%'
+                """
+            ).fetchall()
+            for url, digest, storedAt in rows:
+                key = pageKey(url)
+                if key == url:
+                    continue
+                existing = self.connection.execute(
+                    "SELECT digest, storedAt FROM pages WHERE url = ?", (key,)
+                ).fetchone()
+                if existing is not None and existing[1] >= storedAt:
+                    self.connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+                    self.dropUnreferenced(digest)
+                    continue
+                self.connection.execute("DELETE FROM pages WHERE url = ?", (key,))
+                self.connection.execute("UPDATE pages SET url = ? WHERE url = ?", (key, url))
+                if existing is not None:
+                    self.dropUnreferenced(existing[0])
+
+    def blobPath(self, digest, codec):
+        return os.path.join(
+            self.cacheDir, "blobs", digest[:2], digest + CODEC_EXTENSIONS[codec]
+        )
+
+    @runMetrics.timed("cacheRead")
+    def get(self, url, pageType):
+        """
+        The cached source of the page, None when it is missing or older than its TTL
+        """
+        url = pageKey(url)
+        with self.lock:
+            row = self.connection.execute(
+                """
+                SELECT pages.digest, pages.storedAt, blobs.codec FROM pages
+                JOIN blobs ON blobs.digest = pages.digest WHERE pages.url = ?
+                """,
+                (url,),
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            digest, storedAt, codec = row
+            ttl = self.ttls.get(pageType)
+            if not self.replay and ttl is not None and time.time() - storedAt > ttl:
+                self.expired += 1
+                return None
+            try:
+                with open(self.blobPath(digest, codec), "rb") as file:
+                    pageSource = decompress(codec, file.read()).decode("utf-8")
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            with self.connection:
+                self.connection.execute(
+                    "UPDATE pages SET usedAt = ? WHERE url = ?", (time.time(), url)
+                )
+            self.hits += 1
+            return pageSource
+
+    @runMetrics.timed("cacheWrite")
+    def put(self, url, pageSource, pageType):
+        if self.replay:
+            return
+        url = pageKey(url)
+        data = pageSource.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            known = self.connection.execute(
+                "SELECT 1 FROM blobs WHERE digest = ?", (digest,)
+            ).fetchone()
+            with self.connection:
+                if known is None:
+                    codec, compressed = compress(data)
+                    filePath = self.blobPath(digest, codec)
+                    os.makedirs(os.path.dirname(filePath), exist_ok=True)
+                    with open(f"{filePath}.tmp", "wb") as file:
+                        file.write(compressed)
+                    os.replace(f"{filePath}.tmp", filePath)
+                    self.connection.execute(
+                        "INSERT INTO blobs (digest, codec, size, rawSize) VALUES (?, ?, ?, ?)",
+                        (digest, codec, len(compressed), len(data)),
+                    )
+                previous = self.connection.execute(
+                    "SELECT digest FROM pages WHERE url = ?", (url,)
+                ).fetchone()
+                storedAt = time.time()
+                self.connection.execute(
+                    """
+                    INSERT INTO pages (url, digest, pageType, storedAt, usedAt)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT (url) DO UPDATE SET
+                        digest = excluded.digest,
+                        pageType = excluded.pageType,
+                        storedAt = excluded.storedAt,
+                        usedAt = excluded.usedAt
+                    """,
+                    (url, digest, pageType, storedAt, storedAt),
+                )
+                if previous is not None and previous[0] != digest:
+                    self.dropUnreferenced(previous[0])
+                self.stored += 1
+                self.evict()
+
+    def dropUnreferenced(self, digest):
+        """
+        Delete the file of a digest no URL points to anymore, returns the bytes freed
+        """
+        if self.connection.execute(
+            "SELECT 1 FROM pages WHERE digest = ? LIMIT 1", (digest,)
+        ).fetchone():
+            return 0
+        row = self.connection.execute(
+            "DELETE FROM blobs WHERE digest = ? RETURNING codec, size", (digest,)
+        ).fetchone()
+        if row is None:
+            return 0
+        try:
+            os.remove(self.blobPath(digest, row[0]))
+        except FileNotFoundError:
+            pass
+        return row[1]
+
+    def totalBytes(self):
+        return self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def evict(self):
+        """
+        Drop the least recently used pages until the files fit in maxBytes
+        """
+        totalBytes = self.totalBytes()
+        if totalBytes <= self.maxBytes:
+            return
+        for url, digest in self.connection.execute(
+            "SELECT url, digest FROM pages ORDER BY usedAt"
+        ).fetchall():
+            self.connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+            totalBytes -= self.dropUnreferenced(digest)
+            self.evicted += 1
+            if totalBytes <= self.maxBytes:
+                return
+
+    def stats(self):
+        with self.lock:
+            pages, blobs, size, rawSize = self.connection.execute(
+                """
+                SELECT (SELECT COUNT(*) FROM pages), COUNT(*),
+                       COALESCE(SUM(size), 0), COALESCE(SUM(rawSize), 0)
+                FROM blobs
+                """
+            ).fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "stored": self.stored,
+                "evicted": self.evicted,
+                "pages": pages,
+                "blobs": blobs,
+                "MB": round(size / 2**20, 2),
+                "rawMB": round(rawSize / 2**20, 2),
+            }
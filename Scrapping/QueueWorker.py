@@ -0,0 +1,391 @@
+import os
+import time
+import socket
+import argparse
+import threading
+from urllib.parse import urlencode
+import pandas as pd
+from ChartParser import ChartEntry, cachedChart, movieKey
+from DriverFactory import BLOCKING_PROFILES, createDriver
+from Fetcher import HttpFetcher, fetchChart, fetchMovieDetails
+from MovieStore import MovieStore
+from PageCache import PageCache
+from RateController import RateController
+from ReviewIndex import ReviewIndex
+from ReviewParser import filterReviews, parseReviewPage, reviewFeedURL
+from ReviewWriter import FILE_FORMATS, ReviewWriter
+from RunMetrics import runMetrics
+from ScrapeQueue import TASK_KINDS, movieTask, openQueue, reviewPageTask
+
+
+# The base URL can point to a local server that serves saved IMDb pages
+URL = os.environ.get("IMDB_URL", "https://m.imdb.com")
+csvFilePath = os.path.join(".", "CSV Folder", "Data.csv")
+csvHashMovies = os.path.join(".", "CSV Folder", "Hash Movies.csv")
+csvReviews = os.path.join(".", "CSV Folder", "Review.csv")
+movieStorePath = os.path.join(".", "CSV Folder", "Movies.db")
+
+
+class LeaseKeeper:
+    """
+    Renew the lease of the task being worked on from a background thread, lost is set
+    when another worker took the task over
+    """
+
+    def __init__(self, scrapeQueue, task, workerID, leaseSeconds):
+        self.scrapeQueue = scrapeQueue
+        self.task = task
+        self.workerID = workerID
+        self.leaseSeconds = leaseSeconds
+        self.lost = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.leaseSeconds / 3):
+            if not self.scrapeQueue.heartbeat(self.task, self.workerID, self.leaseSeconds):
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+
+
+def enqueueRun(scrapeQueue, args):
+    """
+    Queue the movies the store does not have and the first review page of the movies
+    whose reviews are not complete, a task already in the queue is not added again
+    """
+    controller = RateController(initialInterval=args.request_interval)
+    httpFetcher = HttpFetcher(poolSize=1)
+    pageCache = None if args.no_cache else PageCache(args.cache_dir)
+    try:
+        entries = cachedChart(pageCache, URL) if pageCache is not None else None
+        if not entries:
+            entries = fetchChart(httpFetcher, URL, controller, pageCache)
+    finally:
+        httpFetcher.close()
+        if pageCache is not None:
+            pageCache.close()
+    print(f"Total Blocks found: {len(entries)}")
+
+    store = MovieStore(movieStorePath)
+    if store.isEmpty():
+        store.importCSV(csvFilePath, csvHashMovies, entries)
+    else:
+        store.rekey(entries)
+    store.replaceChart(entries)
+    knownHashes = store.knownHashes()
+    store.close()
+    tasks = []
+    if "movie" in args.kinds:
+        tasks += [movieTask(entry) for entry in entries if entry.hashURL not in knownHashes]
+    if "reviews" in args.kinds:
+        reviewWriter = ReviewWriter(args.reviews_dir, fileFormat=args.format)
+        reviewWriter.rekey({entry.title: entry.hashURL for entry in entries})
+        completed = reviewWriter.completedMovies()
+        reviewWriter.close()
+        tasks += [
+            reviewPageTask(entry.hashURL, entry.url, entry.title)
+            for entry in entries
+            if entry.hashURL not in completed
+        ]
+
+    if args.retry_failed:
+        print(f"{scrapeQueue.retryFailed()} failed tasks queued again")
+    print(f"{scrapeQueue.enqueue(tasks)} of {len(tasks)} tasks added to the queue")
+
+
+def reviewPage(payload, controller, httpFetcher):
+    """
+    One page of the review feed: the reviews kept by filterReviews as (rank, title,
+    review) rows, and the task of the next page unless it was the last one
+    """
+    url = reviewFeedURL(payload["url"])
+    if payload["paginationKey"]:
+        url += "?" + urlencode({"paginationKey": payload["paginationKey"]})
+    pageSource = controller.call(httpFetcher.fetch, url)
+    rawReviews, paginationKey = parseReviewPage(pageSource)
+    reviewRatings, reviewTitles, reviewContents = filterReviews(rawReviews)
+    result = {
+        "reviews": list(zip(reviewRatings, reviewTitles, reviewContents)),
+        "last": paginationKey is None,
+    }
+    followUps = []
+    if paginationKey is not None:
+        followUps.append(
+            reviewPageTask(
+                payload["hashURL"],
+                payload["url"],
+                payload["title"],
+                payload["page"] + 1,
+                paginationKey,
+            )
+        )
+    return result, followUps
+
+
+def workRun(scrapeQueue, args):
+    """
+    Lease tasks until none is pending or held by another worker, or until --max-tasks
+    """
+    workerID = args.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    controller = RateController(
+        initialInterval=args.request_interval, maxRetries=args.max_retries
+    )
+    httpFetcher = HttpFetcher(poolSize=1)
+    pageCache = None if args.no_cache else PageCache(args.cache_dir)
+    drivers = []
+
+    def getDriver():
+        if not drivers:
+            drivers.append(createDriver(profile=args.block_resources))
+        return drivers[0]
+
+    def run(task):
+        if task.kind == "movie":
+            entry = ChartEntry(**task.payload)
+            with runMetrics.movie(entry.title):
+                details = fetchMovieDetails(
+                    getDriver,
+                    entry,
+                    controller,
+                    httpFetcher=httpFetcher,
+                    backend=args.backend,
+                    pageCache=pageCache,
+                )
+            return details, []
+        return reviewPage(task.payload, controller, httpFetcher)
+
+    print(f"Worker {workerID} started")
+    finished = 0
+    try:
+        while args.max_tasks is None or finished < args.max_tasks:
+            task = scrapeQueue.lease(workerID, args.lease_seconds, args.kinds)
+            if task is None:
+                counts = scrapeQueue.counts()
+                if not any(
+                    counts[kind]["pending"] or counts[kind]["leased"] for kind in args.kinds
+                ):
+                    break
+                # A task held by another worker can expire or queue a next page
+                time.sleep(args.poll_seconds)
+                continue
+
+            startedAt = time.time()
+            try:
+                with LeaseKeeper(scrapeQueue, task, workerID, args.lease_seconds) as keeper:
+                    result, followUps = run(task)
+            except Exception as e:
+                state = scrapeQueue.fail(task, workerID, str(e), startedAt)
+                runMetrics.count("tasksFailed", kind=task.kind)
+                print(f"{task.taskID} failed (attempt {task.attempts}, {state}). Error: {e}")
+            except BaseException:
+                scrapeQueue.release(task, workerID)
+                raise
+            else:
+                if keeper.lost or not scrapeQueue.complete(
+                    task, workerID, result, startedAt, followUps
+                ):
+                    runMetrics.count("leasesLost", kind=task.kind)
+                    print(f"{task.taskID} was taken over by another worker, result dropped")
+                else:
+                    runMetrics.count("tasksDone", kind=task.kind)
+            finished += 1
+    finally:
+        httpFetcher.close()
+        for driver in drivers:
+            driver.quit()
+        if pageCache is not None:
+            pageCache.close()
+
+    print(f"Worker {workerID} finished {finished} tasks")
+    runMetrics.printSummary()
+    sections = {"rateController": controller.stats(), "worker": {"tasks": finished}}
+    reportPath = runMetrics.write(args.report_dir, f"QueueWorker-{workerID}", sections)
+    print(f"Run report written to '{reportPath}'")
+
+
+def commitRun(scrapeQueue, args):
+    """
+    Write the results of the done tasks into the movie store and the review partitions,
+    then export the CSVs. The store upserts by movie and the writer drops reviews it
+    already has, so results committed twice (a crash between the write and
+    markCommitted, or a task run by two workers) are written once.
+    """
+    store = MovieStore(movieStorePath)
+    reviewWriter = ReviewWriter(
+        args.reviews_dir, fileFormat=args.format, batchRows=args.batch_rows
+    )
+    committed = {kind: 0 for kind in TASK_KINDS}
+    try:
+        while True:
+            batch = scrapeQueue.uncommitted(args.batch_tasks)
+            if not batch:
+                break
+            for task, result in batch:
+                # Tasks queued by earlier versions carry the rank-bearing key
+                payload = {**task.payload, "hashURL": movieKey(task.payload["url"])}
+                if task.kind == "movie":
+                    store.upsertMovie(ChartEntry(**payload), result)
+                else:
+                    reviewRatings, reviewTitles, reviewContents = (
+                        zip(*result["reviews"]) if result["reviews"] else ((), (), ())
+                    )
+                    reviewWriter.add(
+                        payload["hashURL"],
+                        payload["title"],
+                        reviewRatings,
+                        reviewTitles,
+                        reviewContents,
+                    )
+                    if result["last"]:
+                        reviewWriter.complete(payload["hashURL"], payload["title"])
+                committed[task.kind] += 1
+            reviewWriter.flush()
+            scrapeQueue.markCommitted([task.taskID for task, _ in batch])
+        print(f"Committed {committed['movie']} movies and {committed['reviews']} review pages")
+
+        store.exportCSV(csvFilePath, csvHashMovies)
+        chartKeys = store.chartMovies()["hashURL"].tolist()
+        reviewWriter.export(csvReviews, chartKeys)
+        print(f"Review writer: {reviewWriter.stats()}")
+    finally:
+        reviewWriter.close()
+        store.close()
+
+    if committed["reviews"] and not args.no_index and args.format == "csv":
+        reviewIndex = ReviewIndex(args.index)
+        print(f"Indexed {reviewIndex.update([args.reviews_dir])} new reviews")
+        reviewIndex.close()
+
+
+def statusRun(scrapeQueue, args):
+    counts = pd.DataFrame(scrapeQueue.counts()).T
+    print(counts.to_string())
+    workers = pd.DataFrame(scrapeQueue.workerStats(args.window_minutes * 60))
+    if workers.empty:
+        print("No worker has leased a task yet")
+        return
+    workers = workers.rename(
+        columns={
+            "tasksPerMinute": f"tasks/min ({args.window_minutes:g} min)",
+            "lastSeenSeconds": "last seen (s ago)",
+        }
+    )
+    print()
+    print(workers.fillna("").to_string(index=False))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Share one scrape between workers on several machines through a "
+        "queue of movie and review page tasks"
+    )
+    parser.add_argument(
+        "--queue",
+        default=os.path.join("CSV Folder", "Scrape Queue.db"),
+        help="Path of the SQLite queue for workers on one host, or redis://host:port/db "
+        "for workers on several machines",
+    )
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=3,
+        help="A task is given up after this many leases",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.path.join("CSV Folder", "Page Cache"),
+        help="Folder of the page cache of this machine",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true", help="Fetch every page and cache nothing"
+    )
+    parser.add_argument(
+        "--reviews-dir",
+        default=os.path.join("CSV Folder", "Reviews"),
+        help="One file of reviews per movie, shared with ReviewScraper.py",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FILE_FORMATS,
+        default="csv",
+        help="File format of the per-movie partitions",
+    )
+    parser.add_argument(
+        "--request-interval",
+        type=float,
+        default=5.0,
+        help="Initial seconds between two requests of this worker",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueueParser = commands.add_parser(
+        "enqueue", help="Queue the movies and review feeds that are not scraped yet"
+    )
+    enqueueParser.add_argument("--kinds", nargs="+", choices=TASK_KINDS, default=TASK_KINDS)
+    enqueueParser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Queue the tasks that ran out of attempts again",
+    )
+
+    workParser = commands.add_parser("work", help="Lease and run tasks")
+    workParser.add_argument(
+        "--worker-id", help="Name shown by status, host name and process ID by default"
+    )
+    workParser.add_argument("--kinds", nargs="+", choices=TASK_KINDS, default=TASK_KINDS)
+    workParser.add_argument(
+        "--lease-seconds",
+        type=float,
+        default=120,
+        help="A task is given to another worker when its lease is not renewed for this "
+        "long, it is renewed every third of it",
+    )
+    workParser.add_argument("--poll-seconds", type=float, default=5)
+    workParser.add_argument("--max-tasks", type=int, help="Stop after this many tasks")
+    workParser.add_argument("--max-retries", type=int, default=3)
+    workParser.add_argument(
+        "--backend", choices=["auto", "http", "selenium"], default="auto"
+    )
+    workParser.add_argument(
+        "--block-resources", choices=list(BLOCKING_PROFILES), default="text"
+    )
+    workParser.add_argument(
+        "--report-dir", default=os.path.join("CSV Folder", "Run Reports")
+    )
+
+    commitParser = commands.add_parser(
+        "commit", help="Write the results into the movie store and the review partitions"
+    )
+    commitParser.add_argument("--batch-tasks", type=int, default=200)
+    commitParser.add_argument("--batch-rows", type=int, default=500)
+    commitParser.add_argument(
+        "--index", default=os.path.join("CSV Folder", "Review Index.db")
+    )
+    commitParser.add_argument(
+        "--no-index", action="store_true", help="Do not update the review search index"
+    )
+
+    statusParser = commands.add_parser(
+        "status", help="Tasks per state and the throughput of every worker"
+    )
+    statusParser.add_argument("--window-minutes", type=float, default=10)
+    args = parser.parse_args()
+
+    scrapeQueue = openQueue(args.queue, maxAttempts=args.max_attempts)
+    try:
+        {
+            "enqueue": enqueueRun,
+            "work": workRun,
+            "commit": commitRun,
+            "status": statusRun,
+        }[args.command](scrapeQueue, args)
+    finally:
+        scrapeQueue.close()
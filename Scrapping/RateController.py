@@ -0,0 +1,148 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from RunMetrics import runMetrics
+
+
+class TransientError(Exception):
+    """
+    A failure worth retrying: timeout, throttling (429) or an unavailable server (503)
+    """
+
+
+class RateController:
+    """
+    Spaces requests across every worker of a run and adapts the spacing to the server:
+    the interval shrinks while responses are fast and error free and doubles on every
+    error, transient failures are retried a bounded number of times
+    """
+
+    def __init__(
+        self,
+        initialInterval=5.0,
+        minInterval=1.0,
+        maxInterval=120.0,
+        maxRetries=3,
+        window=20,
+        slowLatency=10.0,
+        speedUp=0.9,
+        backoff=2.0,
+    ):
+        self.interval = initialInterval
+        self.minInterval = minInterval
+        self.maxInterval = maxInterval
+        self.maxRetries = maxRetries
+        self.slowLatency = slowLatency
+        self.speedUp = speedUp
+        self.backoff = backoff
+
+        self.lock = threading.Lock()
+        self.nextSlot = 0.0
+        self.recent = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+
+    def reserveSlot(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.nextSlot)
+            self.nextSlot = slot + self.interval
+        return slot - now
+
+    def acquire(self):
+        delay = self.reserveSlot()
+        if delay > 0:
+            time.sleep(delay)
+            runMetrics.addSpan("sleep", delay)
+
+    async def acquireAsync(self):
+        delay = self.reserveSlot()
+        if delay > 0:
+            await asyncio.sleep(delay)
+            runMetrics.addSpan("sleep", delay)
+
+    def recordSuccess(self, latency):
+        with self.lock:
+            self.requests += 1
+            self.recent.append((latency, True))
+            healthy = all(ok for _, ok in self.recent)
+            if latency > self.slowLatency:
+                self.interval = min(self.maxInterval, self.interval * 1.25)
+            elif healthy:
+                self.interval = max(self.minInterval, self.interval * self.speedUp)
+
+    def recordFailure(self, latency):
+        with self.lock:
+            self.requests += 1
+            self.errors += 1
+            self.recent.append((latency, False))
+            self.interval = min(self.maxInterval, self.interval * self.backoff)
+            self.nextSlot = max(self.nextSlot, time.monotonic() + self.interval)
+
+    def call(self, fn, *args, **kwargs):
+        """
+        Run fn once its slot is due, retrying it on TransientError
+        """
+        for attempt in range(self.maxRetries + 1):
+            self.acquire()
+            startTime = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except TransientError as e:
+                self.recordFailure(time.monotonic() - startTime)
+                if attempt == self.maxRetries:
+                    raise
+                with self.lock:
+                    self.retries += 1
+                runMetrics.count("retries")
+                print(
+                    f"Transient failure ({e}), retry {attempt + 1}/{self.maxRetries} "
+                    f"in {self.interval:.1f}s"
+                )
+                continue
+            self.recordSuccess(time.monotonic() - startTime)
+            return result
+
+    async def callAsync(self, fn, *args, **kwargs):
+        """
+        Same as call for a coroutine function, waiting without blocking the event loop
+        """
+        for attempt in range(self.maxRetries + 1):
+            await self.acquireAsync()
+            startTime = time.monotonic()
+            try:
+                result = await fn(*args, **kwargs)
+            except TransientError as e:
+                self.recordFailure(time.monotonic() - startTime)
+                if attempt == self.maxRetries:
+                    raise
+                with self.lock:
+                    self.retries += 1
+                runMetrics.count("retries")
+                print(
+                    f"Transient failure ({e}), retry {attempt + 1}/{self.maxRetries} "
+                    f"in {self.interval:.1f}s"
+                )
+                continue
+            self.recordSuccess(time.monotonic() - startTime)
+            return result
+
+    def stats(self):
+        with self.lock:
+            latencies = [latency for latency, _ in self.recent]
+            return {
+                "requests": self.requests,
+                "errors": self.errors,
+                "retries": self.retries,
+                "interval": round(self.interval, 2),
+                "recentErrorRate": (
+                    sum(1 for _, ok in self.recent if not ok) / len(self.recent)
+                    if self.recent
+                    else 0.0
+                ),
+                "recentLatency": (
+                    sum(latencies) / len(latencies) if latencies else 0.0
+                ),
+            }
@@ -0,0 +1,192 @@
+import os
+import time
+import asyncio
+import argparse
+import aiohttp
+from ChartParser import parseChart
+from DriverFactory import header
+from Fetcher import TRANSIENT_STATUS_CODES
+from RateController import RateController, TransientError
+from ReviewIndex import ReviewIndex
+from ReviewParser import filterReviews, parseReviewPage, reviewFeedURL
+from ReviewWriter import FILE_FORMATS, ReviewWriter
+
+
+class ReviewHarvester:
+    """
+    Follow the review feed of every movie page by page over HTTP, a bounded number of
+    requests are in flight across all movies and each page goes to the review writer
+    as soon as it is parsed, so memory does not grow with the number of reviews.
+    csvFilePath is the Review.csv the partitions are exported to at the end.
+    """
+
+    def __init__(self, reviewWriter, csvFilePath, controller, concurrency=4, reviewIndex=None):
+        self.reviewWriter = reviewWriter
+        self.csvFilePath = csvFilePath
+        self.reviewIndex = reviewIndex
+        self.controller = controller
+        self.concurrency = concurrency
+        self.inFlight = asyncio.Semaphore(concurrency)
+        self.reviewCount = 0
+
+    async def fetch(self, session, url, params=None):
+        async def get():
+            async with self.inFlight:
+                try:
+                    async with session.get(url, params=params) as response:
+                        if response.status in TRANSIENT_STATUS_CODES:
+                            raise TransientError(f"{url} returned {response.status}")
+                        response.raise_for_status()
+                        return await response.text()
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                    raise TransientError(f"request to {url} failed: {e}") from e
+
+        return await self.controller.callAsync(get)
+
+    def writeReviews(self, entry, rawReviews):
+        reviewRatings, reviewTitles, reviewContents = filterReviews(rawReviews)
+        self.reviewWriter.add(
+            entry.hashURL, entry.title, reviewRatings, reviewTitles, reviewContents
+        )
+        self.reviewCount += len(reviewTitles)
+        return len(reviewTitles)
+
+    async def harvestMovie(self, session, entry):
+        feedURL = reviewFeedURL(entry.url)
+        paginationKey = None
+        seenKeys = set()
+        pageCount = 0
+        movieReviews = 0
+
+        while True:
+            params = {"paginationKey": paginationKey} if paginationKey else None
+            try:
+                pageSource = await self.fetch(session, feedURL, params)
+            except (TransientError, aiohttp.ClientError) as e:
+                # Not marked complete, the next run reads the feed again and only
+                # the missing reviews are written. The other movies go on.
+                print(
+                    f"Stopped the reviews of {entry.title} after {pageCount} pages. "
+                    f"Error: {e}"
+                )
+                return
+
+            rawReviews, paginationKey = parseReviewPage(pageSource)
+            movieReviews += self.writeReviews(entry, rawReviews)
+            pageCount += 1
+            if paginationKey is None:
+                break
+            if paginationKey in seenKeys:
+                print(
+                    f"Stopped the reviews of {entry.title} after {pageCount} pages, "
+                    f"the feed returned the pagination key {paginationKey} again"
+                )
+                return
+            seenKeys.add(paginationKey)
+
+        print(f"The Movie {entry.title} has {movieReviews} Reviews in {pageCount} pages")
+        self.reviewWriter.complete(entry.hashURL, entry.title)
+        if self.reviewIndex is not None and self.reviewWriter.fileFormat == "csv":
+            # The other movies keep writing, a row still being written is indexed later
+            await asyncio.to_thread(
+                self.reviewIndex.update, [self.reviewWriter.partitionPath(entry.hashURL)]
+            )
+
+    async def harvest(self, baseURL, entries=None):
+        timeout = aiohttp.ClientTimeout(total=60)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        headers = {"User-Agent": header.split("=", 1)[1]}
+        async with aiohttp.ClientSession(
+            connector=connector, timeout=timeout, headers=headers
+        ) as session:
+            if entries is None:
+                chartSource = await self.fetch(session, baseURL + "/chart/top/")
+                entries = parseChart(chartSource, baseURL)
+            print(f"Total Blocks found: {len(entries)}")
+
+            movieKeys = {entry.title: entry.hashURL for entry in entries}
+            if self.reviewWriter.isEmpty() and os.path.exists(self.csvFilePath):
+                imported = self.reviewWriter.importCSV(self.csvFilePath, movieKeys)
+                print(f"Imported {imported} reviews from '{self.csvFilePath}'")
+            else:
+                self.reviewWriter.rekey(movieKeys)
+            completed = self.reviewWriter.completedMovies()
+            remaining = [entry for entry in entries if entry.hashURL not in completed]
+            print(f"{len(entries) - len(remaining)} movies already have all their reviews")
+            await asyncio.gather(*(self.harvestMovie(session, entry) for entry in remaining))
+
+        self.reviewWriter.export(self.csvFilePath, [entry.hashURL for entry in entries])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Harvest the reviews of the IMDb Top 250 movies over HTTP"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of review pages requested at the same time",
+    )
+    parser.add_argument(
+        "--request-interval",
+        type=float,
+        default=1.0,
+        help="Initial seconds between two requests across all movies",
+    )
+    parser.add_argument(
+        "--reviews-dir",
+        default=os.path.join("CSV Folder", "Reviews"),
+        help="One file of reviews per movie, shared with ReviewScraper.py",
+    )
+    parser.add_argument(
+        "--format",
+        choices=FILE_FORMATS,
+        default="csv",
+        help="File format of the per-movie partitions",
+    )
+    parser.add_argument(
+        "--batch-rows",
+        type=int,
+        default=500,
+        help="Reviews held in memory before they are written",
+    )
+    parser.add_argument(
+        "--index",
+        default=os.path.join("CSV Folder", "Review Index.db"),
+        help="Full-text index of the reviews, updated after every movie",
+    )
+    parser.add_argument(
+        "--no-index", action="store_true", help="Do not update the review index"
+    )
+    args = parser.parse_args()
+
+    # The base URL can point to a local server that serves a paginated review feed
+    URL = os.environ.get("IMDB_URL", "https://m.imdb.com")
+    csvReviews = os.path.join(".", "CSV Folder", "Review.csv")
+
+    controller = RateController(initialInterval=args.request_interval, minInterval=0.1)
+    reviewWriter = ReviewWriter(
+        args.reviews_dir, fileFormat=args.format, batchRows=args.batch_rows
+    )
+    # The index reads the CSV partitions
+    reviewIndex = None if args.no_index or args.format != "csv" else ReviewIndex(args.index)
+    harvester = ReviewHarvester(
+        reviewWriter,
+        csvReviews,
+        controller,
+        concurrency=args.concurrency,
+        reviewIndex=reviewIndex,
+    )
+
+    startTime = time.perf_counter()
+    asyncio.run(harvester.harvest(URL))
+    elapsed = time.perf_counter() - startTime
+    print(f"Harvested {harvester.reviewCount} reviews in {elapsed:.1f}s")
+    print(f"Rate controller: {controller.stats()}")
+    reviewWriter.flush()
+    print(f"Review writer: {reviewWriter.stats()}")
+    reviewWriter.close()
+    if reviewIndex is not None:
+        print(f"Review index: {reviewIndex.stats()}")
+        reviewIndex.close()
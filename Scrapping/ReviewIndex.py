@@ -0,0 +1,268 @@
+import io
+import os
+import hashlib
+import sqlite3
+import argparse
+import threading
+import numpy as np
+import pandas as pd
+
+
+REVIEW_COLUMNS = ["Movie", "Title", "Review", "Rank"]
+
+# The reviews with their movie, and an FTS5 index over the title and text that reads
+# the text from the reviews table instead of keeping a second copy of it. The movie is
+# indexed as a token too, so a search in one movie only ranks the reviews of the movie.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS movies (
+    MovieID INTEGER PRIMARY KEY,
+    Movie TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reviews (
+    ReviewID INTEGER PRIMARY KEY,
+    MovieID INTEGER NOT NULL,
+    SourceID INTEGER NOT NULL,
+    Title TEXT,
+    Review TEXT,
+    Rank INTEGER,
+    MovieKey TEXT GENERATED ALWAYS AS ('movie' || MovieID) VIRTUAL
+);
+CREATE INDEX IF NOT EXISTS reviewsByMovie ON reviews (MovieID);
+CREATE INDEX IF NOT EXISTS reviewsBySource ON reviews (SourceID);
+CREATE VIRTUAL TABLE IF NOT EXISTS reviewsText USING fts5 (
+    Title,
+    Review,
+    MovieKey,
+    content='reviews',
+    content_rowid='ReviewID',
+    tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS sources (
+    SourceID INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    offset INTEGER,
+    head TEXT
+);
+"""
+
+
+def completeRows(data):
+    """
+    Length of the part of data made of whole CSV rows: up to the last newline that is
+    not inside a quoted field, i.e. that has an even number of quotes before it
+    """
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    newlines = np.flatnonzero(buffer == ord("\n"))
+    if not len(newlines):
+        return 0
+    quotes = np.cumsum(buffer == ord('"'))
+    outside = newlines[quotes[newlines] % 2 == 0]
+    return int(outside[-1]) + 1 if len(outside) else 0
+
+
+def headDigest(path, offset, size=65536):
+    """
+    Digest of the start of the part of a file already indexed, it changes when the
+    file is rewritten with other rows
+    """
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read(min(offset, size))).hexdigest()
+
+
+class ReviewIndex:
+    """
+    Full-text index of the scraped reviews in SQLite (FTS5), keyed to the movie. The
+    review CSVs are append-only, so every file is indexed from the byte offset where
+    the last update stopped and an update only parses the rows added since. A file
+    that shrank or was replaced is indexed again from the start.
+    """
+
+    def __init__(self, dbPath):
+        folderPath = os.path.dirname(dbPath)
+        if folderPath and not os.path.exists(folderPath):
+            os.makedirs(folderPath)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(dbPath, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        self.loadMovieIDs()
+
+    def loadMovieIDs(self):
+        self.movieIDs = {
+            movie: movieID
+            for movieID, movie in self.connection.execute("SELECT MovieID, Movie FROM movies")
+        }
+
+    def close(self):
+        self.connection.close()
+
+    def movieID(self, movie):
+        if movie not in self.movieIDs:
+            self.movieIDs[movie] = self.connection.execute(
+                "INSERT INTO movies (Movie) VALUES (?)", (movie,)
+            ).lastrowid
+        return self.movieIDs[movie]
+
+    def source(self, csvFilePath):
+        """
+        ID of the file and the offset to index it from, its reviews are dropped when
+        it is not the file that was indexed anymore
+        """
+        path = os.path.abspath(csvFilePath)
+        row = self.connection.execute(
+            "SELECT SourceID, offset, head FROM sources WHERE path = ?", (path,)
+        ).fetchone()
+        if row is None:
+            sourceID = self.connection.execute(
+                "INSERT INTO sources (path, offset) VALUES (?, 0)", (path,)
+            ).lastrowid
+            return sourceID, 0
+        sourceID, offset, head = row
+        if os.path.getsize(path) < offset or headDigest(path, offset) != head:
+            self.dropSource(sourceID)
+            return sourceID, 0
+        return sourceID, offset
+
+    def dropSource(self, sourceID):
+        self.connection.execute(
+            """
+            INSERT INTO reviewsText (reviewsText, rowid, Title, Review, MovieKey)
+            SELECT 'delete', ReviewID, Title, Review, MovieKey FROM reviews WHERE SourceID = ?
+            """,
+            (sourceID,),
+        )
+        self.connection.execute("DELETE FROM reviews WHERE SourceID = ?", (sourceID,))
+
+    def updateFile(self, csvFilePath, blockBytes=8 * 2**20):
+        """
+        Index the rows appended to the file since the last update, returns how many
+        """
+        with self.lock:
+            try:
+                return self.indexAppended(csvFilePath, blockBytes)
+            except Exception:
+                # The movies added by the rolled back transaction are gone too
+                self.loadMovieIDs()
+                raise
+
+    def indexAppended(self, csvFilePath, blockBytes):
+        """
+        Parse the new part of the file a block at a time, a row the scraper is still
+        writing is left for the next update
+        """
+        added = 0
+        with self.connection, open(csvFilePath, "rb") as file:
+            sourceID, offset = self.source(csvFilePath)
+            file.seek(offset)
+            if offset == 0:
+                header = file.readline()
+                if not header.endswith(b"\n"):
+                    return 0
+                offset = len(header)
+            pending = b""
+            while True:
+                block = file.read(blockBytes)
+                if not block:
+                    break
+                data = pending + block
+                length = completeRows(data)
+                if length:
+                    added += self.insertReviews(sourceID, data[:length])
+                    offset += length
+                pending = data[length:]
+            self.connection.execute(
+                "UPDATE sources SET offset = ?, head = ? WHERE SourceID = ?",
+                (offset, headDigest(csvFilePath, offset), sourceID),
+            )
+        return added
+
+    def insertReviews(self, sourceID, data):
+        chunk = pd.read_csv(
+            io.BytesIO(data),
+            header=None,
+            names=REVIEW_COLUMNS,
+            dtype={"Movie": str, "Title": str, "Review": str},
+        )
+        ranks = pd.to_numeric(chunk["Rank"], errors="coerce").astype("Int64")
+        rows = [
+            (
+                self.movieID(movie),
+                sourceID,
+                title,
+                review,
+                None if pd.isna(rank) else int(rank),
+            )
+            for movie, title, review, rank in zip(
+                chunk["Movie"].fillna(""),
+                chunk["Title"].fillna(""),
+                chunk["Review"].fillna(""),
+                ranks,
+            )
+        ]
+        firstID = self.connection.execute(
+            "SELECT COALESCE(MAX(ReviewID), 0) + 1 FROM reviews"
+        ).fetchone()[0]
+        self.connection.executemany(
+            "INSERT INTO reviews (MovieID, SourceID, Title, Review, Rank) VALUES (?, ?, ?, ?, ?)",
+            rows,
+        )
+        self.connection.execute(
+            """
+            INSERT INTO reviewsText (rowid, Title, Review, MovieKey)
+            SELECT ReviewID, Title, Review, MovieKey FROM reviews WHERE ReviewID >= ?
+            """,
+            (firstID,),
+        )
+        return len(rows)
+
+    def update(self, csvFilePaths):
+        """
+        Index the files, a folder stands for the CSV files in it (the per-movie review
+        partitions of ReviewWriter)
+        """
+        paths = []
+        for path in csvFilePaths:
+            if os.path.isdir(path):
+                paths += sorted(
+                    os.path.join(path, name) for name in os.listdir(path) if name.endswith(".csv")
+                )
+            elif os.path.exists(path):
+                paths.append(path)
+        return sum(self.updateFile(path) for path in paths)
+
+    def optimize(self):
+        """
+        Merge the index segments written by the incremental updates
+        """
+        with self.lock, self.connection:
+            self.connection.execute("INSERT INTO reviewsText (reviewsText) VALUES ('optimize')")
+
+    def stats(self):
+        with self.lock:
+            reviews, movies = self.connection.execute(
+                "SELECT (SELECT COUNT(*) FROM reviews), (SELECT COUNT(*) FROM movies)"
+            ).fetchone()
+            return {"reviews": reviews, "movies": movies}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Index the scraped reviews for full-text search"
+    )
+    parser.add_argument(
+        "inputs", nargs="*", default=[os.path.join("CSV Folder", "Reviews")]
+    )
+    parser.add_argument("--index", default=os.path.join("CSV Folder", "Review Index.db"))
+    parser.add_argument(
+        "--optimize", action="store_true", help="Merge the index segments after the update"
+    )
+    args = parser.parse_args()
+
+    reviewIndex = ReviewIndex(args.index)
+    added = reviewIndex.update(args.inputs)
+    if args.optimize:
+        reviewIndex.optimize()
+    print(f"Indexed {added} new reviews, {reviewIndex.stats()} in '{args.index}'")
+    reviewIndex.close()
@@ -0,0 +1,158 @@
+import json
+import time
+from urllib.parse import urljoin, urlsplit
+from lxml import html
+from RunMetrics import runMetrics
+
+
+# XPaths of the user review page, relative to a single review block
+REVIEW_BLOCK_XPATH = '//li[@class="ipl-content-list__item"]'
+REVIEW_RATING_XPATH = './/span[@class="rating-other-user-rating"]//span[1]'
+REVIEW_TITLE_XPATH = './/a[@class="title"]'
+REVIEW_CONTENT_XPATH = './/div[@class="text"]'
+PAGINATION_KEY_XPATH = '//div[@class="load-more-data"]/@data-key'
+
+# Collect [rating, title, content] of every block from the start-th on in the browser
+# with one call, a missing element is reported as null so the skip rules stay on the
+# Python side
+EXTRACT_REVIEWS_SCRIPT = """
+const [blockXPath, ratingXPath, titleXPath, contentXPath, start] = arguments;
+const first = (node, xpath) => document.evaluate(
+    xpath, node, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+).singleNodeValue;
+const read = (node) => (node === null ? null : node.innerText.trim());
+const blocks = document.evaluate(
+    blockXPath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+);
+const reviews = [];
+for (let i = start; i < blocks.snapshotLength; i++) {
+    const block = blocks.snapshotItem(i);
+    reviews.push([
+        read(first(block, ratingXPath)),
+        read(first(block, titleXPath)),
+        read(first(block, contentXPath)),
+    ]);
+}
+return JSON.stringify(reviews);
+"""
+
+
+def countReviewBlocks(driver):
+    return int(
+        driver.execute_script(
+            "return document.evaluate(arguments[0], document, null, "
+            "XPathResult.NUMBER_TYPE, null).numberValue;",
+            f"count({REVIEW_BLOCK_XPATH})",
+        )
+    )
+
+
+def extractReviewsScript(driver, start=0):
+    """
+    Read the review blocks from the start-th on with a single execute_script round-trip
+    """
+    return json.loads(
+        driver.execute_script(
+            EXTRACT_REVIEWS_SCRIPT,
+            REVIEW_BLOCK_XPATH,
+            REVIEW_RATING_XPATH,
+            REVIEW_TITLE_XPATH,
+            REVIEW_CONTENT_XPATH,
+            start,
+        )
+    )
+
+
+def firstText(block, xpath):
+    nodes = block.xpath(xpath)
+    return nodes[0].text_content().strip() if nodes else None
+
+
+def parseReviews(pageSource):
+    """
+    Read every review block from an already rendered page source
+    """
+    return readReviewBlocks(html.fromstring(pageSource))
+
+
+def reviewFeedURL(movieURL):
+    """
+    The review feed of a title page: https://host/title/tt0111161/reviews/_ajax
+    """
+    return urljoin(movieURL, urlsplit(movieURL).path.rstrip("/") + "/reviews/_ajax")
+
+
+@runMetrics.timed("parse")
+def parseReviewPage(pageSource):
+    """
+    Read the review blocks of one page of the review feed and the key of the next page
+    (None on the last page)
+    """
+    tree = html.fromstring(pageSource)
+    paginationKeys = tree.xpath(PAGINATION_KEY_XPATH)
+    return readReviewBlocks(tree), (paginationKeys[0] if paginationKeys else None)
+
+
+def readReviewBlocks(tree):
+    return [
+        [
+            firstText(block, REVIEW_RATING_XPATH),
+            firstText(block, REVIEW_TITLE_XPATH),
+            firstText(block, REVIEW_CONTENT_XPATH),
+        ]
+        for block in tree.xpath(REVIEW_BLOCK_XPATH)
+    ]
+
+
+def filterReviews(rawReviews, firstBlock=0):
+    """
+    Apply the skip rules for missing data and split into rating, title and content lists,
+    firstBlock is the position of the first block on the page
+    """
+    reviewRatings = []
+    reviewTitles = []
+    reviewContents = []
+
+    for id, (reviewRating, reviewTitle, reviewContent) in enumerate(rawReviews, firstBlock):
+        # Check if All the Data is There
+        if not reviewRating or not reviewTitle or not reviewContent:
+            print(f"Skipping review block {id + 1} due to missing data")
+            runMetrics.count("skippedReviewBlocks")
+            continue
+
+        reviewRatings.append(reviewRating)
+        reviewTitles.append(reviewTitle)
+        reviewContents.append(reviewContent)
+
+    return reviewRatings, reviewTitles, reviewContents
+
+
+def extractReviewBlocks(driver, mode="script", start=0):
+    """
+    Extract the review blocks of the loaded page from the start-th on, mode is
+    "script" or "source"
+    """
+    startTime = time.perf_counter()
+    if mode == "script":
+        rawReviews = extractReviewsScript(driver, start)
+    elif mode == "source":
+        rawReviews = parseReviews(driver.page_source)[start:]
+    else:
+        raise ValueError(f"Unknown review extraction mode: {mode}")
+    elapsed = time.perf_counter() - startTime
+    runMetrics.addSpan("extract", elapsed)
+    runMetrics.count("reviewBlocks", len(rawReviews))
+
+    rate = len(rawReviews) / elapsed if elapsed > 0 else float("inf")
+    print(
+        f"Extracted {len(rawReviews)} review blocks in {elapsed:.2f}s "
+        f"({rate:.0f} blocks/sec, mode={mode})"
+    )
+    return rawReviews
+
+
+def extractReviews(driver, mode="script"):
+    """
+    Extract the reviews of the loaded page, mode is "script" or "source"
+    """
+    return filterReviews(extractReviewBlocks(driver, mode))
@@ -1,155 +1,309 @@
 import os
-import time
-import pandas as pd
+import argparse
+from urllib.parse import urljoin
+from lxml import html
 from tqdm import tqdm
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import TimeoutException, WebDriverException
+from ChartParser import cachedChart, snapshotChart
+from DriverFactory import createDriver, pageLoadReport
+from MovieDetails import loadPage
+from PageCache import PageCache
+from RateController import RateController, TransientError
+from ReviewIndex import ReviewIndex
+from RunMetrics import runMetrics
+from ReviewParser import (
+    REVIEW_BLOCK_XPATH,
+    countReviewBlocks,
+    extractReviewBlocks,
+    filterReviews,
+    parseReviews,
+)
+from ReviewWriter import FILE_FORMATS, ReviewWriter
 
 
-def create_empty_csv_file(file_path, headers):
-    folder_path = os.path.dirname(file_path)
-    if not os.path.exists(folder_path):
-        os.makedirs(folder_path)
-    df = pd.DataFrame(columns=headers)
-    df.to_csv(file_path, index=False)
-    print(f"Empty CSV file '{file_path}' created successfully.")
+REVIEWS_LINK_XPATH = '//div[@data-testid="reviews-header"]//a[@class="ipc-title-link-wrapper"]'
+LOAD_MORE_XPATH = '//button[@class="ipl-load-more__button"]'
 
 
-def append_to_csv(csv_file_path, data):
-    df = pd.DataFrame(data)
-    df.to_csv(csv_file_path, mode="a", header=False, index=False)
+def loadMoreReviews(driver, timeout=30):
+    """
+    Click "Load More" and wait for the new review blocks to be added,
+    returns False once the button is gone
+    """
+    blockCount = countReviewBlocks(driver)
+    try:
+        loadMoreButtons = driver.find_elements(By.XPATH, LOAD_MORE_XPATH)
+        if not loadMoreButtons or not loadMoreButtons[0].is_displayed():
+            return False
+        loadMoreButton = loadMoreButtons[0]
+        driver.execute_script("arguments[0].scrollIntoView();", loadMoreButton)
+        loadMoreButton.click()
+    except WebDriverException as e:
+        # An overlay over the button or a button the page re-rendered, retried
+        raise TransientError(f"'Load More' could not be clicked: {e.msg}") from e
+    try:
+        WebDriverWait(driver, timeout).until(
+            lambda d: countReviewBlocks(d) > blockCount
+        )
+    except TimeoutException as e:
+        raise TransientError("no new reviews after clicking 'Load More'") from e
+    return True
 
 
-URL = "https://m.imdb.com"
-csvReviews = os.path.join(".", "CSV Folder", "Review.csv")
-# create_empty_csv_file(csvReviews, headers=["Movie", "Title", "Review", "Rank"])
-header = "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+def parseReviewsLink(pageSource, movieURL):
+    links = html.fromstring(pageSource).xpath(REVIEWS_LINK_XPATH)
+    if not links or not links[0].get("href"):
+        return None
+    return urljoin(movieURL, links[0].get("href"))
 
-options = webdriver.ChromeOptions()
-options.add_argument("--headless")
-options.add_argument("--no-sandbox")
-options.add_argument("--disable-dev-shm-usage")
-options.add_argument(header)
-driver = webdriver.Chrome(options=options)
 
-try:
-    driver.get(URL + "/chart/top/")
-    Blocks = driver.find_elements(
-        By.XPATH,
-        '//li[contains(@class, "ipc-metadata-list-summary-item sc-10233bc-0 iherUv cli-parent")]',
+def cachedPage(url, pageType):
+    return pageCache.get(url, pageType) if pageCache is not None else None
+
+
+def loadReviewsLink(movieURL):
+    """
+    The link of the review page, read from the cached title page when there is one
+    """
+    pageSource = cachedPage(movieURL, "title")
+    if pageSource is not None:
+        reviewLink = parseReviewsLink(pageSource, movieURL)
+        if reviewLink is not None or args.replay:
+            return reviewLink
+    if args.replay:
+        return None
+    loadPage(
+        driver,
+        movieURL,
+        controller,
+        waitFor=REVIEWS_LINK_XPATH,
+        pageType="title",
+        pageCache=pageCache,
+    )
+    with runMetrics.span("extract"):
+        return driver.find_element(By.XPATH, REVIEWS_LINK_XPATH).get_attribute("href")
+
+
+def writeReviews(entry, rawReviews, firstBlock=0):
+    reviewRatings, reviewTitles, reviewContents = filterReviews(rawReviews, firstBlock)
+    reviewWriter.add(entry.hashURL, entry.title, reviewRatings, reviewTitles, reviewContents)
+    return len(reviewTitles)
+
+
+def writeLoadedReviews(entry, firstBlock):
+    """
+    Hand the blocks loaded since firstBlock to the writer, returns the number of blocks
+    """
+    rawReviews = extractReviewBlocks(driver, mode=extractionMode, start=firstBlock)
+    writeReviews(entry, rawReviews, firstBlock)
+    return len(rawReviews)
+
+
+def loadAllReviews(entry, reviewLink):
+    """
+    Open the review page and click "Load More" until every review is on the page, the
+    reviews go to the writer a batch at a time while the page grows. Returns the
+    number of reviews, the fully expanded page is what goes to the page cache.
+    Raises TransientError when "Load More" keeps failing: the blocks loaded so far
+    are written (deduped on the next run) but the movie is not complete.
+    """
+    loadPage(
+        driver,
+        reviewLink,
+        controller,
+        waitFor=REVIEW_BLOCK_XPATH,
+        pageType="reviews",
     )
-    print(f"Total Blocks found: {len(Blocks)}")
-
-    for idx, Block in enumerate(tqdm(Blocks, desc="Processing Blocks"), start=8):
-
-        """
-        Get The Data of The Movies
-        """
-
-        movieURL = driver.find_elements(
-            By.XPATH,
-            '//a[@class="ipc-title-link-wrapper"]',
-        )[idx].get_attribute("href")
-
-        movieTitle = driver.find_elements(
-            By.XPATH,
-            '//div[@class="sc-b189961a-0 hBZnfJ cli-children"]//h3[@class="ipc-title__text"]',
-        )[idx].text
-        movieTitle = movieTitle.split(". ", 1)[1]
-        print(f"Getting the reviews for the Movie: {movieTitle}")
-
-        # Navigate the Movie Page
-        driver.get(movieURL)
-
-        reviewLink = driver.find_element(
-            By.XPATH,
-            '//div[@data-testid="reviews-header"]//a[@class="ipc-title-link-wrapper"]',
-        ).get_attribute("href")
-
-        # Navigate to The Review Page
-        driver.get(reviewLink)
-
-        """
-        Get the Reviews of the Movies
-        """
-
-        # Click "Load More" until it disappears
-        while True:
-            try:
-                loadMoreButton = WebDriverWait(driver, 60).until(
-                    EC.element_to_be_clickable(
-                        (By.XPATH, '//button[@class="ipl-load-more__button"]')
-                    )
-                )
-                driver.execute_script("arguments[0].scrollIntoView();", loadMoreButton)
-                loadMoreButton.click()
-                time.sleep(10)
-            except Exception as e:
-                print(f"No more 'Load More' button or timeout occurred. Error: {e}")
+
+    # Click "Load More" until it disappears
+    blocksWritten = 0
+    while True:
+        if countReviewBlocks(driver) - blocksWritten >= reviewWriter.batchRows:
+            blocksWritten += writeLoadedReviews(entry, blocksWritten)
+        try:
+            if not controller.call(loadMoreReviews, driver):
+                print("No more 'Load More' button")
                 break
+            runMetrics.count("loadMoreClicks")
+        except TransientError as e:
+            blocksWritten += writeLoadedReviews(entry, blocksWritten)
+            raise TransientError(
+                f"stopped loading reviews after {blocksWritten} blocks and "
+                f"{controller.maxRetries} retries: {e}"
+            ) from e
+    blocksWritten += writeLoadedReviews(entry, blocksWritten)
 
-        # Scrape All the Reviews for single Movie
-        reviewBlocks = driver.find_elements(
-            By.XPATH, '//li[@class="ipl-content-list__item"]'
-        )
-        print(f"The Movie {movieTitle} has {len(reviewBlocks)} Reviews")
-
-        # Variables for each Movie
-        reviewTitles = []
-        reviewRatings = []
-        reviewContents = []
-
-        for id, reviewBlock in enumerate(
-            tqdm(reviewBlocks, desc="Processing Review Blocks")
-        ):
-            try:
-                reviewRating = reviewBlock.find_element(
-                    By.XPATH,
-                    './/span[@class="rating-other-user-rating"]//span[1]',
-                ).text
-
-                reviewTitle = reviewBlock.find_element(
-                    By.XPATH,
-                    './/a[@class="title"]',
-                ).get_attribute("innerText")
-
-                reviewContent = reviewBlock.find_element(
-                    By.XPATH,
-                    './/div[@class="text"]',
-                ).text
-
-                # Check if All the Data is There
-                if reviewRating == "" or reviewTitle == "" or reviewContent == "":
-                    print(f"Skipping review block {id + 1} due to missing data")
-                    continue
-
-                reviewRatings.append(reviewRating)
-                reviewTitles.append(reviewTitle)
-                reviewContents.append(reviewContent)
-
-            except Exception as e:
-                print(f"Skipping review block {id + 1} due to missing data")
+    if pageCache is not None:
+        pageCache.put(reviewLink, driver.page_source, "reviews")
+    return blocksWritten
+
+
+def scrapeMovieReviews(entry):
+    """
+    Write a movie's reviews, returns the number of review blocks read or None when its
+    pages did not load (or are not cached in replay mode)
+    """
+    movieURL = entry.url
+    movieTitle = entry.title
+    print(f"Getting the reviews for the Movie: {movieTitle}")
+
+    try:
+        # Navigate the Movie Page, then the Review Page
+        reviewLink = loadReviewsLink(movieURL)
+        if reviewLink is None:
+            print(f"Skipping the Movie {movieTitle}, its title page is not cached")
+            return None
+
+        pageSource = cachedPage(reviewLink, "reviews")
+        if pageSource is None and args.replay:
+            print(f"Skipping the Movie {movieTitle}, its review page is not cached")
+            return None
+        if pageSource is None:
+            blockCount = loadAllReviews(entry, reviewLink)
+    except TransientError as e:
+        print(f"Skipping the Movie {movieTitle}, its pages did not load. Error: {e}")
+        return None
+
+    # Scrape All the Reviews for single Movie
+    if pageSource is not None:
+        with runMetrics.span("parse"):
+            rawReviews = parseReviews(pageSource)
+        blockCount = len(rawReviews)
+        writeReviews(entry, rawReviews)
+    print(f"The Movie {movieTitle} has {blockCount} Review blocks")
+    return blockCount
+
+
+parser = argparse.ArgumentParser(description="Scrape the user reviews of the IMDb Top 250")
+parser.add_argument(
+    "--cache-dir",
+    default=os.path.join("CSV Folder", "Page Cache"),
+    help="Folder of the page cache, shared with DataScraper.py",
+)
+parser.add_argument(
+    "--cache-size-mb",
+    type=int,
+    default=1024,
+    help="Least recently used pages are evicted past this size",
+)
+parser.add_argument(
+    "--no-cache", action="store_true", help="Fetch every page and cache nothing"
+)
+parser.add_argument(
+    "--replay",
+    action="store_true",
+    help="Parse the reviews again from the page cache, without starting Chrome",
+)
+parser.add_argument(
+    "--report-dir",
+    default=os.path.join("CSV Folder", "Run Reports"),
+    help="Where the JSON run report and the Prometheus metrics of the run are written",
+)
+parser.add_argument(
+    "--reviews-dir",
+    default=os.path.join("CSV Folder", "Reviews"),
+    help="One file of reviews per movie, with the dedupe and progress state of the writer",
+)
+parser.add_argument(
+    "--format",
+    choices=FILE_FORMATS,
+    default="csv",
+    help="File format of the per-movie partitions",
+)
+parser.add_argument(
+    "--batch-rows",
+    type=int,
+    default=500,
+    help="Reviews held in memory before they are written",
+)
+parser.add_argument(
+    "--index",
+    default=os.path.join("CSV Folder", "Review Index.db"),
+    help="Full-text index of the reviews, updated after every movie (CSV partitions)",
+)
+parser.add_argument(
+    "--no-index", action="store_true", help="Do not update the review index"
+)
+args = parser.parse_args()
+if args.replay and args.no_cache:
+    parser.error("--replay reads the page cache, it cannot be used with --no-cache")
+
+# The base URL can point to a local server that serves saved IMDb pages
+URL = os.environ.get("IMDB_URL", "https://m.imdb.com")
+csvReviews = os.path.join(".", "CSV Folder", "Review.csv")
+# "script" reads all review blocks with one execute_script call, "source" parses page_source
+extractionMode = "script"
+# Resources Chrome does not download, see DriverFactory.BLOCKING_PROFILES
+blockingProfile = "text"
+controller = RateController(initialInterval=10.0)
+pageCache = None
+if not args.no_cache:
+    pageCache = PageCache(
+        args.cache_dir, maxBytes=args.cache_size_mb * 2**20, replay=args.replay
+    )
+reviewWriter = ReviewWriter(args.reviews_dir, fileFormat=args.format, batchRows=args.batch_rows)
+# The index reads the CSV partitions
+reviewIndex = None if args.no_index or args.format != "csv" else ReviewIndex(args.index)
+driver = None if args.replay else createDriver(profile=blockingProfile)
+
+try:
+    chartEntries = cachedChart(pageCache, URL) if pageCache is not None else []
+    if not chartEntries:
+        if args.replay:
+            raise SystemExit(f"The chart page is not in the page cache '{args.cache_dir}'")
+        chartEntries = controller.call(snapshotChart, driver, URL, pageCache)
+    print(f"Total Blocks found: {len(chartEntries)}")
+
+    movieKeys = {entry.title: entry.hashURL for entry in chartEntries}
+    if args.replay:
+        # The reviews are rebuilt from the cached review pages of the whole chart
+        reviewWriter.reset()
+    elif reviewWriter.isEmpty() and os.path.exists(csvReviews):
+        imported = reviewWriter.importCSV(csvReviews, movieKeys)
+        print(f"Imported {imported} reviews from '{csvReviews}'")
+    else:
+        # Partitions of earlier runs were keyed by the rank-bearing chart link
+        print(f"{reviewWriter.rekey(movieKeys)} review partitions moved to their key")
+    chartKeys = [entry.hashURL for entry in chartEntries]
+    # Movies whose reviews were all written by an earlier run are skipped
+    completed = reviewWriter.completedMovies()
+    chartEntries = [entry for entry in chartEntries if entry.hashURL not in completed]
+    print(f"{len(chartKeys) - len(chartEntries)} movies already have all their reviews")
+    for entry in tqdm(chartEntries, desc="Processing Blocks"):
+        with runMetrics.movie(entry.title):
+            if scrapeMovieReviews(entry) is None:
+                # Its reviews written so far are kept, they are deduped on the next run
+                runMetrics.count("skippedMovies")
                 continue
+            reviewWriter.complete(entry.hashURL, entry.title)
 
-        print(f"The Length of the Rank is {len(reviewRatings)}")
-        print(f"The Length of the Titles is {len(reviewTitles)}")
-        print(f"The Length of the Content is {len(reviewContents)}")
-
-        append_to_csv(
-            csvReviews,
-            {
-                "Movie": [movieTitle] * len(reviewTitles),
-                "Title": reviewTitles,
-                "Review": reviewContents,
-                "Rank": reviewRatings,
-            },
-        )
+            if reviewIndex is not None:
+                with runMetrics.span("indexUpdate"):
+                    reviewIndex.update([reviewWriter.partitionPath(entry.hashURL)])
 
-        # Return to the Main Page
-        driver.get(URL + "/chart/top/")
-        time.sleep(10)
+    with runMetrics.span("export"):
+        reviewWriter.export(csvReviews, chartKeys)
+    print(f"Reviews of the chart exported to '{csvReviews}'")
 
 finally:
-    driver.quit()
+    if driver is not None:
+        driver.quit()
+    sections = {"rateController": controller.stats(), "pageLoads": pageLoadReport.summary()}
+    if pageCache is not None:
+        sections["pageCache"] = pageCache.stats()
+        print(f"Page cache: {sections['pageCache']}")
+        pageCache.close()
+    reviewWriter.flush()
+    sections["reviewWriter"] = reviewWriter.stats()
+    reviewWriter.close()
+    print(f"Review writer: {sections['reviewWriter']}")
+    if reviewIndex is not None:
+        sections["reviewIndex"] = reviewIndex.stats()
+        reviewIndex.close()
+    print(f"Rate controller: {sections['rateController']}")
+    pageLoadReport.print()
+    runMetrics.printSummary()
+    reportPath = runMetrics.write(args.report_dir, "ReviewScraper", sections)
+    print(f"Run report written to '{reportPath}'")
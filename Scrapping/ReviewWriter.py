@@ -0,0 +1,385 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import sqlite3
+import argparse
+import threading
+import pandas as pd
+from RunMetrics import runMetrics
+
+
+REVIEW_COLUMNS = ["Movie", "Title", "Review", "Rank"]
+FILE_FORMATS = ("csv", "parquet")
+
+# seen is the set of the content hashes of every review written. size is the part of a
+# partition the state agrees with: bytes of the CSV file, or number of Parquet parts.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    digest TEXT PRIMARY KEY
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS partitions (
+    movieKey TEXT PRIMARY KEY,
+    movie TEXT,
+    reviews INTEGER NOT NULL DEFAULT 0,
+    size INTEGER NOT NULL DEFAULT 0,
+    complete INTEGER NOT NULL DEFAULT 0,
+    completedAt REAL
+);
+"""
+
+
+def reviewDigest(movieKey, title, review, rank):
+    content = json.dumps([movieKey, title, review, rank], ensure_ascii=False)
+    return hashlib.sha256(content.encode()).hexdigest()[:32]
+
+
+class ReviewWriter:
+    """
+    Write the reviews of every movie to its own file (CSV Folder/Reviews/<hashURL>.csv,
+    or a folder of Parquet parts), a bounded batch at a time. A review already written
+    (same movie, title, text and rank) is dropped, the hashes are kept in SQLite next
+    to the files. A batch is written to the files first and recorded in the state
+    after, so on start the files are cut back to what the state recorded. A movie is
+    marked complete once all its reviews are written and is skipped by the next run.
+    """
+
+    def __init__(self, outputDir, fileFormat="csv", batchRows=500):
+        if fileFormat not in FILE_FORMATS:
+            raise ValueError(f"Unknown review file format: {fileFormat}")
+        if not os.path.exists(outputDir):
+            os.makedirs(outputDir)
+        self.outputDir = outputDir
+        self.fileFormat = fileFormat
+        self.batchRows = batchRows
+        self.pending = []
+        self.counts = {"written": 0, "duplicates": 0, "flushes": 0}
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            os.path.join(outputDir, "index.db"), check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+        self.recover()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def partitionPath(self, movieKey):
+        if self.fileFormat == "csv":
+            return os.path.join(self.outputDir, f"{movieKey}.csv")
+        return os.path.join(self.outputDir, movieKey)
+
+    def partPath(self, movieKey, part):
+        return os.path.join(self.partitionPath(movieKey), f"part-{part:05d}.parquet")
+
+    def recover(self):
+        """
+        Drop what a crash left in the files after the last batch the state recorded
+        """
+        for movieKey, size in self.connection.execute(
+            "SELECT movieKey, size FROM partitions WHERE complete = 0"
+        ).fetchall():
+            self.truncate(movieKey, size)
+        # Partitions of movies whose first batch was never recorded
+        known = {row[0] for row in self.connection.execute("SELECT movieKey FROM partitions")}
+        for name in os.listdir(self.outputDir):
+            if self.fileFormat == "csv":
+                movieKey = name[: -len(".csv")] if name.endswith(".csv") else None
+            else:
+                movieKey = name if os.path.isdir(os.path.join(self.outputDir, name)) else None
+            if movieKey is not None and movieKey not in known:
+                self.truncate(movieKey, 0)
+
+    def truncate(self, movieKey, size):
+        path = self.partitionPath(movieKey)
+        if not os.path.exists(path):
+            return
+        if self.fileFormat == "csv":
+            if os.path.getsize(path) > size:
+                with open(path, "r+b") as file:
+                    file.truncate(size)
+            return
+        for name in os.listdir(path):
+            if name.startswith("part-") and int(name[5:10]) >= size:
+                os.remove(os.path.join(path, name))
+
+    def completedMovies(self):
+        with self.lock:
+            return {
+                row[0]
+                for row in self.connection.execute(
+                    "SELECT movieKey FROM partitions WHERE complete = 1"
+                )
+            }
+
+    def add(self, movieKey, movie, reviewRatings, reviewTitles, reviewContents):
+        """
+        Queue the reviews of a movie, a batch is written every batchRows reviews
+        """
+        for rank, title, review in zip(reviewRatings, reviewTitles, reviewContents):
+            self.pending.append((movieKey, movie, title, review, rank))
+            if len(self.pending) >= self.batchRows:
+                self.flush()
+
+    def flush(self):
+        """
+        Write the queued reviews that were not written before, returns how many
+        """
+        if not self.pending:
+            return 0
+        rows, self.pending = self.pending, []
+        with self.lock, runMetrics.span("reviewWrite"):
+            digests = [
+                reviewDigest(movieKey, title, review, rank)
+                for movieKey, _, title, review, rank in rows
+            ]
+            seen = {
+                row[0]
+                for row in self.connection.execute(
+                    "SELECT digest FROM seen WHERE digest IN (SELECT value FROM json_each(?))",
+                    (json.dumps(digests),),
+                )
+            }
+            # New rows and their digests per movie, a review repeated in the batch
+            # is kept once
+            batches = {}
+            for digest, row in zip(digests, rows):
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                newRows, newDigests = batches.setdefault(row[0], ([], []))
+                newRows.append(row[1:])
+                newDigests.append(digest)
+            written = sum(len(newRows) for newRows, _ in batches.values())
+
+            sizes = {
+                movieKey: self.writePartition(movieKey, newRows)
+                for movieKey, (newRows, _) in batches.items()
+            }
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT INTO seen (digest) VALUES (?)",
+                    ((digest,) for _, newDigests in batches.values() for digest in newDigests),
+                )
+                self.connection.executemany(
+                    """
+                    INSERT INTO partitions (movieKey, movie, reviews, size) VALUES (?, ?, ?, ?)
+                    ON CONFLICT (movieKey) DO UPDATE
+                    SET reviews = reviews + excluded.reviews, size = excluded.size
+                    """,
+                    (
+                        (movieKey, newRows[0][0], len(newRows), sizes[movieKey])
+                        for movieKey, (newRows, _) in batches.items()
+                    ),
+                )
+        duplicates = len(rows) - written
+        self.counts["written"] += written
+        self.counts["duplicates"] += duplicates
+        self.counts["flushes"] += 1
+        runMetrics.count("reviewsWritten", written)
+        runMetrics.count("duplicateReviews", duplicates)
+        return written
+
+    def committedSize(self, movieKey):
+        row = self.connection.execute(
+            "SELECT size FROM partitions WHERE movieKey = ?", (movieKey,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def writePartition(self, movieKey, rows):
+        """
+        Append the rows to the movie's file and sync it, returns the new size
+        """
+        df = pd.DataFrame(rows, columns=REVIEW_COLUMNS)
+        size = self.committedSize(movieKey)
+        if self.fileFormat == "parquet":
+            os.makedirs(self.partitionPath(movieKey), exist_ok=True)
+            df.to_parquet(self.partPath(movieKey, size), index=False)
+            return size + 1
+        with open(self.partitionPath(movieKey), "ab") as file:
+            file.truncate(size)
+            df.to_csv(file, header=size == 0, index=False)
+            file.flush()
+            os.fsync(file.fileno())
+            return file.tell()
+
+    def complete(self, movieKey, movie):
+        """
+        Write what is queued and mark the movie as done
+        """
+        self.flush()
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                INSERT INTO partitions (movieKey, movie, complete, completedAt)
+                VALUES (?, ?, 1, ?)
+                ON CONFLICT (movieKey) DO UPDATE
+                SET complete = 1, completedAt = excluded.completedAt
+                """,
+                (movieKey, movie, time.time()),
+            )
+
+    def isEmpty(self):
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM partitions LIMIT 1").fetchone() is None
+
+    def importCSV(self, csvFilePath, movieKeys, chunkRows=10000):
+        """
+        Seed the partitions from a Review.csv written before the writer existed.
+        movieKeys maps the movie titles to their key, a title missing from it is keyed
+        by its own hash. The movies are not marked complete, a re-scrape only adds the
+        reviews that are missing.
+        """
+        rows = 0
+        for chunk in pd.read_csv(csvFilePath, chunksize=chunkRows, dtype=str):
+            chunk = chunk.fillna("")
+            for movie, reviews in chunk.groupby("Movie", sort=False):
+                movieKey = movieKeys.get(movie) or hashlib.sha256(movie.encode()).hexdigest()
+                self.add(movieKey, movie, reviews["Rank"], reviews["Title"], reviews["Review"])
+            rows += len(chunk)
+        self.flush()
+        return rows
+
+    def readPartition(self, movieKey):
+        """
+        The (title, review, rank) rows written to a movie's partition
+        """
+        path = self.partitionPath(movieKey)
+        if self.fileFormat == "csv":
+            df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        else:
+            df = pd.concat(
+                [pd.read_parquet(os.path.join(path, name)) for name in sorted(os.listdir(path))]
+            )
+        return df[["Title", "Review", "Rank"]].itertuples(index=False, name=None)
+
+    def rekey(self, movieKeys):
+        """
+        Move the partitions written under an earlier key of a movie (the hash of its
+        rank-bearing chart link) to its key in movieKeys, which maps the movie titles
+        to their key. The partition is copied and the state updated before the old
+        files are removed, so recover() only ever drops a leftover copy. The review
+        hashes include the key, the ones of a moved partition are added under its new
+        key. Returns the number of partitions moved.
+        """
+        moved = 0
+        with self.lock:
+            partitions = self.connection.execute(
+                "SELECT movieKey, movie, size FROM partitions"
+            ).fetchall()
+            known = {movieKey for movieKey, _, _ in partitions}
+            for oldKey, movie, size in partitions:
+                newKey = movieKeys.get(movie)
+                if newKey is None or newKey == oldKey or newKey in known:
+                    continue
+                oldPath, newPath = self.partitionPath(oldKey), self.partitionPath(newKey)
+                if size and os.path.isdir(oldPath):
+                    shutil.copytree(oldPath, newPath, dirs_exist_ok=True)
+                elif size:
+                    shutil.copyfile(oldPath, newPath)
+                with self.connection:
+                    self.connection.execute(
+                        "UPDATE partitions SET movieKey = ? WHERE movieKey = ?",
+                        (newKey, oldKey),
+                    )
+                    if size:
+                        self.connection.executemany(
+                            "INSERT OR IGNORE INTO seen (digest) VALUES (?)",
+                            (
+                                (reviewDigest(newKey, title, review, rank),)
+                                for title, review, rank in self.readPartition(newKey)
+                            ),
+                        )
+                if os.path.isdir(oldPath):
+                    shutil.rmtree(oldPath)
+                elif os.path.exists(oldPath):
+                    os.remove(oldPath)
+                known.add(newKey)
+                moved += 1
+        return moved
+
+    def reset(self):
+        """
+        Forget every review and delete the partitions
+        """
+        self.pending = []
+        with self.lock, self.connection:
+            for (movieKey,) in self.connection.execute(
+                "SELECT movieKey FROM partitions"
+            ).fetchall():
+                path = self.partitionPath(movieKey)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+            self.connection.execute("DELETE FROM seen")
+            self.connection.execute("DELETE FROM partitions")
+
+    def partitions(self, movieKeys=()):
+        """
+        (movieKey, path) of the written partitions, the ones in movieKeys first and in
+        that order, then the others in the order they were first written
+        """
+        with self.lock:
+            written = {
+                row[0]: None
+                for row in self.connection.execute(
+                    "SELECT movieKey FROM partitions WHERE size > 0 ORDER BY rowid"
+                )
+            }
+        first = [movieKey for movieKey in dict.fromkeys(movieKeys) if movieKey in written]
+        firstKeys = set(first)
+        rest = [movieKey for movieKey in written if movieKey not in firstKeys]
+        return [(movieKey, self.partitionPath(movieKey)) for movieKey in first + rest]
+
+    def export(self, csvFilePath, movieKeys=()):
+        """
+        One CSV of every partition (e.g. Review.csv for the scripts that read it), the
+        partitions are copied one at a time and the file is replaced at the end
+        """
+        folderPath = os.path.dirname(csvFilePath)
+        if folderPath and not os.path.exists(folderPath):
+            os.makedirs(folderPath)
+        temporaryPath = csvFilePath + ".tmp"
+        with open(temporaryPath, "wb") as output:
+            output.write((",".join(REVIEW_COLUMNS) + "\n").encode())
+            for movieKey, path in self.partitions(movieKeys):
+                if self.fileFormat == "csv":
+                    with open(path, "rb") as partition:
+                        partition.readline()
+                        shutil.copyfileobj(partition, output)
+                    continue
+                for name in sorted(os.listdir(path)):
+                    df = pd.read_parquet(os.path.join(path, name))
+                    df.to_csv(output, header=False, index=False)
+        os.replace(temporaryPath, csvFilePath)
+        return csvFilePath
+
+    def stats(self):
+        with self.lock:
+            movies, complete, reviews = self.connection.execute(
+                """
+                SELECT COUNT(*), COALESCE(SUM(complete), 0), COALESCE(SUM(reviews), 0)
+                FROM partitions
+                """
+            ).fetchone()
+        return {**self.counts, "movies": movies, "completeMovies": complete, "reviews": reviews}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export the per-movie review partitions to one CSV"
+    )
+    parser.add_argument("--reviews-dir", default=os.path.join("CSV Folder", "Reviews"))
+    parser.add_argument("--format", choices=FILE_FORMATS, default="csv")
+    parser.add_argument("--output", default=os.path.join("CSV Folder", "Review.csv"))
+    args = parser.parse_args()
+
+    writer = ReviewWriter(args.reviews_dir, fileFormat=args.format)
+    print(f"Exported {writer.stats()['reviews']} reviews to '{writer.export(args.output)}'")
+    writer.close()
@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import functools
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+
+def emptySpan():
+    return {"count": 0, "seconds": 0.0, "max": 0.0}
+
+
+def addTo(span, seconds):
+    span["count"] += 1
+    span["seconds"] += seconds
+    span["max"] = max(span["max"], seconds)
+
+
+def roundSpans(spans):
+    return {
+        phase: {
+            "count": span["count"],
+            "seconds": round(span["seconds"], 4),
+            "max": round(span["max"], 4),
+        }
+        for phase, span in sorted(spans.items())
+    }
+
+
+def labelText(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels)
+    return "{" + pairs + "}"
+
+
+class RunMetrics:
+    """
+    Timing spans per phase (page load, wait, extraction, sleep, write, ...) and
+    counters for a scraper run. Spans opened while a movie is being processed are
+    also added to that movie. Recording is a perf_counter call and a short lock, so
+    it stays on in every run.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.startedAt = datetime.now(timezone.utc)
+        self.startTime = time.perf_counter()
+        self.spans = defaultdict(emptySpan)
+        self.movies = defaultdict(lambda: {"seconds": 0.0, "phases": defaultdict(emptySpan)})
+        self.counters = defaultdict(int)
+
+    def currentMovie(self):
+        return getattr(self.local, "movie", None)
+
+    def addSpan(self, phase, seconds):
+        movie = self.currentMovie()
+        with self.lock:
+            addTo(self.spans[phase], seconds)
+            if movie is not None:
+                addTo(self.movies[movie]["phases"][phase], seconds)
+
+    @contextmanager
+    def span(self, phase):
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addSpan(phase, time.perf_counter() - startTime)
+
+    def timed(self, phase):
+        """
+        Decorator recording every call of the function as a span
+        """
+
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(phase):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    @contextmanager
+    def movie(self, title):
+        """
+        Attribute the spans of this thread to the movie until the block exits
+        """
+        previous = self.currentMovie()
+        self.local.movie = title
+        startTime = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - startTime
+            self.local.movie = previous
+            with self.lock:
+                self.movies[title]["seconds"] += elapsed
+
+    def count(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] += amount
+
+    def report(self, sections=None):
+        """
+        The run as a JSON-able dict, sections are extra stats to include as they are
+        (rate controller, page cache, ...)
+        """
+        with self.lock:
+            counters = defaultdict(dict)
+            for (name, labels), value in sorted(self.counters.items()):
+                key = ",".join(f"{label}={text}" for label, text in labels)
+                counters[name][key or "total"] = value
+            return {
+                "startedAt": self.startedAt.isoformat(timespec="seconds"),
+                "seconds": round(time.perf_counter() - self.startTime, 3),
+                "phases": roundSpans(self.spans),
+                "counters": dict(counters),
+                "movies": {
+                    title: {
+                        "seconds": round(movie["seconds"], 3),
+                        "phases": roundSpans(movie["phases"]),
+                    }
+                    for title, movie in self.movies.items()
+                },
+                **(sections or {}),
+            }
+
+    def prometheusText(self, job, sections=None):
+        """
+        The run in the Prometheus text exposition format, per-movie spans are left to
+        the JSON report to keep the label cardinality low
+        """
+        lines = [
+            "# HELP scraper_run_seconds Wall time of the run",
+            "# TYPE scraper_run_seconds gauge",
+            f'scraper_run_seconds{{job="{job}"}} {time.perf_counter() - self.startTime:.3f}',
+            "# HELP scraper_phase_seconds Time spent per phase of the run",
+            "# TYPE scraper_phase_seconds summary",
+        ]
+        with self.lock:
+            for phase, span in sorted(self.spans.items()):
+                labels = f'{{job="{job}",phase="{phase}"}}'
+                lines.append(f"scraper_phase_seconds_sum{labels} {span['seconds']:.4f}")
+                lines.append(f"scraper_phase_seconds_count{labels} {span['count']}")
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                lines.append(f"# TYPE scraper_{name}_total counter")
+                for (counterName, labels), value in sorted(self.counters.items()):
+                    if counterName == name:
+                        text = labelText((("job", job),) + labels)
+                        lines.append(f"scraper_{name}_total{text} {value}")
+        for section, stats in (sections or {}).items():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'scraper_{section}_{key}{{job="{job}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, reportDir, job, sections=None):
+        """
+        Write <job>-<start time>.json and <job>.prom (the latest run, e.g. for the
+        node_exporter textfile collector), returns the JSON path
+        """
+        os.makedirs(reportDir, exist_ok=True)
+        stamp = self.startedAt.strftime("%Y%m%dT%H%M%SZ")
+        jsonPath = os.path.join(reportDir, f"{job}-{stamp}.json")
+        with open(jsonPath, "w") as file:
+            json.dump(self.report(sections), file, indent=2)
+        promPath = os.path.join(reportDir, f"{job}.prom")
+        with open(f"{promPath}.tmp", "w") as file:
+            file.write(self.prometheusText(job, sections))
+        os.replace(f"{promPath}.tmp", promPath)
+        return jsonPath
+
+    def printSummary(self):
+        report = self.report()
+        print(f"Run took {report['seconds']}s")
+        for phase, span in sorted(
+            report["phases"].items(), key=lambda item: -item[1]["seconds"]
+        ):
+            print(f"  {phase}: {span['seconds']}s over {span['count']} spans")
+        for name, values in report["counters"].items():
+            print(f"  {name}: {values}")
+
+
+runMetrics = RunMetrics()
@@ -0,0 +1,885 @@
+import os
+import copy
+import json
+import time
+import sqlite3
+import threading
+import functools
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+TASK_KINDS = ("movie", "reviews")
+TASK_STATES = ("pending", "leased", "done", "committed", "failed")
+
+
+@dataclass
+class Task:
+    taskID: str
+    kind: str
+    payload: dict
+    attempts: int = 0
+
+
+def movieTask(entry):
+    """
+    Scrape the title and credits pages of a chart entry
+    """
+    return Task(f"movie:{entry.hashURL}", "movie", asdict(entry))
+
+
+def reviewPageTask(hashURL, url, title, page=0, paginationKey=None):
+    """
+    Read one page of a movie's review feed, the task of the next page is queued when
+    this one is done
+    """
+    return Task(
+        f"reviews:{hashURL}:{page}",
+        "reviews",
+        {
+            "hashURL": hashURL,
+            "url": url,
+            "title": title,
+            "page": page,
+            "paginationKey": paginationKey,
+        },
+    )
+
+
+# Every task is a row, a lease is an owner and an expiry time. completions keeps one
+# row per finished attempt for the throughput of every worker.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    taskID TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    owner TEXT,
+    leaseExpires REAL,
+    result TEXT,
+    error TEXT,
+    finishedAt REAL
+);
+CREATE INDEX IF NOT EXISTS tasksByState ON tasks (state, kind);
+CREATE TABLE IF NOT EXISTS completions (
+    workerID TEXT NOT NULL,
+    taskID TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    startedAt REAL,
+    finishedAt REAL,
+    ok INTEGER
+);
+CREATE INDEX IF NOT EXISTS completionsByWorker ON completions (workerID, finishedAt);
+CREATE TABLE IF NOT EXISTS workers (
+    workerID TEXT PRIMARY KEY,
+    lastSeen REAL
+);
+"""
+
+
+class SQLiteQueue:
+    """
+    Scrape tasks in SQLite, for workers on one host (processes or threads). A worker
+    leases a task for a number of seconds and renews the lease while it works, a task
+    whose lease ran out goes to the next worker that asks. A task is done only when
+    its owner reports it while still holding the lease, and is given up after
+    maxAttempts leases. The results wait in the queue until they are committed.
+    """
+
+    def __init__(self, dbPath, maxAttempts=3):
+        folderPath = os.path.dirname(dbPath)
+        if folderPath and not os.path.exists(folderPath):
+            os.makedirs(folderPath)
+        self.maxAttempts = maxAttempts
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            dbPath, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    @contextmanager
+    def transaction(self):
+        """
+        BEGIN IMMEDIATE takes the write lock up front, so two processes cannot lease
+        the same task
+        """
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.connection
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def enqueue(self, tasks):
+        """
+        Add the tasks that are not in the queue yet, returns how many were added
+        """
+        with self.transaction() as connection:
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO tasks (taskID, kind, payload) VALUES (?, ?, ?)",
+                [(task.taskID, task.kind, json.dumps(task.payload)) for task in tasks],
+            )
+            return connection.total_changes - before
+
+    def seen(self, connection, workerID, now):
+        connection.execute(
+            """
+            INSERT INTO workers (workerID, lastSeen) VALUES (?, ?)
+            ON CONFLICT (workerID) DO UPDATE SET lastSeen = excluded.lastSeen
+            """,
+            (workerID, now),
+        )
+
+    def lease(self, workerID, leaseSeconds, kinds=TASK_KINDS):
+        """
+        The oldest pending task (or one whose lease expired) of the kinds, None when
+        there is none
+        """
+        now = time.time()
+        placeholders = ", ".join("?" * len(kinds))
+        with self.transaction() as connection:
+            self.seen(connection, workerID, now)
+            connection.execute(
+                """
+                UPDATE tasks SET state = 'failed', owner = NULL, error = 'lease expired'
+                WHERE state = 'leased' AND leaseExpires < ? AND attempts >= ?
+                """,
+                (now, self.maxAttempts),
+            )
+            row = connection.execute(
+                f"""
+                SELECT taskID, kind, payload, attempts FROM tasks
+                WHERE kind IN ({placeholders})
+                    AND (state = 'pending' OR (state = 'leased' AND leaseExpires < ?))
+                ORDER BY rowid LIMIT 1
+                """,
+                (*kinds, now),
+            ).fetchone()
+            if row is None:
+                return None
+            taskID, kind, payload, attempts = row
+            connection.execute(
+                """
+                UPDATE tasks SET state = 'leased', owner = ?, leaseExpires = ?,
+                    attempts = attempts + 1
+                WHERE taskID = ?
+                """,
+                (workerID, now + leaseSeconds, taskID),
+            )
+        return Task(taskID, kind, json.loads(payload), attempts + 1)
+
+    def heartbeat(self, task, workerID, leaseSeconds):
+        """
+        Extend the lease, False when the worker does not hold it anymore
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            self.seen(connection, workerID, now)
+            return connection.execute(
+                """
+                UPDATE tasks SET leaseExpires = ?
+                WHERE taskID = ? AND owner = ? AND state = 'leased'
+                """,
+                (now + leaseSeconds, task.taskID, workerID),
+            ).rowcount == 1
+
+    def complete(self, task, workerID, result, startedAt, followUps=()):
+        """
+        Store the result and queue the follow-up tasks, False (and nothing stored) when
+        the lease was lost to another worker
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            self.seen(connection, workerID, now)
+            owned = connection.execute(
+                """
+                UPDATE tasks SET state = 'done', owner = NULL, result = ?, error = NULL,
+                    finishedAt = ?
+                WHERE taskID = ? AND owner = ? AND state = 'leased'
+                """,
+                (json.dumps(result), now, task.taskID, workerID),
+            ).rowcount == 1
+            if owned:
+                connection.executemany(
+                    "INSERT OR IGNORE INTO tasks (taskID, kind, payload) VALUES (?, ?, ?)",
+                    [(t.taskID, t.kind, json.dumps(t.payload)) for t in followUps],
+                )
+                connection.execute(
+                    "INSERT INTO completions VALUES (?, ?, ?, ?, ?, 1)",
+                    (workerID, task.taskID, task.kind, startedAt, now),
+                )
+        return owned
+
+    def fail(self, task, workerID, error, startedAt):
+        """
+        Give the task back to the queue, or give it up after maxAttempts
+        """
+        now = time.time()
+        state = "failed" if task.attempts >= self.maxAttempts else "pending"
+        with self.transaction() as connection:
+            self.seen(connection, workerID, now)
+            owned = connection.execute(
+                """
+                UPDATE tasks SET state = ?, owner = NULL, error = ?
+                WHERE taskID = ? AND owner = ? AND state = 'leased'
+                """,
+                (state, error, task.taskID, workerID),
+            ).rowcount == 1
+            connection.execute(
+                "INSERT INTO completions VALUES (?, ?, ?, ?, ?, 0)",
+                (workerID, task.taskID, task.kind, startedAt, now),
+            )
+        return state if owned else None
+
+    def release(self, task, workerID):
+        """
+        Hand a task back without counting the attempt, e.g. when a worker is stopped
+        """
+        with self.transaction() as connection:
+            connection.execute(
+                """
+                UPDATE tasks SET state = 'pending', owner = NULL, attempts = attempts - 1
+                WHERE taskID = ? AND owner = ? AND state = 'leased'
+                """,
+                (task.taskID, workerID),
+            )
+
+    def retryFailed(self):
+        with self.transaction() as connection:
+            return connection.execute(
+                "UPDATE tasks SET state = 'pending', attempts = 0 WHERE state = 'failed'"
+            ).rowcount
+
+    def uncommitted(self, limit=100):
+        """
+        Done tasks with their result, in the order they finished
+        """
+        with self.lock:
+            rows = self.connection.execute(
+                """
+                SELECT taskID, kind, payload, attempts, result FROM tasks
+                WHERE state = 'done' ORDER BY finishedAt LIMIT ?
+                """,
+                (limit,),
+            ).fetchall()
+        return [
+            (Task(taskID, kind, json.loads(payload), attempts), json.loads(result))
+            for taskID, kind, payload, attempts, result in rows
+        ]
+
+    def markCommitted(self, taskIDs):
+        with self.transaction() as connection:
+            connection.executemany(
+                """
+                UPDATE tasks SET state = 'committed', result = NULL
+                WHERE taskID = ? AND state = 'done'
+                """,
+                [(taskID,) for taskID in taskIDs],
+            )
+
+    def counts(self):
+        """
+        Number of tasks per kind and state
+        """
+        counts = {kind: dict.fromkeys(TASK_STATES, 0) for kind in TASK_KINDS}
+        with self.lock:
+            for kind, state, count in self.connection.execute(
+                "SELECT kind, state, COUNT(*) FROM tasks GROUP BY kind, state"
+            ):
+                counts.setdefault(kind, dict.fromkeys(TASK_STATES, 0))[state] = count
+        return counts
+
+    def workerStats(self, windowSeconds=600):
+        """
+        Tasks done and failed, busy time and the throughput over the last
+        windowSeconds of every worker, with the task it holds
+        """
+        now = time.time()
+        with self.lock:
+            rows = self.connection.execute(
+                """
+                SELECT workers.workerID, workers.lastSeen,
+                    COALESCE(SUM(completions.ok), 0),
+                    COALESCE(SUM(1 - completions.ok), 0),
+                    COALESCE(SUM(completions.finishedAt - completions.startedAt), 0),
+                    COALESCE(SUM(completions.ok AND completions.finishedAt >= ?), 0)
+                FROM workers LEFT JOIN completions ON completions.workerID = workers.workerID
+                GROUP BY workers.workerID ORDER BY workers.workerID
+                """,
+                (now - windowSeconds,),
+            ).fetchall()
+            leases = dict(
+                self.connection.execute(
+                    """
+                    SELECT owner, taskID FROM tasks
+                    WHERE state = 'leased' AND leaseExpires >= ?
+                    """,
+                    (now,),
+                ).fetchall()
+            )
+        return [
+            {
+                "worker": workerID,
+                "done": done,
+                "failed": failed,
+                "busySeconds": round(busy, 1),
+                "tasksPerMinute": round(recent * 60 / windowSeconds, 2),
+                "lastSeenSeconds": round(now - lastSeen, 1),
+                "leased": leases.get(workerID),
+            }
+            for workerID, lastSeen, done, failed, busy, recent in rows
+        ]
+
+
+class WatchError(Exception):
+    """
+    A key watched by a LocalPipeline changed before its EXEC
+    """
+
+
+class LocalPipeline:
+    """
+    The transactions of a redis-py pipeline: after watch() the commands run at once,
+    after multi() they are queued, and execute() runs them all under the client's lock
+    or raises WatchError when a watched key changed since it was watched
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+    def reset(self):
+        self.watched = {}
+        self.commands = None
+
+    def watch(self, *names):
+        with self.client.lock:
+            for name in names:
+                self.watched.setdefault(name, copy.deepcopy(self.client.data.get(name)))
+
+    def multi(self):
+        self.commands = []
+
+    def execute(self):
+        with self.client.lock:
+            watched, commands = self.watched, self.commands or []
+            self.reset()
+            if any(self.client.data.get(name) != value for name, value in watched.items()):
+                raise WatchError(f"watched keys changed: {sorted(watched)}")
+            return [
+                getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in commands
+            ]
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        if self.commands is None:
+            return command
+
+        def queue(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+
+        return queue
+
+
+class LocalRedis:
+    """
+    In-process stand-in for the part of the redis-py client (decode_responses=True)
+    RedisQueue uses, every command is atomic like on a Redis server and so is the
+    EXEC of a pipeline. For tests and single-process runs of the Redis backend.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data = {}
+
+    def table(self, name, factory):
+        return self.data.setdefault(name, factory())
+
+    def pipeline(self):
+        return LocalPipeline(self)
+
+    def transaction(self, func, *watches, value_from_callable=False):
+        while True:
+            with self.pipeline() as pipe:
+                try:
+                    if watches:
+                        pipe.watch(*watches)
+                    value = func(pipe)
+                    results = pipe.execute()
+                    return value if value_from_callable else results
+                except WatchError:
+                    continue
+
+    def exists(self, *names):
+        with self.lock:
+            return sum(bool(self.data.get(name)) for name in names)
+
+    def incr(self, name):
+        with self.lock:
+            self.data[name] = int(self.data.get(name, 0)) + 1
+            return self.data[name]
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        with self.lock:
+            fields = self.table(name, dict)
+            updates = dict(mapping or {})
+            if key is not None:
+                updates[key] = value
+            added = len(set(updates) - set(fields))
+            fields.update({k: str(v) for k, v in updates.items()})
+            return added
+
+    def hget(self, name, key):
+        with self.lock:
+            return self.data.get(name, {}).get(key)
+
+    def hgetall(self, name):
+        with self.lock:
+            return dict(self.data.get(name, {}))
+
+    def hdel(self, name, *keys):
+        with self.lock:
+            fields = self.data.get(name, {})
+            return sum(fields.pop(key, None) is not None for key in keys)
+
+    def hincrby(self, name, key, amount=1):
+        with self.lock:
+            fields = self.table(name, dict)
+            fields[key] = str(int(fields.get(key, 0)) + amount)
+            return int(fields[key])
+
+    def hincrbyfloat(self, name, key, amount=1.0):
+        with self.lock:
+            fields = self.table(name, dict)
+            fields[key] = str(float(fields.get(key, 0)) + amount)
+            return float(fields[key])
+
+    def sadd(self, name, *values):
+        with self.lock:
+            members = self.table(name, set)
+            added = len(set(values) - members)
+            members.update(values)
+            return added
+
+    def srem(self, name, *values):
+        with self.lock:
+            members = self.data.get(name, set())
+            removed = len(set(values) & members)
+            members.difference_update(values)
+            return removed
+
+    def sismember(self, name, value):
+        with self.lock:
+            return int(value in self.data.get(name, set()))
+
+    def smembers(self, name):
+        with self.lock:
+            return set(self.data.get(name, set()))
+
+    def zadd(self, name, mapping, xx=False, ch=False):
+        with self.lock:
+            scores = self.table(name, dict)
+            changed = 0
+            for member, score in mapping.items():
+                if xx and member not in scores:
+                    continue
+                if scores.get(member) != score:
+                    changed += 1
+                scores[member] = float(score)
+            return changed
+
+    def zrem(self, name, *members):
+        with self.lock:
+            scores = self.data.get(name, {})
+            return sum(scores.pop(member, None) is not None for member in members)
+
+    def zscore(self, name, member):
+        with self.lock:
+            return self.data.get(name, {}).get(member)
+
+    def zrange(self, name, start, end, withscores=False):
+        with self.lock:
+            items = sorted(
+                self.data.get(name, {}).items(), key=lambda item: (item[1], item[0])
+            )
+            items = items[start : None if end == -1 else end + 1]
+            return items if withscores else [member for member, _ in items]
+
+    def zrangebyscore(self, name, low, high):
+        with self.lock:
+            return [
+                member
+                for member, score in sorted(
+                    self.data.get(name, {}).items(), key=lambda item: item[1]
+                )
+                if float(low) <= score <= float(high)
+            ]
+
+    def zcount(self, name, low, high):
+        return len(self.zrangebyscore(name, low, high))
+
+    def zremrangebyscore(self, name, low, high):
+        with self.lock:
+            return self.zrem(name, *self.zrangebyscore(name, low, high))
+
+
+class RedisQueue:
+    """
+    The same queue on a Redis server, for workers on several machines. Every state
+    change of a task is one MULTI/EXEC transaction under WATCH of the task's hash: the
+    change is decided on what the worker read (is the task still pending, does the
+    worker still hold its lease), and all its writes apply together, or none of them
+    when another change of the task came first and the change is decided again. A
+    worker that dies between two commands cannot leave a task out of both the pending
+    and the lease sets. Every transition writes the task's hash, so watching it is
+    enough. A worker whose lease expires at the exact moment it finishes can still
+    win, so a task can run twice: the results are committed idempotently. client is a
+    redis-py client with decode_responses=True, or a LocalRedis.
+    """
+
+    def __init__(self, client, prefix="scrape:", maxAttempts=3):
+        self.client = client
+        self.prefix = prefix
+        self.maxAttempts = maxAttempts
+
+    def close(self):
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+    def key(self, *parts):
+        return self.prefix + ":".join(parts)
+
+    def transaction(self, change, *keys):
+        """
+        Run change(pipe) under WATCH of keys until none of them changed before its
+        EXEC: change reads, calls pipe.multi() and queues the writes. Returns what
+        change returned.
+        """
+        return self.client.transaction(change, *keys, value_from_callable=True)
+
+    def move(self, pipe, kind, old, new):
+        pipe.hincrby(self.key("counts"), f"{kind}:{old}", -1)
+        pipe.hincrby(self.key("counts"), f"{kind}:{new}", 1)
+
+    def nextScore(self):
+        # A number lost to a transaction that is retried only leaves a gap
+        return self.client.incr(self.key("seq"))
+
+    def newTasks(self, pipe, tasks):
+        """
+        The tasks that are not in the queue yet with their pending score, read in the
+        WATCH phase of a transaction
+        """
+        tasks = list({task.taskID: task for task in tasks}.values())
+        if not tasks:
+            return []
+        taskKeys = [self.key("task", task.taskID) for task in tasks]
+        pipe.watch(*taskKeys)
+        return [
+            (task, self.nextScore())
+            for task, taskKey in zip(tasks, taskKeys)
+            if not pipe.exists(taskKey)
+        ]
+
+    def addTask(self, pipe, task, score):
+        pipe.hset(
+            self.key("task", task.taskID),
+            mapping={
+                "state": "pending",
+                "kind": task.kind,
+                "payload": json.dumps(task.payload),
+                "attempts": 0,
+            },
+        )
+        pipe.zadd(self.key("pending", task.kind), {task.taskID: score})
+        pipe.hincrby(self.key("counts"), f"{task.kind}:pending", 1)
+
+    def enqueue(self, tasks):
+        def change(pipe):
+            added = self.newTasks(pipe, tasks)
+            pipe.multi()
+            for task, score in added:
+                self.addTask(pipe, task, score)
+            return len(added)
+
+        return self.transaction(change)
+
+    def seen(self, workerID, now):
+        self.client.sadd(self.key("workers"), workerID)
+        self.client.hset(self.key("worker", workerID), "lastSeen", now)
+
+    def reclaim(self, taskID, now, pipe):
+        """
+        Put a task whose lease ran out back at the front of the queue, or give it up
+        """
+        taskKey = self.key("task", taskID)
+        expires = pipe.zscore(self.key("leases"), taskID)
+        if expires is None or expires > now:
+            return
+        fields = pipe.hgetall(taskKey)
+        kind = fields["kind"]
+        pipe.multi()
+        pipe.zrem(self.key("leases"), taskID)
+        pipe.hdel(taskKey, "owner", "leaseExpires")
+        if int(fields["attempts"]) >= self.maxAttempts:
+            pipe.hset(taskKey, mapping={"state": "failed", "error": "lease expired"})
+            pipe.sadd(self.key("failed"), taskID)
+            self.move(pipe, kind, "leased", "failed")
+        else:
+            pipe.hset(taskKey, "state", "pending")
+            # It was leased before the tasks still pending
+            pipe.zadd(self.key("pending", kind), {taskID: 0})
+            self.move(pipe, kind, "leased", "pending")
+
+    def reclaimExpired(self, now):
+        for taskID in self.client.zrangebyscore(self.key("leases"), "-inf", now):
+            self.transaction(
+                functools.partial(self.reclaim, taskID, now), self.key("task", taskID)
+            )
+
+    def take(self, taskID, kind, workerID, expires, pipe):
+        """
+        Lease a pending task, None when another worker took it first
+        """
+        taskKey = self.key("task", taskID)
+        if pipe.zscore(self.key("pending", kind), taskID) is None:
+            return None
+        fields = pipe.hgetall(taskKey)
+        attempts = int(fields["attempts"]) + 1
+        pipe.multi()
+        pipe.zrem(self.key("pending", kind), taskID)
+        pipe.hset(
+            taskKey,
+            mapping={
+                "state": "leased",
+                "owner": workerID,
+                "attempts": attempts,
+                "leaseExpires": expires,
+            },
+        )
+        pipe.zadd(self.key("leases"), {taskID: expires})
+        self.move(pipe, kind, "pending", "leased")
+        return Task(taskID, kind, json.loads(fields["payload"]), attempts)
+
+    def lease(self, workerID, leaseSeconds, kinds=TASK_KINDS):
+        now = time.time()
+        self.seen(workerID, now)
+        self.reclaimExpired(now)
+        while True:
+            heads = []
+            for kind in kinds:
+                head = self.client.zrange(self.key("pending", kind), 0, 0, withscores=True)
+                if head:
+                    heads.append((head[0][1], kind, head[0][0]))
+            if not heads:
+                return None
+            _, kind, taskID = min(heads)
+            task = self.transaction(
+                functools.partial(self.take, taskID, kind, workerID, now + leaseSeconds),
+                self.key("task", taskID),
+            )
+            if task is not None:
+                return task
+
+    def held(self, pipe, task, workerID):
+        """
+        The fields of the task when workerID still holds its lease, read in the WATCH
+        phase of a transaction
+        """
+        fields = pipe.hgetall(self.key("task", task.taskID))
+        if fields.get("state") != "leased" or fields.get("owner") != workerID:
+            return None
+        return fields
+
+    def endLease(self, pipe, task, state, **fields):
+        taskKey = self.key("task", task.taskID)
+        pipe.zrem(self.key("leases"), task.taskID)
+        pipe.hset(taskKey, mapping={"state": state, **fields})
+        pipe.hdel(taskKey, "owner", "leaseExpires")
+        self.move(pipe, task.kind, "leased", state)
+
+    def heartbeat(self, task, workerID, leaseSeconds):
+        now = time.time()
+        self.seen(workerID, now)
+
+        def extend(pipe):
+            if self.held(pipe, task, workerID) is None:
+                return False
+            pipe.multi()
+            pipe.hset(self.key("task", task.taskID), "leaseExpires", now + leaseSeconds)
+            pipe.zadd(self.key("leases"), {task.taskID: now + leaseSeconds})
+            return True
+
+        return self.transaction(extend, self.key("task", task.taskID))
+
+    def recordCompletion(self, pipe, task, workerID, startedAt, now, ok):
+        workerKey = self.key("worker", workerID)
+        pipe.hincrby(workerKey, "done" if ok else "failed", 1)
+        pipe.hincrbyfloat(workerKey, "busySeconds", now - startedAt)
+        if ok:
+            finishedKey = self.key("finished", workerID)
+            pipe.zadd(finishedKey, {f"{task.taskID}:{task.attempts}": now})
+            pipe.zremrangebyscore(finishedKey, "-inf", now - 86400)
+
+    def complete(self, task, workerID, result, startedAt, followUps=()):
+        now = time.time()
+        self.seen(workerID, now)
+
+        def change(pipe):
+            if self.held(pipe, task, workerID) is None:
+                return False
+            added = self.newTasks(pipe, followUps)
+            pipe.multi()
+            self.endLease(pipe, task, "done", result=json.dumps(result), finishedAt=now)
+            pipe.hdel(self.key("task", task.taskID), "error")
+            pipe.zadd(self.key("done"), {task.taskID: now})
+            for followUp, score in added:
+                self.addTask(pipe, followUp, score)
+            self.recordCompletion(pipe, task, workerID, startedAt, now, ok=True)
+            return True
+
+        return self.transaction(change, self.key("task", task.taskID))
+
+    def fail(self, task, workerID, error, startedAt):
+        now = time.time()
+        self.seen(workerID, now)
+        state = "failed" if task.attempts >= self.maxAttempts else "pending"
+
+        def change(pipe):
+            held = self.held(pipe, task, workerID) is not None
+            score = self.nextScore() if held and state == "pending" else None
+            pipe.multi()
+            self.recordCompletion(pipe, task, workerID, startedAt, now, ok=False)
+            if not held:
+                return None
+            self.endLease(pipe, task, state, error=error)
+            if state == "pending":
+                pipe.zadd(self.key("pending", task.kind), {task.taskID: score})
+            else:
+                pipe.sadd(self.key("failed"), task.taskID)
+            return state
+
+        return self.transaction(change, self.key("task", task.taskID))
+
+    def release(self, task, workerID):
+        def change(pipe):
+            fields = self.held(pipe, task, workerID)
+            if fields is None:
+                return
+            pipe.multi()
+            self.endLease(pipe, task, "pending", attempts=int(fields["attempts"]) - 1)
+            pipe.zadd(self.key("pending", task.kind), {task.taskID: 0})
+
+        self.transaction(change, self.key("task", task.taskID))
+
+    def retry(self, taskID, pipe):
+        taskKey = self.key("task", taskID)
+        if not pipe.sismember(self.key("failed"), taskID):
+            return False
+        kind = pipe.hget(taskKey, "kind")
+        score = self.nextScore()
+        pipe.multi()
+        pipe.srem(self.key("failed"), taskID)
+        pipe.hset(taskKey, mapping={"state": "pending", "attempts": 0})
+        pipe.zadd(self.key("pending", kind), {taskID: score})
+        self.move(pipe, kind, "failed", "pending")
+        return True
+
+    def retryFailed(self):
+        return sum(
+            self.transaction(functools.partial(self.retry, taskID), self.key("task", taskID))
+            for taskID in self.client.smembers(self.key("failed"))
+        )
+
+    def uncommitted(self, limit=100):
+        tasks = []
+        for taskID in self.client.zrange(self.key("done"), 0, limit - 1):
+            fields = self.client.hgetall(self.key("task", taskID))
+            task = Task(
+                taskID, fields["kind"], json.loads(fields["payload"]), int(fields["attempts"])
+            )
+            tasks.append((task, json.loads(fields["result"])))
+        return tasks
+
+    def markCommitted(self, taskIDs):
+        def change(pipe):
+            done = [
+                (taskID, pipe.hget(self.key("task", taskID), "kind"))
+                for taskID in taskIDs
+                if pipe.zscore(self.key("done"), taskID) is not None
+            ]
+            pipe.multi()
+            for taskID, kind in done:
+                taskKey = self.key("task", taskID)
+                pipe.zrem(self.key("done"), taskID)
+                pipe.hset(taskKey, "state", "committed")
+                pipe.hdel(taskKey, "result")
+                self.move(pipe, kind, "done", "committed")
+
+        self.transaction(change, *[self.key("task", taskID) for taskID in taskIDs])
+
+    def counts(self):
+        counts = {kind: dict.fromkeys(TASK_STATES, 0) for kind in TASK_KINDS}
+        for name, count in self.client.hgetall(self.key("counts")).items():
+            kind, state = name.split(":")
+            counts.setdefault(kind, dict.fromkeys(TASK_STATES, 0))[state] = int(count)
+        return counts
+
+    def workerStats(self, windowSeconds=600):
+        now = time.time()
+        leases = {}
+        for taskID in self.client.zrangebyscore(self.key("leases"), now, "+inf"):
+            leases[self.client.hget(self.key("task", taskID), "owner")] = taskID
+        stats = []
+        for workerID in sorted(self.client.smembers(self.key("workers"))):
+            fields = self.client.hgetall(self.key("worker", workerID))
+            recent = self.client.zcount(
+                self.key("finished", workerID), now - windowSeconds, now
+            )
+            stats.append(
+                {
+                    "worker": workerID,
+                    "done": int(fields.get("done", 0)),
+                    "failed": int(fields.get("failed", 0)),
+                    "busySeconds": round(float(fields.get("busySeconds", 0)), 1),
+                    "tasksPerMinute": round(recent * 60 / windowSeconds, 2),
+                    "lastSeenSeconds": round(now - float(fields.get("lastSeen", now)), 1),
+                    "leased": leases.get(workerID),
+                }
+            )
+        return stats
+
+
+def openQueue(location, maxAttempts=3):
+    """
+    A redis://host:port/db URL opens the Redis backend, anything else is the path of
+    the SQLite queue
+    """
+    if location.startswith(("redis://", "rediss://")):
+        if redis is None:
+            raise RuntimeError("the Redis backend needs the redis package, pip install redis")
+        client = redis.Redis.from_url(location, decode_responses=True)
+        return RedisQueue(client, maxAttempts=maxAttempts)
+    return SQLiteQueue(location, maxAttempts=maxAttempts)
@@ -0,0 +1,52 @@
+import queue
+import threading
+from tqdm import tqdm
+
+
+def runWorkerPool(tasks, work, createDriver, workerCount=4, controller=None):
+    """
+    Run work(getDriver, task, controller) over the tasks, every worker starts its own
+    driver the first time getDriver is called, results are returned in the order of
+    the tasks (None for failed tasks)
+    """
+    taskQueue = queue.Queue()
+    for position, task in enumerate(tasks):
+        taskQueue.put((position, task))
+
+    results = [None] * len(tasks)
+    progress = tqdm(total=len(tasks), desc="Processing Movies")
+
+    def worker():
+        drivers = []
+
+        def getDriver():
+            if not drivers:
+                drivers.append(createDriver())
+            return drivers[0]
+
+        try:
+            while True:
+                try:
+                    position, task = taskQueue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    results[position] = work(getDriver, task, controller)
+                except Exception as e:
+                    print(f"Failed to process task {position + 1}. Error: {e}")
+                progress.update(1)
+        finally:
+            for driver in drivers:
+                driver.quit()
+
+    threads = [
+        threading.Thread(target=worker, daemon=True)
+        for _ in range(min(workerCount, len(tasks)))
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    progress.close()
+
+    return results
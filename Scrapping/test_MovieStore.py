@@ -0,0 +1,101 @@
+import pandas as pd
+from ChartParser import ChartEntry, generateHash, movieKey
+from MovieStore import CSV_COLUMNS, MovieStore
+
+
+BASE_URL = "https://m.imdb.com"
+
+
+def chartEntry(rank, number, rating="9.0"):
+    url = f"{BASE_URL}/title/tt{number:07d}/?ref_=chttp_t_{rank}"
+    return ChartEntry(rank, url, movieKey(url), f"Film {number}", "1994", rating, "")
+
+
+def details(number):
+    return {"Genre": "Drama", "Director": f"Director {number}", "Stars": f"Star {number}"}
+
+
+def test_movie_key_ignores_the_rank_query_and_the_host():
+    assert chartEntry(1, 7).hashURL == chartEntry(2, 7).hashURL
+    assert movieKey("http://127.0.0.1:8000/title/tt0000007") == chartEntry(3, 7).hashURL
+    assert chartEntry(1, 7).hashURL != chartEntry(1, 8).hashURL
+
+
+def test_import_csv_rekeys_the_rank_bearing_hashes(tmp_path):
+    # Hash Movies.csv of earlier versions: the hash of the whole chart link
+    oldEntries = [chartEntry(1, 1), chartEntry(2, 2), chartEntry(3, 3)]
+    movies = pd.DataFrame(
+        [[entry.title, entry.rating, entry.year, "Drama", "", "", ""] for entry in oldEntries],
+        columns=list(CSV_COLUMNS.values()),
+    )
+    movies.to_csv(tmp_path / "Data.csv", index=False)
+    pd.DataFrame({"HashURL": [generateHash(entry.url) for entry in oldEntries]}).to_csv(
+        tmp_path / "Hash Movies.csv", index=False
+    )
+
+    store = MovieStore(str(tmp_path / "Movies.db"))
+    # Films 1 and 2 swapped ranks since, film 3 left the chart
+    entries = [chartEntry(1, 2), chartEntry(2, 1)]
+    store.importCSV(str(tmp_path / "Data.csv"), str(tmp_path / "Hash Movies.csv"), entries)
+    knownHashes = store.knownHashes()
+    assert {entry.hashURL for entry in entries} <= knownHashes
+    assert generateHash(oldEntries[2].url) in knownHashes
+    assert store.rekey(entries) == 0
+    store.close()
+
+
+def test_rekey_moves_scraped_movies_and_their_ranks(tmp_path):
+    store = MovieStore(str(tmp_path / "Movies.db"))
+    oldEntry = chartEntry(1, 1)
+    oldEntry.hashURL = generateHash(oldEntry.url)
+    store.replaceChart([oldEntry])
+    store.upsertMovie(oldEntry, details(1))
+
+    entries = [chartEntry(1, 1)]
+    assert store.rekey(entries) == 1
+    assert store.knownHashes() == {entries[0].hashURL}
+    assert store.chartMovies()["hashURL"].tolist() == [entries[0].hashURL]
+    report = store.replaceChart(entries)
+    assert not any(report.values())
+    store.close()
+
+
+def storedChart(tmp_path, numbers):
+    store = MovieStore(str(tmp_path / "Movies.db"))
+    entries = [chartEntry(rank, number) for rank, number in enumerate(numbers, start=1)]
+    store.replaceChart(entries)
+    for entry in entries:
+        store.upsertMovie(entry, details(entry.rank))
+    return store
+
+
+def test_rank_swap_only_changes_the_ranks(tmp_path):
+    store = storedChart(tmp_path, [1, 2, 3])
+    report = store.replaceChart([chartEntry(1, 2), chartEntry(2, 1), chartEntry(3, 3)])
+    assert [(entry.title, rank) for entry, rank in report["rankChanges"]] == [
+        ("Film 2", 2),
+        ("Film 1", 1),
+    ]
+    assert report["newEntries"] == [] and report["dropped"] == []
+    assert report["ratingChanges"] == []
+    assert store.detailQueue() == []
+    assert store.chartMovies()["title"].tolist() == ["Film 2", "Film 1", "Film 3"]
+    store.close()
+
+
+def test_only_new_entrants_are_queued(tmp_path):
+    store = storedChart(tmp_path, [1, 2, 3])
+    entries = [chartEntry(1, 3, rating="9.1"), chartEntry(2, 1), chartEntry(3, 4)]
+    report = store.replaceChart(entries)
+    assert [(entry.title, rating) for entry, rating in report["ratingChanges"]] == [
+        ("Film 3", "9.0")
+    ]
+    assert [entry.title for entry in report["newEntries"]] == ["Film 4"]
+    assert report["dropped"] == [(chartEntry(2, 2).hashURL, "Film 2")]
+    assert [row[2:4] for row in store.detailQueue()] == [("Film 4", "new")]
+
+    # Scraping the entrant takes it out of the queue
+    store.upsertMovie(entries[2], details(4))
+    assert store.detailQueue() == []
+    assert not any(store.replaceChart(entries).values())
+    store.close()
@@ -0,0 +1,41 @@
+import sqlite3
+from PageCache import PageCache, pageKey
+
+
+CHART_LINK = "https://m.imdb.com/title/tt0111161/?ref_=chttp_t_1"
+
+
+def test_page_key_drops_the_ref_query_and_the_fragment():
+    assert pageKey(CHART_LINK) == "https://m.imdb.com/title/tt0111161/"
+    assert pageKey(CHART_LINK + "#reviews") == "https://m.imdb.com/title/tt0111161/"
+    assert (
+        pageKey("https://m.imdb.com/title/tt0111161/reviews/_ajax?ref_=tt&paginationKey=k")
+        == "https://m.imdb.com/title/tt0111161/reviews/_ajax?paginationKey=k"
+    )
+
+
+def test_a_page_is_found_after_the_movie_changes_rank(tmp_path):
+    pageCache = PageCache(str(tmp_path))
+    pageCache.put(CHART_LINK, "<html>title</html>", "title")
+    movedLink = CHART_LINK.replace("chttp_t_1", "chttp_t_2")
+    assert pageCache.get(movedLink, "title") == "<html>title</html>"
+    assert pageCache.stats()["pages"] == 1
+    pageCache.close()
+
+
+def test_pages_cached_under_their_raw_url_are_moved_to_their_key(tmp_path):
+    pageCache = PageCache(str(tmp_path))
+    pageCache.put(CHART_LINK, "<html>old</html>", "title")
+    pageCache.close()
+    # The index row of an earlier version, keyed by the raw chart link
+    connection = sqlite3.connect(str(tmp_path / "index.db"))
+    with connection:
+        connection.execute("UPDATE pages SET url = ?", (CHART_LINK,))
+    connection.close()
+
+    pageCache = PageCache(str(tmp_path), replay=True)
+    assert pageCache.get(CHART_LINK.replace("chttp_t_1", "chttp_t_9"), "title") == (
+        "<html>old</html>"
+    )
+    assert pageCache.stats()["pages"] == 1
+    pageCache.close()
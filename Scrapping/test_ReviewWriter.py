@@ -0,0 +1,32 @@
+import os
+import pytest
+from ChartParser import generateHash, movieKey
+from ReviewWriter import ReviewWriter
+
+
+MOVIE_URL = "https://m.imdb.com/title/tt0000001/"
+OLD_KEY = generateHash(MOVIE_URL + "?ref_=chttp_t_1")
+NEW_KEY = movieKey(MOVIE_URL + "?ref_=chttp_t_2")
+
+
+@pytest.mark.parametrize("fileFormat", ["csv", "parquet"])
+def test_rekey_moves_the_partition_and_keeps_the_dedupe(fileFormat, tmp_path):
+    reviewWriter = ReviewWriter(str(tmp_path), fileFormat=fileFormat)
+    reviewWriter.add(OLD_KEY, "Film 1", ["9", "7"], ["Great", "Fine"], ["Loved it", "Okay"])
+    reviewWriter.complete(OLD_KEY, "Film 1")
+
+    assert reviewWriter.rekey({"Film 1": NEW_KEY, "Film 2": movieKey("/title/tt2/")}) == 1
+    assert not os.path.exists(reviewWriter.partitionPath(OLD_KEY))
+    assert reviewWriter.completedMovies() == {NEW_KEY}
+    assert reviewWriter.rekey({"Film 1": NEW_KEY}) == 0
+
+    # The reviews scraped again under the new key are not written twice
+    reviewWriter.add(NEW_KEY, "Film 1", ["9", "5"], ["Great", "Meh"], ["Loved it", "No"])
+    assert reviewWriter.flush() == 1
+    assert reviewWriter.stats()["reviews"] == 3
+    reviewWriter.close()
+
+    # Nothing is cut back when the writer is opened again
+    reviewWriter = ReviewWriter(str(tmp_path), fileFormat=fileFormat)
+    assert len(list(reviewWriter.readPartition(NEW_KEY))) == 3
+    reviewWriter.close()
@@ -0,0 +1,119 @@
+import types
+import threading
+import pytest
+import ScrapeQueue
+from ScrapeQueue import LocalPipeline, LocalRedis, RedisQueue, SQLiteQueue, Task
+
+
+def movie(n):
+    return Task(f"movie:{n}", "movie", {"n": n})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    The time the queues see, moved forward by the tests
+    """
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(ScrapeQueue, "time", types.SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def openBackend(backend, tmp_path, maxAttempts=3):
+    if backend == "sqlite":
+        return SQLiteQueue(str(tmp_path / "Scrape Queue.db"), maxAttempts=maxAttempts)
+    return RedisQueue(LocalRedis(), maxAttempts=maxAttempts)
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_expired_lease_is_taken_over(backend, tmp_path, clock):
+    scrapeQueue = openBackend(backend, tmp_path)
+    scrapeQueue.enqueue([movie(1)])
+    first = scrapeQueue.lease("A", 10)
+    assert scrapeQueue.heartbeat(first, "A", 10)
+
+    clock.value += 11
+    second = scrapeQueue.lease("B", 10)
+    assert (second.taskID, second.attempts) == ("movie:1", 2)
+    assert not scrapeQueue.heartbeat(first, "A", 10)
+    assert not scrapeQueue.complete(first, "A", {"by": "A"}, clock.value)
+    assert scrapeQueue.fail(first, "A", "late", clock.value) is None
+
+    followUp = Task("reviews:1:0", "reviews", {"page": 0})
+    assert scrapeQueue.complete(second, "B", {"by": "B"}, clock.value, [followUp])
+    counts = scrapeQueue.counts()
+    assert counts["movie"]["done"] == 1 and counts["movie"]["leased"] == 0
+    assert counts["reviews"]["pending"] == 1
+    assert [result for _, result in scrapeQueue.uncommitted()] == [{"by": "B"}]
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_expired_lease_gives_up_after_max_attempts(backend, tmp_path, clock):
+    scrapeQueue = openBackend(backend, tmp_path, maxAttempts=1)
+    scrapeQueue.enqueue([movie(1)])
+    scrapeQueue.lease("A", 10)
+
+    clock.value += 11
+    assert scrapeQueue.lease("B", 10) is None
+    assert scrapeQueue.counts()["movie"]["failed"] == 1
+    assert scrapeQueue.retryFailed() == 1
+    assert scrapeQueue.lease("B", 10).attempts == 1
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "redis"])
+def test_concurrent_workers_finish_every_task_once(backend, tmp_path):
+    scrapeQueue = openBackend(backend, tmp_path)
+    scrapeQueue.enqueue([movie(n) for n in range(60)])
+    finished = []
+
+    def work(workerID):
+        while (task := scrapeQueue.lease(workerID, 30)) is not None:
+            if scrapeQueue.complete(task, workerID, {}, 0.0):
+                finished.append(task.taskID)
+
+    workers = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(6)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert sorted(finished) == sorted(f"movie:{n}" for n in range(60))
+    assert scrapeQueue.counts()["movie"]["done"] == 60
+
+
+def test_redis_worker_dying_before_exec_leaves_the_task_recoverable(
+    tmp_path, clock, monkeypatch
+):
+    scrapeQueue = openBackend("redis", tmp_path)
+    scrapeQueue.enqueue([movie(1)])
+    execute = LocalPipeline.execute
+
+    def connectionLost(pipe):
+        pipe.reset()
+        raise ConnectionError("worker died")
+
+    # Dies between reading the head of the queue and its EXEC: nothing was popped
+    monkeypatch.setattr(LocalPipeline, "execute", connectionLost)
+    with pytest.raises(ConnectionError):
+        scrapeQueue.lease("A", 10)
+    monkeypatch.setattr(LocalPipeline, "execute", execute)
+    assert scrapeQueue.counts()["movie"]["pending"] == 1
+    task = scrapeQueue.lease("B", 10)
+
+    # Dies while completing: the task stays leased, then expires to the next worker
+    monkeypatch.setattr(LocalPipeline, "execute", connectionLost)
+    with pytest.raises(ConnectionError):
+        scrapeQueue.complete(task, "B", {}, clock.value)
+    monkeypatch.setattr(LocalPipeline, "execute", execute)
+    assert scrapeQueue.counts()["movie"]["leased"] == 1
+
+    clock.value += 11
+    takenOver = scrapeQueue.lease("C", 10)
+    assert (takenOver.taskID, takenOver.attempts) == ("movie:1", 2)
+    assert scrapeQueue.complete(takenOver, "C", {}, clock.value)
+    assert scrapeQueue.counts()["movie"] == {
+        "pending": 0,
+        "leased": 0,
+        "done": 1,
+        "committed": 0,
+        "failed": 0,
+    }